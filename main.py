@@ -179,6 +179,15 @@ def setup_terminal_system(window):
     terminal_manager.set_event_listener(event_listener)
 
 
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    """创建事件循环，可用时优先使用 uvloop（随 uvicorn[standard] 安装，Windows 下不可用）"""
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.new_event_loop()
+    return uvloop.new_event_loop()
+
+
 def start_async_event_loop():
     """在后台线程中启动 asyncio 事件循环"""
 
@@ -193,7 +202,7 @@ def start_async_event_loop():
         except Exception as e:
             logger.error(f"Event loop task error: {e}")
 
-    loop = asyncio.new_event_loop()
+    loop = new_event_loop()
     asyncio.set_event_loop(loop)
 
     # 设置事件循环给异步执行器
@@ -377,7 +386,7 @@ def main():
     if env_mode == "browser":
         # FastAPI 模式
         try:
-            asyncio.run(run_fastapi_mode())
+            asyncio.run(run_fastapi_mode(), loop_factory=new_event_loop)
         except KeyboardInterrupt:
             logger.info("Received keyboard interrupt")
         except asyncio.CancelledError:
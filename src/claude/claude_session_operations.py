@@ -3,15 +3,18 @@ Claude Session 操作模块
 处理 Session 的扫描和读取操作
 """
 
+import asyncio
 import copy
-import json
 import logging
+import mmap
+import os
 import re
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, Iterator, List, Optional, Set, Union
 
-import aiofiles
 import orjson
 
 from src.utils.time_utils import parse_iso_timestamp
@@ -24,11 +27,230 @@ logger = logging.getLogger("claude")
 # Constants
 VALID_MESSAGE_TYPES: Set[str] = {"user", "assistant", "system"}
 META_MESSAGE_TYPES: Set[str] = {"file-history-snapshot", "summary"}
+TOOL_USE_TYPES: Set[str] = {"tool_use", "server_tool_use"}
 DEFAULT_TITLE_MAX_LENGTH = 50
+# 读取 session 标题时每次读取的块大小
+TITLE_SCAN_CHUNK_SIZE = 64 * 1024
+# session_id 中不允许出现的路径遍历字符：".."、路径分隔符和空字符
+_INVALID_SESSION_ID_PATTERN = re.compile(r"\.\.|[/\\\x00]")
+# 元数据行（META_MESSAGE_TYPES）的行首字节（Claude Code 写入的是紧凑 JSON，type 位于首位），
+# 这些行（尤其是 file-history-snapshot）可能很大且最终都会被丢弃，读取标题和加载 session 时
+# 可以按前缀直接跳过，无需完整解析
+_META_LINE_PREFIXES = (b'{"type":"file-history-snapshot"', b'{"type":"summary"')
+# 打断消息：[Request interrupted by user...]
+_INTERRUPTED_PATTERN = re.compile(r"^\[Request interrupted by user[^\]]*\]$")
+# 标准 command 消息格式（捕获 command 名称和参数），前后不能有其他字符
+_COMMAND_MESSAGE_PATTERN = re.compile(
+    r"^<command-message>.*?</command-message>\s*<command-name>(.*?)</command-name>(?:\s*<command-args>(.*?)</command-args>)?$"
+)
+# 提取标题时使用的 command 消息格式（只捕获 command 名称）
+_COMMAND_NAME_PATTERN = re.compile(
+    r"^<command-message>.*?</command-message>\s*<command-name>(.*?)</command-name>(?:\s*<command-args>.*?)?$"
+)
+# 文本开头连续出现的系统标签
+_LEADING_SYSTEM_TAGS_PATTERN = re.compile(
+    r"^(?:(?:<local-command-caveat>.*?</local-command-caveat>\s*|(?:<command-name>.*?</command-name>\s*)|(?:<command-message>.*?</command-message>\s*)|(?:<command-args>.*?</command-args>\s*)|(?:<local-command-stdout>.*?</local-command-stdout>\s*)|(?:<local-command-stderr>.*?</local-command-stderr>\s*))+)",
+    re.DOTALL,
+)
+# 需要从文本任意位置清理的系统标签
+_SYSTEM_TAG_PATTERNS = tuple(
+    re.compile(pattern, re.DOTALL)
+    for pattern in (
+        r"<local-command-caveat>.*?</local-command-caveat>\s*",
+        r"<command-name>.*?</command-name>\s*",
+        r"<command-message>.*?</command-message>\s*",
+        r"<command-args>.*?</command-args>\s*",
+        r"<local-command-stdout>.*?</local-command-stdout>\s*",
+        r"<local-command-stderr>.*?</local-command-stderr>\s*",
+    )
+)
+# 每条消息都会重复的字符串字段，解析时在同一 session 内共享同一个 str 对象
+_DEDUP_MESSAGE_FIELDS = ("cwd", "gitBranch")
+# message 字段内部同样重复的字符串字段（role 取值固定，model 在同一 session 内基本不变）
+_DEDUP_INNER_MESSAGE_FIELDS = ("role", "model")
+# scan_sessions 并发读取 session 文件的最大数量
+SCAN_SESSIONS_CONCURRENCY = min(32, (os.cpu_count() or 1) * 4)
+# 已解析 session 的缓存数量上限（单个 session 可能很大，缓存数量不宜过多）
+SESSION_CACHE_MAX_SIZE = 16
+# 已解析 session 缓存按源文件大小计算的总量上限，超过该大小的单个 session 不缓存
+# （解析后的对象通常比源文件更占内存）
+SESSION_CACHE_MAX_BYTES = 128 * 1024 * 1024
+# session 标题的缓存数量上限（标题只是短字符串，可以覆盖大量 session）
+TITLE_CACHE_MAX_SIZE = 4096
+# 超过该大小的 session 文件使用 mmap 读取，避免缓冲读取的用户态拷贝
+SESSION_MMAP_THRESHOLD = 1 * 1024 * 1024
+
+
+def _json_loads(s: Union[str, bytes]) -> dict:
+    """使用 orjson 解析单行 JSON（比标准库 json 快 2-5 倍，可直接解析 bytes）"""
+    return orjson.loads(s)
 
 
-def _json_loads(s: str) -> dict:
-    return orjson.loads(s)
+_MISSING = object()
+
+
+class _LRUCache:
+    """
+    线程安全的 LRU 缓存
+
+    生产环境中每个请求都会重新创建 ClaudeSessionOperations，缓存必须放在模块级别，
+    才能在多次请求之间复用。除条目数量外，还可以按条目权重（如文件大小）限制总量
+    """
+
+    def __init__(self, max_size: int, max_weight: Optional[int] = None):
+        self.max_size = max_size
+        self.max_weight = max_weight
+        # key -> (value, weight)
+        self._data: OrderedDict = OrderedDict()
+        self._weight = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """获取缓存值并标记为最近使用，不存在时返回 default"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, weight: int = 0) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目；单个条目超出总量上限时不缓存"""
+        if self.max_weight is not None and weight > self.max_weight:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._weight -= previous[1]
+            self._data[key] = (value, weight)
+            self._weight += weight
+            while len(self._data) > self.max_size or (
+                self.max_weight is not None and self._weight > self.max_weight
+            ):
+                _, (_, evicted_weight) = self._data.popitem(last=False)
+                self._weight -= evicted_weight
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+            self._weight = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# (session_file, st_mtime_ns, st_size) -> title，文件未变化时跳过重复读取
+_title_cache = _LRUCache(TITLE_CACHE_MAX_SIZE)
+# (session_file, st_mtime_ns, st_size) -> 解析后的 ClaudeSession
+# 缓存中的 ClaudeSession 不会直接返回给调用方，见 _copy_cached_session
+_session_cache = _LRUCache(SESSION_CACHE_MAX_SIZE, SESSION_CACHE_MAX_BYTES)
+
+
+def _copy_cached_session(session: ClaudeSession) -> ClaudeSession:
+    """
+    复制缓存中的 session 后返回给调用方
+
+    只复制 session 本身和 messages 列表，调用方修改 session 字段或增删消息不会影响缓存；
+    其中的 ClaudeMessage 及其 message 字典与缓存共享（深拷贝大 session 的代价与重新解析相当），
+    调用方必须将其视为只读
+    """
+    return session.model_copy(update={"messages": list(session.messages)})
+
+
+def _is_constructible_message(fields: Dict[str, Any]) -> bool:
+    """
+    判断 ClaudeMessage 字段的类型是否已符合模型定义，可以跳过校验直接构造
+    """
+    return (
+        isinstance(fields["timestamp"], str)
+        and (fields["message"] is None or isinstance(fields["message"], dict))
+        and (fields["cwd"] is None or isinstance(fields["cwd"], str))
+        and (fields["gitBranch"] is None or isinstance(fields["gitBranch"], str))
+    )
+
+
+# 读取 session 标题的线程复用的读缓冲区（标题在线程池中读取，每个工作线程一个）
+_title_scan_local = threading.local()
+
+
+def _get_title_scan_buffer() -> bytearray:
+    """获取当前线程复用的标题读取缓冲区，避免每个文件都重新分配"""
+    buffer = getattr(_title_scan_local, "buffer", None)
+    if buffer is None:
+        buffer = bytearray(TITLE_SCAN_CHUNK_SIZE)
+        _title_scan_local.buffer = buffer
+    return buffer
+
+
+def _iter_chunked_lines(f, buffer: bytearray) -> Iterator[bytes]:
+    """
+    按块读取文件并逐行产出
+
+    每次将一个较大的块读入复用的缓冲区再切分成行，只为产出的行分配内存，
+    调用方找到所需内容后停止迭代即可，不会读取文件剩余部分。
+
+    Args:
+        f: 以二进制模式打开的文件对象（支持 readinto）
+        buffer: 读缓冲区，其大小即每次读取的字节数
+
+    Yields:
+        bytes: 文件中的每一行（不含换行符）
+    """
+    view = memoryview(buffer)
+    parts: List[bytes] = []
+    while n := f.readinto(buffer):
+        start = 0
+        while (end := buffer.find(b"\n", start, n)) != -1:
+            if parts:
+                # 与上一个块末尾未结束的行拼接
+                parts.append(view[start:end].tobytes())
+                yield b"".join(parts)
+                parts = []
+            else:
+                yield view[start:end].tobytes()
+            start = end + 1
+        if start < n:
+            # 当前块末尾的行未结束（或超长行），继续累积
+            parts.append(view[start:n].tobytes())
+    if parts:
+        yield b"".join(parts)
+
+
+def _iter_session_file_lines(path: str, file_size: int) -> Iterator[bytes]:
+    """
+    逐行读取 session 文件
+
+    大文件使用 mmap 映射后逐行读取，由操作系统按需换入页面（不支持 mmap 时退回缓冲读取）；
+    小文件一次性读入后按换行符切分，比逐行 readline 更快。
+
+    Args:
+        path: session 文件路径
+        file_size: 文件大小（字节）
+
+    Yields:
+        bytes: 文件中的每一行（可能包含换行符）
+    """
+    with open(path, "rb") as f:
+        if file_size > SESSION_MMAP_THRESHOLD:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                mm = None
+            if mm is not None:
+                with mm:
+                    if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    yield from iter(mm.readline, b"")
+            else:
+                yield from f
+            return
+
+        lines = f.read().split(b"\n")
+        # 与逐行读取保持一致：文件末尾的换行符不产生额外的空行
+        if not lines[-1]:
+            lines.pop()
+        yield from lines
 
 
 class ClaudeSessionOperations:
@@ -42,6 +264,8 @@ class ClaudeSessionOperations:
             claude_session_path: 项目的 session 存储目录路径
         """
         self.session_path = claude_session_path
+        # 缓存字符串形式的路径，扫描时直接使用 os 接口，避免反复创建 Path 对象
+        self._session_path_str = os.fspath(claude_session_path)
 
     @staticmethod
     def _validate_session_id(session_id: str) -> None:
@@ -57,17 +281,27 @@ class ClaudeSessionOperations:
         if not session_id or not isinstance(session_id, str):
             raise ValueError("session_id must be a non-empty string")
 
-        # 防止路径遍历攻击
-        if ".." in session_id or "/" in session_id or "\\" in session_id:
+        # 防止路径遍历攻击（包含分隔符也就排除了绝对路径）
+        if not ClaudeSessionOperations._is_valid_session_id(session_id):
             raise ValueError(
                 f"Invalid session_id (contains path traversal characters): {session_id}"
             )
 
-        # 防止绝对路径
-        if session_id.startswith(("/", "\\")):
-            raise ValueError(
-                f"Invalid session_id (looks like absolute path): {session_id}"
-            )
+    @staticmethod
+    def _is_valid_session_id(session_id: str) -> bool:
+        """
+        判断 session_id 是否合法（非空且不含路径遍历字符）
+
+        scan_sessions 过滤文件名与 read_session_contents 校验 session_id 使用同一规则，
+        保证能按 ID 打开的 session 都会出现在列表中
+
+        Args:
+            session_id: 要检查的 session ID
+
+        Returns:
+            bool: 是否合法
+        """
+        return bool(session_id) and not _INVALID_SESSION_ID_PATTERN.search(session_id)
 
     def _convert_interrupted_to_assistant(self, message_data: dict) -> Optional[dict]:
         """
@@ -85,10 +319,6 @@ class ClaudeSessionOperations:
         message = message_data.get("message", {})
         content = message.get("content", "")
 
-        # 正则匹配打断消息：[Request interrupted by user...]
-        # 使用更精确的模式，避免匹配过多的内容
-        interrupted_pattern = re.compile(r"^\[Request interrupted by user[^\]]*\]$")
-
         # 提取文本内容进行检测
         text_to_check = ""
         if isinstance(content, str):
@@ -102,7 +332,7 @@ class ClaudeSessionOperations:
             text_to_check = content[0].get("text", "")
 
         # 使用正则检测是否是打断消息
-        if not text_to_check or not interrupted_pattern.match(text_to_check):
+        if not text_to_check or not _INTERRUPTED_PATTERN.match(text_to_check):
             return None
 
         # 去除前后中括号，提取实际的消息文本
@@ -158,10 +388,11 @@ class ClaudeSessionOperations:
         # 严格匹配：整个 content 必须是标准的 command 消息格式
         # 格式 1：<command-message>xxx</command-message> <换行> <command-name>xxx</command-name>
         # 格式 2：<command-message>xxx</command-message> <换行> <command-name>xxx</command-name> <换行> <command-args>xxx</command-args>
-        command_pattern = re.compile(
-            r"^<command-message>.*?</command-message>\s*<command-name>(.*?)</command-name>(?:\s*<command-args>(.*?)</command-args>)?$"
-        )
-        match = command_pattern.match(content.strip())
+        # 绝大多数消息不是 command，先用前缀判断，避免执行正则
+        content = content.strip()
+        if not content.startswith("<command-message>"):
+            return None
+        match = _COMMAND_MESSAGE_PATTERN.match(content)
 
         if not match:
             return None
@@ -231,27 +462,15 @@ class ClaudeSessionOperations:
 
         Args:
             tool_result_item: tool_result 内容项
-            tool_use_map: tool_use_id -> message_data 映射（会被修改）
+            tool_use_map: tool_use_id -> tool_use 内容项映射（内容项会被修改）
         """
         tool_use_id = tool_result_item.get("tool_use_id")
 
         if tool_use_id and tool_use_id in tool_use_map:
-            # 找到对应的 tool_use 消息
-            tool_use_message_data = tool_use_map[tool_use_id]
-            tool_use_content = tool_use_message_data.get("message", {}).get(
-                "content", []
-            )
-
-            # 在 tool_use_content 中找到对应的 tool_use 或 server_tool_use 并添加 output
-            for item in tool_use_content:
-                if (
-                    isinstance(item, dict)
-                    and item.get("type") in ("tool_use", "server_tool_use")
-                    and item.get("id") == tool_use_id
-                ):
-                    item["output"] = tool_result_item.get("content")
-                    item["status"] = "complete"
-                    break
+            # 直接找到对应的 tool_use 或 server_tool_use 内容项并添加 output
+            tool_use_item = tool_use_map[tool_use_id]
+            tool_use_item["output"] = tool_result_item.get("content")
+            tool_use_item["status"] = "complete"
 
             # 注意：不从 map 中移除 tool_use，因为后续的 isMeta 消息可能还需要引用它
             # del tool_use_map[tool_use_id]
@@ -270,47 +489,35 @@ class ClaudeSessionOperations:
 
         Args:
             meta_message: isMeta=true 的消息数据
-            tool_use_map: tool_use_id -> message_data 映射（会被修改）
+            tool_use_map: tool_use_id -> tool_use 内容项映射（内容项会被修改）
         """
         source_tool_use_id = meta_message.get("sourceToolUseID")
 
         if source_tool_use_id and source_tool_use_id in tool_use_map:
-            # 找到对应的 tool_use 消息
-            tool_use_message_data = tool_use_map[source_tool_use_id]
-            tool_use_content = tool_use_message_data.get("message", {}).get(
-                "content", []
-            )
-
-            # 在 tool_use_content 中找到对应的 tool_use 或 server_tool_use 并添加 extra
-            for item in tool_use_content:
-                if (
-                    isinstance(item, dict)
-                    and item.get("type") in ("tool_use", "server_tool_use")
-                    and item.get("id") == source_tool_use_id
-                ):
-                    # 从 isMeta 消息的 message.content 中提取 text 内容
-                    message = meta_message.get("message", {})
-                    content = message.get("content", "")
-
-                    # 提取 text 内容
-                    text_content = None
-                    if isinstance(content, str):
-                        text_content = content
-                    elif isinstance(content, list) and len(content) > 0:
-                        # 从数组中提取 text 内容
-                        for content_item in content:
-                            if (
-                                isinstance(content_item, dict)
-                                and content_item.get("type") == "text"
-                            ):
-                                text_content = content_item.get("text", "")
-                                break
-
-                    # 只有当存在 text_content 时才添加 extra
-                    if text_content:
-                        item["extra"] = text_content
+            # 直接找到对应的 tool_use 或 server_tool_use 内容项
+            tool_use_item = tool_use_map[source_tool_use_id]
+
+            # 从 isMeta 消息的 message.content 中提取 text 内容
+            message = meta_message.get("message", {})
+            content = message.get("content", "")
+
+            # 提取 text 内容
+            text_content = None
+            if isinstance(content, str):
+                text_content = content
+            elif isinstance(content, list) and len(content) > 0:
+                # 从数组中提取 text 内容
+                for content_item in content:
+                    if (
+                        isinstance(content_item, dict)
+                        and content_item.get("type") == "text"
+                    ):
+                        text_content = content_item.get("text", "")
+                        break
 
-                    break
+            # 只有当存在 text_content 时才添加 extra
+            if text_content:
+                tool_use_item["extra"] = text_content
 
             logger.debug(
                 f"Merged isMeta message to tool_use: sourceToolUseID={source_tool_use_id} | "
@@ -410,10 +617,7 @@ class ClaudeSessionOperations:
         Returns:
             bool: 是否是 tool_use 类型
         """
-        return isinstance(item, dict) and item.get("type") in (
-            "tool_use",
-            "server_tool_use",
-        )
+        return isinstance(item, dict) and item.get("type") in TOOL_USE_TYPES
 
     def _create_subagent_item(
         self, tool_use_item: dict, subagent_msgs: List[dict], tool_use_id: str
@@ -599,101 +803,109 @@ class ClaudeSessionOperations:
         for message_data in merged_messages:
             # 【性能优化】只提取必要的字段，移除 raw_data 以减少数据传输大小
             # 原始实现包含 raw_data 会导致数据量翻倍
-            claude_message = ClaudeMessage.model_validate(
-                {
-                    "timestamp": message_data.get("timestamp", ""),
-                    "message": message_data.get("message"),
-                    "cwd": message_data.get("cwd"),
-                    "gitBranch": message_data.get("gitBranch"),
-                    # 移除 raw_data，显著减少数据传输大小
-                    # "raw_data": clean_data,
-                }
-            )
+            fields = {
+                "timestamp": message_data.get("timestamp", ""),
+                "message": message_data.get("message"),
+                "cwd": message_data.get("cwd"),
+                "gitBranch": message_data.get("gitBranch"),
+                # 移除 raw_data，显著减少数据传输大小
+                # "raw_data": clean_data,
+            }
+            # 【性能优化】字段类型符合模型定义时使用 model_construct 跳过校验，
+            # 同时避免校验时为每条消息重新复制一份 message 字典；
+            # 文件内容不可信，类型不符时回退到 model_validate 按模型规则校验
+            if _is_constructible_message(fields):
+                claude_message = ClaudeMessage.model_construct(**fields)
+            else:
+                claude_message = ClaudeMessage.model_validate(fields)
             claude_messages.append(claude_message)
 
         return merged_messages, claude_messages
 
-    def _extract_progress_messages(
-        self, raw_messages: List[dict]
-    ) -> Dict[str, List[dict]]:
+    def _collect_progress_message(
+        self, message_data: dict, progress_map: Dict[str, List[dict]]
+    ) -> None:
         """
-        从原始消息中提取所有 progress 消息，并按 parentToolUseID 分组
+        将单条 progress 消息中的 subagent 对话追加到 progress_map
 
         Progress 消息是 subagent 执行过程中的进度更新，包含：
         - parentToolUseID: 父 tool_use 的 ID
         - data.normalizedMessages: 完整的对话历史
 
-        Args:
-            raw_messages: 原始消息列表
+        由 _merge_tool_use_with_result 在主循环中逐条调用，收集完成后再由
+        _dedupe_progress_messages 去重
 
-        Returns:
-            Dict[str, List[dict]]: parentToolUseID -> subagent 消息列表的映射
+        Args:
+            message_data: type=progress 的消息数据
+            progress_map: parentToolUseID -> subagent 消息列表的映射（会被修改）
         """
-        progress_map: Dict[str, List[dict]] = {}
-        total_progress_messages = 0
+        parent_tool_use_id = message_data.get("parentToolUseID")
+        if not parent_tool_use_id:
+            logger.debug(
+                "Progress message missing parentToolUseID | "
+                f"timestamp: {message_data.get('timestamp')}"
+            )
+            return
 
-        for message_data in raw_messages:
-            if message_data.get("type") != "progress":
-                continue
+        # 初始化该 tool_use 的 subagent 消息列表
+        subagent_messages = progress_map.setdefault(parent_tool_use_id, [])
 
-            total_progress_messages += 1
-            parent_tool_use_id = message_data.get("parentToolUseID")
-            if not parent_tool_use_id:
-                logger.debug(
-                    "Progress message missing parentToolUseID | "
-                    f"timestamp: {message_data.get('timestamp')}"
-                )
-                continue
+        # 从 data.normalizedMessages 中提取消息
+        data = message_data.get("data", {})
 
-            # 初始化该 tool_use 的 subagent 消息列表
-            if parent_tool_use_id not in progress_map:
-                progress_map[parent_tool_use_id] = []
+        # 检查 data 是否为空
+        if not data:
+            logger.debug(
+                f"Progress message has empty data field | parentToolUseID: {parent_tool_use_id} | "
+                f"timestamp: {message_data.get('timestamp')}"
+            )
+            return
 
-            # 从 data.normalizedMessages 中提取消息
-            data = message_data.get("data", {})
+        normalized_messages = data.get("normalizedMessages", [])
 
-            # 检查 data 是否为空
-            if not data:
-                logger.debug(
-                    f"Progress message has empty data field | parentToolUseID: {parent_tool_use_id} | "
-                    f"timestamp: {message_data.get('timestamp')}"
-                )
-                continue
+        # 检查 normalizedMessages 是否存在且为列表
+        if not normalized_messages:
+            logger.debug(
+                f"Progress message has no normalizedMessages | parentToolUseID: {parent_tool_use_id} | "
+                f"data keys: {list(data.keys())} | "
+                f"timestamp: {message_data.get('timestamp')}"
+            )
+            return
 
-            normalized_messages = data.get("normalizedMessages", [])
+        if not isinstance(normalized_messages, list):
+            logger.debug(
+                f"Progress message normalizedMessages is not a list | parentToolUseID: {parent_tool_use_id} | "
+                f"type: {type(normalized_messages).__name__} | "
+                f"timestamp: {message_data.get('timestamp')}"
+            )
+            return
 
-            # 检查 normalizedMessages 是否存在且为列表
-            if not normalized_messages:
-                logger.debug(
-                    f"Progress message has no normalizedMessages | parentToolUseID: {parent_tool_use_id} | "
-                    f"data keys: {list(data.keys())} | "
-                    f"timestamp: {message_data.get('timestamp')}"
-                )
-                continue
+        converted_count = 0
+        for msg in normalized_messages:
+            # 转换为标准消息格式
+            converted_msg = self._convert_progress_message_to_standard(msg)
+            if converted_msg:
+                subagent_messages.append(converted_msg)
+                converted_count += 1
 
-            if not isinstance(normalized_messages, list):
-                logger.debug(
-                    f"Progress message normalizedMessages is not a list | parentToolUseID: {parent_tool_use_id} | "
-                    f"type: {type(normalized_messages).__name__} | "
-                    f"timestamp: {message_data.get('timestamp')}"
-                )
-                continue
+        logger.debug(
+            f"Extracted progress message | parentToolUseID: {parent_tool_use_id} | "
+            f"normalized_messages_count: {len(normalized_messages)} | "
+            f"converted_count: {converted_count}"
+        )
 
-            converted_count = 0
-            for msg in normalized_messages:
-                # 转换为标准消息格式
-                converted_msg = self._convert_progress_message_to_standard(msg)
-                if converted_msg:
-                    progress_map[parent_tool_use_id].append(converted_msg)
-                    converted_count += 1
+    def _dedupe_progress_messages(
+        self, progress_map: Dict[str, List[dict]]
+    ) -> Dict[str, List[dict]]:
+        """
+        对每个 tool_use 的 subagent 消息去重并保持顺序
 
-            logger.debug(
-                f"Extracted progress message | parentToolUseID: {parent_tool_use_id} | "
-                f"normalized_messages_count: {len(normalized_messages)} | "
-                f"converted_count: {converted_count}"
-            )
+        Args:
+            progress_map: parentToolUseID -> subagent 消息列表的映射（会被修改）
 
-        # 去重并保持顺序（基于 timestamp）
+        Returns:
+            Dict[str, List[dict]]: 去重后的映射
+        """
         for tool_use_id in progress_map:
             messages = progress_map[tool_use_id]
             # 使用 dict 去重（基于 uuid 或 timestamp）
@@ -776,7 +988,7 @@ class ClaudeSessionOperations:
 
         Args:
             message_data: 原始消息数据
-            tool_use_map: tool_use_id -> message_data 映射（会被修改）
+            tool_use_map: tool_use_id -> tool_use 内容项映射（会被修改）
 
         Returns:
             处理后的消息数据
@@ -787,63 +999,45 @@ class ClaudeSessionOperations:
         if not isinstance(content, list) or len(content) == 0:
             return message_data
 
-        # 检查是否包含 tool_use 或 server_tool_use
-        has_tool_use = any(
-            isinstance(item, dict)
-            and item.get("type") in ("tool_use", "server_tool_use")
-            for item in content
-        )
-
-        if has_tool_use:
-            # 为 tool_use 添加 incomplete status（如果没有 output）
-            # 使用浅拷贝以提高性能
-            message_data_copy = copy.copy(message_data)
-            # 深拷贝 message 部分，因为需要修改 content
-            message_data_copy["message"] = copy.deepcopy(
-                message_data.get("message", {})
-            )
-            content_copy = message_data_copy["message"].get("content", [])
-
-            for item in content_copy:
-                if isinstance(item, dict) and item.get("type") in (
-                    "tool_use",
-                    "server_tool_use",
-                ):
-                    tool_use_id = item.get("id")
-                    if tool_use_id:
-                        # 检测重复的 tool_use_id
-                        if tool_use_id in tool_use_map:
-                            logger.warning(
-                                f"Duplicate tool_use_id detected: {tool_use_id} | "
-                                f"timestamp: {message_data.get('timestamp')} | "
-                                f"previous entry will be overwritten"
-                            )
-                        # 记录到 map 中，供后续 tool_result 查找
-                        tool_use_map[tool_use_id] = message_data_copy
+        # 只复制会被修改的层级：消息、message、content 列表，以及 tool_use/thinking 内容项本身
+        # 内容项内部的数据（如体积可能很大的 tool input）不会被修改，直接共享，
+        # 避免深拷贝使大 session 的内存占用翻倍
+        content_copy = list(content)
+        message_data_copy = copy.copy(message_data)
+        message_data_copy["message"] = {**message, "content": content_copy}
 
-                    # 如果没有 output，标记为 incomplete
-                    if "output" not in item and "status" not in item:
-                        item["status"] = "incomplete"
+        # 单次遍历 content，同时处理 tool_use 和 thinking
+        for index, item in enumerate(content_copy):
+            if not isinstance(item, dict):
+                continue
+            item_type = item.get("type")
+
+            if item_type in TOOL_USE_TYPES or item_type == "thinking":
+                item = content_copy[index] = dict(item)
+
+            if item_type in TOOL_USE_TYPES:
+                tool_use_id = item.get("id")
+                if tool_use_id:
+                    # 检测重复的 tool_use_id
+                    if tool_use_id in tool_use_map:
+                        logger.warning(
+                            f"Duplicate tool_use_id detected: {tool_use_id} | "
+                            f"timestamp: {message_data.get('timestamp')} | "
+                            f"previous entry will be overwritten"
+                        )
+                    # 记录内容项到 map 中，后续 tool_result 一次查找即可直接合并
+                    tool_use_map[tool_use_id] = item
 
-            return message_data_copy
-        else:
-            # 普通 assistant 消息（text、thinking 等），需要规范化处理
-            # 使用浅拷贝以提高性能
-            message_data_copy = copy.copy(message_data)
-            # 深拷贝 message 部分，因为需要修改 content
-            message_data_copy["message"] = copy.deepcopy(
-                message_data.get("message", {})
-            )
-            content_copy = message_data_copy["message"].get("content", [])
+                # 如果没有 output，标记为 incomplete
+                if "output" not in item and "status" not in item:
+                    item["status"] = "incomplete"
 
-            # 规范化 thinking 类型：将 thinking 字段转换为 text 字段
-            for item in content_copy:
-                if isinstance(item, dict) and item.get("type") == "thinking":
-                    # 如果存在 thinking 字段但没有 text 字段，则进行转换
-                    if "thinking" in item and "text" not in item:
-                        item["text"] = item.pop("thinking")
+            elif item_type == "thinking":
+                # 规范化 thinking 类型：将 thinking 字段转换为 text 字段
+                if "thinking" in item and "text" not in item:
+                    item["text"] = item.pop("thinking")
 
-            return message_data_copy
+        return message_data_copy
 
     def _merge_tool_use_with_result(self, raw_messages: List[dict]) -> List[dict]:
         """
@@ -861,22 +1055,23 @@ class ClaudeSessionOperations:
             List[dict]: 合并后的消息列表
         """
         merged_messages = []
-        # tool_use_id -> message_data 映射
+        # tool_use_id -> tool_use 内容项映射（指向已加入 merged_messages 的副本）
         tool_use_map: Dict[str, dict] = {}
 
-        # 提取所有 progress 消息中的 subagent 对话
+        # progress 消息中的 subagent 对话在主循环中顺带收集，无需单独遍历一遍
         # parentToolUseID -> subagent messages 列表
-        subagent_messages_map = self._extract_progress_messages(raw_messages)
+        subagent_messages_map: Dict[str, List[dict]] = {}
+
+        for i, message_data in enumerate(raw_messages):
+            message_type = message_data.get("type")
 
-        # 标记所有 progress 消息为已处理
-        for message_data in raw_messages:
-            if message_data.get("type") == "progress":
+            # progress 消息提取为 subagent 对话后标记为已处理
+            if message_type == "progress":
+                self._collect_progress_message(message_data, subagent_messages_map)
                 message_data["_dropped"] = True
                 message_data["_drop_reason"] = "progress_extracted"
                 message_data["_expected_drop"] = True
-
-        for i, message_data in enumerate(raw_messages):
-            message_type = message_data.get("type")
+                continue
 
             # 获取下一条消息（用于 command 消息处理）
             next_message_data = (
@@ -900,8 +1095,14 @@ class ClaudeSessionOperations:
                 merged_messages.append(converted_command)
                 continue
 
-            message = message_data.get("message", {})
-            content = message.get("content", [])
+            # 绝大多数消息都带有 message.content，直接下标访问，
+            # 只有缺失字段时才走 .get 分支构造默认值
+            try:
+                message = message_data["message"]
+                content = message["content"]
+            except KeyError:
+                message = message_data.get("message", {})
+                content = message.get("content", [])
 
             # 处理打断消息 - 转换为 assistant role 的消息
             # 需要在处理空消息之前进行，因为打断消息有 content
@@ -916,7 +1117,6 @@ class ClaudeSessionOperations:
                 if message_data.get("_dropped"):
                     continue
 
-                message_type = message_data.get("type")
                 subtype = message_data.get("subtype", "")
 
                 # 对于已知的特殊类型（不含 message 字段的元数据），使用 debug 级别
@@ -979,7 +1179,7 @@ class ClaudeSessionOperations:
                 continue
 
             # 跳过 Warmup 消息（系统预热请求）
-            if message_data.get("type") == "user" and content == "Warmup":
+            if message_type == "user" and content == "Warmup":
                 logger.debug(
                     f"Dropping Warmup message | "
                     f"timestamp: {message_data.get('timestamp')}"
@@ -1004,31 +1204,30 @@ class ClaudeSessionOperations:
                 continue
 
             # 清理用户消息中的开头系统标签
-            if message_data.get("type") == "user" and isinstance(content, str):
+            is_text_converted = message_type == "user" and isinstance(content, str)
+            if is_text_converted:
                 cleaned_content = self._clean_leading_system_tags(content)
                 # 将字符串 content 转换为标准格式 [{type: "text", text: "..."}]
+                # content 整体被替换，浅拷贝 message 即可，不会修改原始数据
+                content = [{"type": "text", "text": cleaned_content}]
                 message_data = copy.copy(message_data)
-                message_data["message"] = copy.deepcopy(message_data.get("message", {}))
-                message_data["message"]["content"] = [
-                    {"type": "text", "text": cleaned_content}
-                ]
-                content = message_data["message"]["content"]
+                message_data["message"] = {**message, "content": content}
 
             # 处理 isMeta 消息（包含 sourceToolUseID 的元数据消息）
             if message_data.get("isMeta") and message_data.get("sourceToolUseID"):
                 # 将 isMeta 消息合并到对应的 tool_use 中
                 self._merge_meta_to_tool_use(message_data, tool_use_map)
-                # 标记为已处理
-                message_data["_dropped"] = True
-                message_data["_drop_reason"] = "merged_into_tool_use"
-                message_data["_expected_drop"] = True
+                # 标记为已处理（message_data 可能已是上面的浅拷贝，标记需写回原始消息，
+                # 否则 debug 模式的丢弃统计会漏掉这条消息）
+                raw_message = raw_messages[i]
+                raw_message["_dropped"] = True
+                raw_message["_drop_reason"] = "merged_into_tool_use"
+                raw_message["_expected_drop"] = True
                 continue
 
             # 处理 user 消息和 assistant 消息中的 tool_result
             # 注意：tool_result 消息可能是 type="user" 或 type="assistant"
-            if message_data.get("type") in ("user", "assistant") and isinstance(
-                content, list
-            ):
+            if message_type in ("user", "assistant") and isinstance(content, list):
                 # 检查是否包含 tool_result
                 tool_results = [
                     item
@@ -1045,8 +1244,8 @@ class ClaudeSessionOperations:
                     # 不单独添加 tool_result 消息（已经合并到 tool_use 中）
                     continue
 
-            # 处理 assistant 消息
-            if isinstance(content, list) and len(content) > 0:
+            # 处理 assistant 消息（由字符串转换而来的 user 消息只包含 text，无需处理）
+            if not is_text_converted and isinstance(content, list) and len(content) > 0:
                 processed_message = self._process_assistant_message(
                     message_data, tool_use_map
                 )
@@ -1055,9 +1254,9 @@ class ClaudeSessionOperations:
                 # 字符串类型的 content（user 消息），直接添加
                 merged_messages.append(message_data)
 
-        # 后处理：将 subagent 消息插入到对应位置
+        # 后处理：将 subagent 消息去重后插入到对应位置
         merged_messages = self._insert_subagent_items(
-            merged_messages, subagent_messages_map
+            merged_messages, self._dedupe_progress_messages(subagent_messages_map)
         )
 
         return merged_messages
@@ -1132,11 +1331,9 @@ class ClaudeSessionOperations:
                     else:
                         content_types.add("other")
 
-                # 创建合并后的消息
+                # 创建合并后的消息（content 会被整体替换，浅拷贝 message 即可）
                 merged_message = copy.copy(current_message)
-                merged_message["message"] = copy.deepcopy(
-                    current_message.get("message", {})
-                )
+                merged_message["message"] = dict(current_message.get("message", {}))
 
                 # 合并所有 content
                 merged_contents = []
@@ -1187,57 +1384,99 @@ class ClaudeSessionOperations:
         Returns:
             List[ClaudeSessionInfo]: session 简要信息列表
         """
-        if not self.session_path.exists():
-            logger.warning(f"Session directory does not exist: {self.session_path}")
-            return []
-
         session_infos = []
         existing_titles = existing_titles or {}
 
-        # 扫描该目录下的所有 session 文件
-        for session_file in self.session_path.glob("*.jsonl"):
-            session_id = session_file.stem
-            is_agent_session = session_file.name.startswith("agent-")
+        # 扫描该目录下的所有 session 文件，先收集元数据
+        # [session_file, session_id, file_mtime, file_size, title]
+        candidates = []
+        # 需要读取文件获取 title 的 (candidate, stat_key)
+        pending = []
+        # 使用 os.scandir 单次遍历目录，DirEntry 自带文件名和类型信息，减少系统调用
+        # 先只按文件名过滤，非 .jsonl 文件、session_id 不合法的文件（与 read_session_contents
+        # 的校验规则一致）和 agent session 文件（subagent 的执行记录）不会触发任何 stat/open；
+        # 目录不存在时由 scandir 直接抛出，无需提前 exists 检查
+        try:
+            with os.scandir(self._session_path_str) as entries:
+                session_entries = [
+                    entry
+                    for entry in entries
+                    if entry.name.endswith(".jsonl")
+                    and not entry.name.startswith("agent-")
+                    and self._is_valid_session_id(entry.name[: -len(".jsonl")])
+                    and entry.is_file()
+                ]
+        except FileNotFoundError:
+            logger.warning(f"Session directory does not exist: {self.session_path}")
+            return []
 
-            # 跳过 agent session 文件（这些是 subagent 的执行记录）
-            if is_agent_session:
-                logger.debug(f"Skipping agent session file: {session_file.name}")
-                continue
+        for entry in session_entries:
+            session_file = entry.path
+            session_id = entry.name[: -len(".jsonl")]
 
             # 获取文件最后修改时间并转换为 datetime
+            stat_key = None
             try:
-                file_stat = session_file.stat()
+                file_stat = entry.stat()
                 file_mtime = datetime.fromtimestamp(file_stat.st_mtime)
                 file_size = file_stat.st_size
+                stat_key = (file_stat.st_mtime_ns, file_stat.st_size)
             except Exception as e:
                 logger.warning(f"Failed to get file stat for {session_file}: {e}")
                 file_mtime = None
                 file_size = None
 
-            # 如果已有 title，直接使用；否则读取文件获取
-            title = None
-            if session_id in existing_titles and existing_titles[session_id]:
-                title = existing_titles[session_id]
+            candidate = [session_file, session_id, file_mtime, file_size, None]
+            candidates.append(candidate)
+
+            # 如果已有 title，直接使用
+            if existing_titles.get(session_id):
+                candidate[4] = existing_titles[session_id]
                 logger.debug(f"Using existing title for session: {session_id}")
-            else:
-                # 只在需要时读取文件获取 title
-                title, _ = await self._read_session_title(session_file)
+                continue
+
+            # 文件未变化（mtime 和 size 一致）时复用上次读取的 title，无需打开文件
+            # （包括没有 title 的文件，缓存值为 None）
+            if stat_key is not None:
+                cached = _title_cache.get((session_file, *stat_key), _MISSING)
+                if cached is not _MISSING:
+                    candidate[4] = cached
+                    logger.debug(f"Using cached title for session: {session_id}")
+                    continue
+
+            pending.append((candidate, stat_key))
+
+        # 并发读取缺少 title 的 session 文件，使用信号量限制并发数，避免文件句柄耗尽
+        if pending:
+            semaphore = asyncio.Semaphore(SCAN_SESSIONS_CONCURRENCY)
+
+            async def read_title(session_file: str) -> Optional[str]:
+                async with semaphore:
+                    title, _ = await self._read_session_title(session_file)
+                    return title
 
+            titles = await asyncio.gather(*(read_title(c[0]) for c, _ in pending))
+            for (candidate, stat_key), title in zip(pending, titles):
+                candidate[4] = title
+                if stat_key is not None:
+                    _title_cache.put((candidate[0], *stat_key), title)
+
+        for session_file, session_id, file_mtime, file_size, title in candidates:
             # 如果没有标题，说明可能没有产生真实会话，过滤掉该 session
             if not title:
                 logger.debug(
                     f"Skipping session without title: {session_id} | "
-                    f"file: {session_file.name}"
+                    f"file: {session_file}"
                 )
                 continue
 
             session_info = ClaudeSessionInfo(
                 session_id=session_id,
-                session_file=str(session_file),
+                session_file=session_file,
                 title=title,
                 file_mtime=file_mtime,
                 file_size=file_size,
-                is_agent_session=is_agent_session,
+                is_agent_session=False,
             )
             session_infos.append(session_info)
 
@@ -1247,7 +1486,7 @@ class ClaudeSessionOperations:
         return session_infos
 
     async def _read_session_title(
-        self, session_file: Path, max_length: int = DEFAULT_TITLE_MAX_LENGTH
+        self, session_file: Union[str, Path], max_length: int = DEFAULT_TITLE_MAX_LENGTH
     ) -> tuple[Optional[str], int]:
         """
         从 session 文件中读取标题
@@ -1269,85 +1508,130 @@ class ClaudeSessionOperations:
             tuple[Optional[str], int]: (session 标题, 提取标题的行号)，
                                        如果未找到则返回 (None, 0)
         """
+        # 打开、读取、解析、关闭整体在一次线程切换中完成，
+        # 而不是每次文件操作都经过 aiofiles 的线程池
+        return await asyncio.to_thread(
+            self._read_session_title_sync, session_file, max_length
+        )
+
+    def _read_session_title_sync(
+        self, session_file: Union[str, Path], max_length: int = DEFAULT_TITLE_MAX_LENGTH
+    ) -> tuple[Optional[str], int]:
+        """
+        从 session 文件中读取标题（同步实现，由 _read_session_title 在线程中调用）
+
+        Args:
+            session_file: session 文件路径
+            max_length: 标题最大长度（超过则截取并添加省略号）
+
+        Returns:
+            tuple[Optional[str], int]: (session 标题, 提取标题的行号)，
+                                       如果未找到则返回 (None, 0)
+        """
+        file_name = os.path.basename(session_file)
         try:
             line_number = 0
-            async with aiofiles.open(session_file, "r", encoding="utf-8") as f:
-                async for raw_line in f:
-                    line = raw_line.strip()
-                    if not line:
+            # 以二进制模式读取，UTF-8 解码交给 orjson 完成，省去文本层的解码开销
+            # 按块读取到复用的缓冲区，不需要 BufferedReader 的额外缓冲
+            with open(session_file, "rb", buffering=0) as f:
+                # 标题通常在文件开头几行，第一个块内即可找到
+                for line in _iter_chunked_lines(f, _get_title_scan_buffer()):
+                    if (
+                        not line
+                        or line.startswith(_META_LINE_PREFIXES)
+                        or line.isspace()
+                    ):
                         continue
 
                     try:
-                        message_data = json.loads(line)
-                        msg_type = message_data.get("type", "")
+                        message_data = _json_loads(line)
 
-                        # 跳过 file-history-snapshot 和 summary（不增加行号）
-                        if msg_type in ("file-history-snapshot", "summary"):
-                            logger.debug(f"Skipping {msg_type} in {session_file.name}")
+                        # 跳过 file-history-snapshot、summary 和 Warmup 消息（不增加行号）
+                        if not self._is_title_candidate(message_data):
                             continue
 
                         # 只在有效行增加行号计数
                         line_number += 1
 
-                        # 检查消息内容
-                        message = message_data.get("message", {})
-                        if isinstance(message, dict):
-                            role = message.get("role", "")
-                            content = message.get("content", "")
-
-                            # 如果是用户消息
-                            if role == "user":
-                                # 跳过 Warmup 消息（系统预热请求）
-                                if content == "Warmup":
-                                    logger.debug(
-                                        f"Skipping Warmup message in {session_file.name}"
-                                    )
-                                    # 回退行号计数（因为这不是有效的内容行）
-                                    line_number -= 1
-                                    continue
-
-                                # 优先检查是否是 command 消息，如果是则提取 command 名称
-                                command_name = self._extract_command_name(content)
-                                if command_name:
-                                    title = self._truncate_title(
-                                        command_name, max_length
-                                    )
-                                    if title:
-                                        logger.debug(
-                                            f"Extracted command title from user message in {session_file.name} at line {line_number}: {title}"
-                                        )
-                                        return title, line_number
-
-                                # 使用用户消息内容作为标题
-                                if content:
-                                    title = self._truncate_title(
-                                        str(content), max_length
-                                    )
-                                    if title:
-                                        logger.debug(
-                                            f"Extracted title from user message in {session_file.name} at line {line_number}: {title}"
-                                        )
-                                        return title, line_number
-
-                            # 如果是 assistant 消息（用于 agent session）
-                            elif role == "assistant":
-                                # 尝试从 content 中提取 text
-                                text = self._extract_text_from_content(content)
-                                if text:
-                                    title = self._truncate_title(text, max_length)
-                                    if title:
-                                        logger.debug(
-                                            f"Extracted title from assistant message in {session_file.name} at line {line_number}: {title}"
-                                        )
-                                        return title, line_number
-
-                    except json.JSONDecodeError:
+                        title = self._extract_title_from_message(
+                            message_data, max_length
+                        )
+                        if title:
+                            logger.debug(
+                                f"Extracted title from {file_name} at line {line_number}: {title}"
+                            )
+                            return title, line_number
+
+                    except orjson.JSONDecodeError:
                         # 跳过无法解析的行，继续尝试下一行
                         continue
         except (IOError, UnicodeDecodeError, OSError) as e:
             logger.warning(f"Failed to read title from {session_file}: {e}")
         return None, 0
 
+    def _is_title_candidate(self, message_data: dict) -> bool:
+        """
+        判断消息是否参与标题提取
+
+        file-history-snapshot、summary 以及 Warmup 消息（系统预热请求）不是有效的内容行。
+
+        Args:
+            message_data: 已解析的消息数据
+
+        Returns:
+            bool: 是否参与标题提取
+        """
+        if message_data.get("type", "") in META_MESSAGE_TYPES:
+            return False
+        message = message_data.get("message")
+        return not (
+            isinstance(message, dict)
+            and message.get("role") == "user"
+            and message.get("content") == "Warmup"
+        )
+
+    def _extract_title_from_message(
+        self, message_data: dict, max_length: int = DEFAULT_TITLE_MAX_LENGTH
+    ) -> Optional[str]:
+        """
+        从单条已解析的消息中提取标题
+
+        Args:
+            message_data: 已解析的消息数据
+            max_length: 标题最大长度（超过则截取并添加省略号）
+
+        Returns:
+            Optional[str]: 标题，如果该消息不能作为标题则返回 None
+        """
+        message = message_data.get("message", {})
+        if not isinstance(message, dict):
+            return None
+
+        role = message.get("role", "")
+        content = message.get("content", "")
+
+        # 如果是用户消息
+        if role == "user":
+            # 优先检查是否是 command 消息，如果是则提取 command 名称
+            command_name = self._extract_command_name(content)
+            if command_name:
+                title = self._truncate_title(command_name, max_length)
+                if title:
+                    return title
+
+            # 使用用户消息内容作为标题
+            if content:
+                return self._truncate_title(str(content), max_length) or None
+
+        # 如果是 assistant 消息（用于 agent session）
+        elif role == "assistant":
+            # 尝试从 content 中提取 text
+            text = self._extract_text_from_content(content)
+            if text:
+                return self._truncate_title(text, max_length) or None
+
+        return None
+
     def _extract_command_name(self, content: str) -> Optional[str]:
         """
         从 content 中提取 command 名称
@@ -1368,11 +1652,11 @@ class ClaudeSessionOperations:
         # 严格匹配整个 content 必须是 command 消息格式
         # 格式 1：<command-message>xxx</command-message> <换行> <command-name>xxx</command-name>
         # 格式 2：<command-message>xxx</command-message> <换行> <command-name>xxx</command-name> <换行> <command-args>xxx</command-args>
-        # 前后不能有其他字符
-        command_pattern = re.compile(
-            r"^<command-message>.*?</command-message>\s*<command-name>(.*?)</command-name>(?:\s*<command-args>.*?)?$"
-        )
-        match = command_pattern.match(content.strip())
+        # 前后不能有其他字符，不以 <command-message> 开头的内容无需执行正则
+        content = content.strip()
+        if not content.startswith("<command-message>"):
+            return None
+        match = _COMMAND_NAME_PATTERN.match(content)
 
         if match:
             return match.group(1)
@@ -1401,10 +1685,12 @@ class ClaudeSessionOperations:
         """
         # 匹配开头连续的系统标签（使用非贪婪匹配）
         # 这个模式会匹配开头零个或多个连续的系统标签
-        leading_tags_pattern = r"^(?:(?:<local-command-caveat>.*?</local-command-caveat>\s*|(?:<command-name>.*?</command-name>\s*)|(?:<command-message>.*?</command-message>\s*)|(?:<command-args>.*?</command-args>\s*)|(?:<local-command-stdout>.*?</local-command-stdout>\s*)|(?:<local-command-stderr>.*?</local-command-stderr>\s*))+)"
+        # 不以 "<" 开头的文本不可能包含开头的系统标签，无需执行正则
+        if not text.startswith("<"):
+            return text.strip()
 
         # 只移除开头的系统标签
-        cleaned_text = re.sub(leading_tags_pattern, "", text, flags=re.DOTALL)
+        cleaned_text = _LEADING_SYSTEM_TAGS_PATTERN.sub("", text)
 
         return cleaned_text.strip()
 
@@ -1426,19 +1712,9 @@ class ClaudeSessionOperations:
         Returns:
             str: 清理后的文本
         """
-        # 定义需要清理的系统标签模式
-        system_tag_patterns = [
-            r"<local-command-caveat>.*?</local-command-caveat>\s*",
-            r"<command-name>.*?</command-name>\s*",
-            r"<command-message>.*?</command-message>\s*",
-            r"<command-args>.*?</command-args>\s*",
-            r"<local-command-stdout>.*?</local-command-stdout>\s*",
-            r"<local-command-stderr>.*?</local-command-stderr>\s*",
-        ]
-
         cleaned_text = text
-        for pattern in system_tag_patterns:
-            cleaned_text = re.sub(pattern, "", cleaned_text, flags=re.DOTALL)
+        for pattern in _SYSTEM_TAG_PATTERNS:
+            cleaned_text = pattern.sub("", cleaned_text)
 
         return cleaned_text.strip()
 
@@ -1485,11 +1761,28 @@ class ClaudeSessionOperations:
         return None
 
     async def _extract_project_path_from_session(
-        self, session_file: Path
+        self, session_file: Union[str, Path]
     ) -> Optional[str]:
         """
         从 session 文件中提取项目路径（遍历所有行直到找到 cwd）
 
+        Args:
+            session_file: session 文件路径
+
+        Returns:
+            Optional[str]: 项目路径，如果未找到则返回 None
+        """
+        # 与读取标题相同，整个文件读取在一次线程切换中完成
+        return await asyncio.to_thread(
+            self._extract_project_path_from_session_sync, session_file
+        )
+
+    def _extract_project_path_from_session_sync(
+        self, session_file: Union[str, Path]
+    ) -> Optional[str]:
+        """
+        从 session 文件中提取项目路径（同步实现，由 _extract_project_path_from_session 在线程中调用）
+
         Args:
             session_file: session 文件路径
 
@@ -1497,16 +1790,16 @@ class ClaudeSessionOperations:
             Optional[str]: 项目路径，如果未找到则返回 None
         """
         try:
-            async with aiofiles.open(session_file, "r", encoding="utf-8") as f:
-                async for line in f:
-                    line = line.strip()
-                    if line:
+            with open(session_file, "rb") as f:
+                for line in f:
+                    # 不包含 "cwd" 键的行无需解析
+                    if b'"cwd"' in line:
                         try:
-                            message_data = json.loads(line)
+                            message_data = _json_loads(line)
                             # 尝试从 cwd 字段获取项目路径
                             if "cwd" in message_data and message_data["cwd"]:
                                 return message_data["cwd"]
-                        except json.JSONDecodeError:
+                        except orjson.JSONDecodeError:
                             # 跳过无法解析的行，继续尝试下一行
                             continue
         except (IOError, UnicodeDecodeError, OSError) as e:
@@ -1524,42 +1817,43 @@ class ClaudeSessionOperations:
         if not self.session_path.exists():
             return None, None
 
-        # 获取所有 session 文件并按修改时间排序（最新的在前）
-        session_files = list(self.session_path.glob("*.jsonl"))
+        # 获取所有 session 文件及其修改时间（os.scandir 单次遍历目录，DirEntry.stat 会缓存结果）
+        # [(mtime, session_file)]
+        session_files = []
+        try:
+            with os.scandir(self._session_path_str) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".jsonl"):
+                        continue
+                    try:
+                        session_files.append((entry.stat().st_mtime, entry.path))
+                    except OSError as e:
+                        logger.warning(f"Failed to stat {entry.path}: {e}")
+        except OSError as e:
+            logger.warning(f"Failed to list session files in {self.session_path}: {e}")
+            return None, None
         if not session_files:
             return None, None
 
         # 按文件修改时间逆序排序（最新的在前）
-        try:
-            session_files.sort(
-                key=lambda f: f.stat().st_mtime if f.exists() else 0, reverse=True
-            )
-        except OSError as e:
-            logger.warning(f"Failed to sort session files by mtime: {e}")
-            # 排序失败，继续使用未排序的列表
+        session_files.sort(key=lambda item: item[0], reverse=True)
 
         # 从最近的 session 文件开始查找项目路径
-        for session_file in session_files:
-            try:
-                project_path = await self._extract_project_path_from_session(
-                    session_file
+        for mtime, session_file in session_files:
+            project_path = await self._extract_project_path_from_session(session_file)
+            if project_path:
+                # 使用文件修改时间作为最后活跃时间
+                file_mtime = datetime.fromtimestamp(mtime)
+                logger.debug(
+                    f"Found project path: {project_path} from "
+                    f"{os.path.basename(session_file)} (mtime: {file_mtime})"
                 )
-                if project_path:
-                    # 获取文件修改时间作为最后活跃时间
-                    file_mtime = datetime.fromtimestamp(session_file.stat().st_mtime)
-                    logger.debug(
-                        f"Found project path: {project_path} from {session_file.name} "
-                        f"(mtime: {file_mtime})"
-                    )
-                    return project_path, file_mtime
-            except OSError as e:
-                logger.warning(f"Failed to stat {session_file}: {e}")
-                continue
+                return project_path, file_mtime
 
         return None, None
 
     async def _load_session_data(
-        self, session_file: Path, debug: bool = False
+        self, session_file: Union[str, Path], debug: bool = False
     ) -> tuple[Optional[ClaudeSession], dict]:
         """
         完整加载 session 数据（包含所有 messages）
@@ -1593,8 +1887,10 @@ class ClaudeSessionOperations:
                     - dropped_samples: 最多 2 条被丢弃消息的示例
                     - error: 错误信息（如果有）
         """
-        session_id = session_file.stem
-        is_agent_session = session_file.name.startswith("agent-")
+        session_file_str = os.fspath(session_file)
+        file_name = os.path.basename(session_file_str)
+        session_id = os.path.splitext(file_name)[0]
+        is_agent_session = file_name.startswith("agent-")
 
         # 初始化调试信息（只初始化基本字段，详细字段按需初始化）
         debug_info: Dict[str, Any] = {
@@ -1627,12 +1923,19 @@ class ClaudeSessionOperations:
 
         try:
             # 获取文件统计信息
-            file_stat = session_file.stat()
+            file_stat = os.stat(session_file_str)
             file_mtime = datetime.fromtimestamp(file_stat.st_mtime)
             file_size = file_stat.st_size
 
-            # 读取会话标题
-            title, _ = await self._read_session_title(session_file)
+            # 文件未变化（mtime 和 size 一致）时直接返回缓存的解析结果
+            # （debug 模式需要重新统计，不走缓存）
+            # 同时比较 size，避免 mtime 精度较低的文件系统上同一时刻内的追加写入被忽略
+            cache_key = (session_file_str, file_stat.st_mtime_ns, file_size)
+            if not debug:
+                cached_session = _session_cache.get(cache_key)
+                if cached_session is not None:
+                    logger.debug(f"Using cached session data for {file_name}")
+                    return _copy_cached_session(cached_session), debug_info
 
             # 【性能优化】使用流式读取 + orjson 解析
             # 对于大文件（如 199MB），流式读取可以显著减少内存使用
@@ -1643,82 +1946,114 @@ class ClaudeSessionOperations:
             total_lines = 0
             empty_lines = 0
             invalid_json_lines = 0
+            # 重复字段值 -> 共享的 str 对象（缓存的 session 会常驻内存，避免重复的字符串副本）
+            shared_values: Dict[str, str] = {}
 
             # 在 debug 模式下的统计变量
             raw_meta = raw_user = raw_assistant = raw_system = 0
             raw_tool_use = raw_tool_result = raw_thinking = 0
+            # 按行首前缀跳过的元数据行数量（计入原始消息和丢弃统计）
+            skipped_meta_lines = 0
+
+            # 以二进制模式读取，orjson 直接解析 bytes，省去 TextIOWrapper 的解码开销
+            # 大文件通过 mmap 读取，减少一次用户态拷贝
+            for line in _iter_session_file_lines(session_file_str, file_size):
+                total_lines += 1
+                # orjson 可以直接解析带首尾空白（包括换行符）的行，无需 strip 复制一份
+                if not line or line.isspace():
+                    empty_lines += 1
+                    continue
 
-            with open(session_file, "r", encoding="utf-8") as f:
-                for line in f:
-                    total_lines += 1
-                    line = line.strip()
-                    if not line:
-                        empty_lines += 1
-                        continue
+                # 元数据行合并时一定会被丢弃，无需解析；debug 与非 debug 模式都跳过，
+                # 保证两种模式下相邻消息（如 command 与其 isMeta 消息）的合并结果一致
+                if line.startswith(_META_LINE_PREFIXES):
+                    if debug:
+                        skipped_meta_lines += 1
+                        if line.startswith(b'{"type":"summary"'):
+                            raw_meta += 1
+                    continue
 
-                    try:
-                        # 使用 orjson 或标准 json 解析
-                        message_data = _json_loads(line)
-                        raw_messages.append(message_data)
-
-                        # 提取时间信息
-                        if "timestamp" in message_data:
-                            timestamp_str = message_data["timestamp"]
-                            timestamp = parse_iso_timestamp(timestamp_str)
-
-                            if timestamp:
-                                if first_active_at is None:
-                                    first_active_at = timestamp
-                                last_active_at = max(
-                                    last_active_at or timestamp, timestamp
-                                )
+                try:
+                    # 使用 orjson 解析
+                    message_data = _json_loads(line)
+                    raw_messages.append(message_data)
+
+                    for field in _DEDUP_MESSAGE_FIELDS:
+                        value = message_data.get(field)
+                        if isinstance(value, str):
+                            message_data[field] = shared_values.setdefault(value, value)
+                    message = message_data.get("message")
+                    if isinstance(message, dict):
+                        for field in _DEDUP_INNER_MESSAGE_FIELDS:
+                            value = message.get(field)
+                            if isinstance(value, str):
+                                message[field] = shared_values.setdefault(value, value)
+
+                    # 提取时间信息
+                    if "timestamp" in message_data:
+                        timestamp_str = message_data["timestamp"]
+                        timestamp = parse_iso_timestamp(timestamp_str)
+
+                        if timestamp:
+                            if first_active_at is None:
+                                first_active_at = timestamp
+                            last_active_at = max(last_active_at or timestamp, timestamp)
+
+                    # 在 debug 模式下同时统计原始消息
+                    if debug:
+                        msg_type = message_data.get("type", "")
+                        message = message_data.get("message", {})
 
-                        # 在 debug 模式下同时统计原始消息
-                        if debug:
-                            msg_type = message_data.get("type", "")
-                            message = message_data.get("message", {})
-
-                            if msg_type == "meta" or msg_type == "summary":
-                                raw_meta += 1
-                            elif msg_type == "user":
-                                raw_user += 1
-                                # 统计 user 消息中的 tool_result
-                                content = message.get("content", [])
-                                if isinstance(content, list):
-                                    for item in content:
-                                        if (
-                                            isinstance(item, dict)
-                                            and item.get("type") == "tool_result"
-                                        ):
-                                            raw_tool_result += 1
-                            elif msg_type == "assistant":
-                                raw_assistant += 1
-                                # 统计 assistant 消息中的 content 类型
-                                content = message.get("content", [])
-                                if isinstance(content, list):
-                                    for item in content:
-                                        if isinstance(item, dict):
-                                            if item.get("type") in (
-                                                "tool_use",
-                                                "server_tool_use",
-                                            ):
-                                                raw_tool_use += 1
-                                            elif item.get("type") == "thinking":
-                                                raw_thinking += 1
-                                elif isinstance(content, str) and content:
-                                    raw_thinking += 1
-                            elif msg_type == "system":
-                                raw_system += 1
-
-                    except (json.JSONDecodeError, KeyError, TypeError):
-                        # 兼容 orjson 和标准 json 的异常
-                        invalid_json_lines += 1
-                        continue
+                        if msg_type == "meta" or msg_type == "summary":
+                            raw_meta += 1
+                        elif msg_type == "user":
+                            raw_user += 1
+                            # 统计 user 消息中的 tool_result
+                            content = message.get("content", [])
+                            if isinstance(content, list):
+                                for item in content:
+                                    if (
+                                        isinstance(item, dict)
+                                        and item.get("type") == "tool_result"
+                                    ):
+                                        raw_tool_result += 1
+                        elif msg_type == "assistant":
+                            raw_assistant += 1
+                            # 统计 assistant 消息中的 content 类型
+                            content = message.get("content", [])
+                            if isinstance(content, list):
+                                for item in content:
+                                    if isinstance(item, dict):
+                                        item_type = item.get("type")
+                                        if item_type in TOOL_USE_TYPES:
+                                            raw_tool_use += 1
+                                        elif item_type == "thinking":
+                                            raw_thinking += 1
+                            elif isinstance(content, str) and content:
+                                raw_thinking += 1
+                        elif msg_type == "system":
+                            raw_system += 1
+
+                except (orjson.JSONDecodeError, KeyError, TypeError):
+                    invalid_json_lines += 1
+                    continue
+
+            # 从已解析的消息中提取会话标题，无需再单独读取一次文件
+            title = None
+            for message_data in raw_messages:
+                if isinstance(message_data, dict) and self._is_title_candidate(
+                    message_data
+                ):
+                    title = self._extract_title_from_message(message_data)
+                    if title:
+                        break
 
             # 在 debug 模式下保存原始消息统计
             if debug:
                 debug_info["raw_total"] = total_lines
-                debug_info["raw_effective"] = len(raw_messages)
+                debug_info["raw_effective"] = len(raw_messages) + skipped_meta_lines
+                # 按前缀跳过的元数据行同样属于被丢弃的消息
+                debug_info["dropped_messages"] = skipped_meta_lines
                 debug_info["raw_meta"] = raw_meta
                 debug_info["raw_user"] = raw_user
                 debug_info["raw_assistant"] = raw_assistant
@@ -1737,42 +2072,51 @@ class ClaudeSessionOperations:
                 )
                 return None, debug_info
 
+            # 使用统一的消息处理流程
+            merged_messages, messages = self._process_session_messages(raw_messages)
+            message_count = len(messages)
+
             # 只在 debug 模式下收集被丢弃的消息
             if debug:
                 # 收集被丢弃的消息（用于调试）
+                # _dropped 标记由 _process_session_messages 设置，必须在处理之后收集
                 dropped = [m for m in raw_messages if m.get("_dropped", False)]
-                debug_info["dropped_messages"] = len(dropped)
+                debug_info["dropped_messages"] += len(dropped)
 
                 # 保存最多 2 条被丢弃的消息样本
                 for dropped_msg in dropped[:2]:
+                    # 被丢弃的消息可能缺少 message 字段或其值不是字典（如 empty_message_field）
+                    dropped_message = dropped_msg.get("message")
+                    if not isinstance(dropped_message, dict):
+                        dropped_message = {}
                     sample = {
                         "type": dropped_msg.get("type"),
                         "timestamp": dropped_msg.get("timestamp"),
-                        "role": dropped_msg.get("message", {}).get("role"),
+                        "role": dropped_message.get("role"),
                         "drop_reason": dropped_msg.get("_drop_reason", "unknown"),
                         "_expected_drop": dropped_msg.get("_expected_drop", False),
                         "subtype": dropped_msg.get("subtype"),
                     }
-                    content = dropped_msg.get("message", {}).get("content")
+                    content = dropped_message.get("content")
                     if isinstance(content, str):
                         sample["content_preview"] = content[:100]
                     elif isinstance(content, list) and len(content) > 0:
-                        sample["content_preview"] = (
-                            f"[{content[0].get('type', 'unknown')}]"
+                        first_item = content[0]
+                        first_type = (
+                            first_item.get("type", "unknown")
+                            if isinstance(first_item, dict)
+                            else "unknown"
                         )
+                        sample["content_preview"] = f"[{first_type}]"
                     elif dropped_msg.get("type") == "summary":
                         summary_text = dropped_msg.get("summary", "")
                         sample["content_preview"] = str(summary_text)[:100]
                     debug_info["dropped_samples"].append(sample)
 
-            # 使用统一的消息处理流程
-            merged_messages, messages = self._process_session_messages(raw_messages)
-            message_count = len(messages)
-
             # 如果合并后消息条数为 0，返回 None（所有消息都被过滤掉了）
             if message_count == 0:
                 logger.warning(
-                    f"All messages were filtered out after merging in {session_file.name} | "
+                    f"All messages were filtered out after merging in {file_name} | "
                     f"total_lines: {total_lines} | "
                     f"raw_messages count: {len(raw_messages)} | "
                     f"empty_lines: {empty_lines} | "
@@ -1790,22 +2134,23 @@ class ClaudeSessionOperations:
                     if isinstance(content, list):
                         for item in content:
                             if isinstance(item, dict):
-                                if item.get("type") in ("tool_use", "server_tool_use"):
+                                item_type = item.get("type")
+                                if item_type in TOOL_USE_TYPES:
                                     debug_info["merged_tool_use"] += 1
                                     if item.get("status") == "complete":
                                         debug_info["merged_tool_use_complete"] += 1
                                     elif item.get("status") == "incomplete":
                                         debug_info["merged_tool_use_incomplete"] += 1
-                                elif item.get("type") == "text":
+                                elif item_type == "text":
                                     debug_info["merged_text"] += 1
-                                elif item.get("type") == "thinking":
+                                elif item_type == "thinking":
                                     debug_info["merged_thinking"] += 1
                     elif isinstance(content, str):
                         debug_info["merged_text"] += 1
 
             session = ClaudeSession(
                 session_id=session_id,
-                session_file=str(session_file),
+                session_file=session_file_str,
                 title=title,
                 session_file_md5=None,
                 file_mtime=file_mtime,
@@ -1819,7 +2164,10 @@ class ClaudeSessionOperations:
                 message_count=message_count,
             )
 
-            return session, debug_info
+            # 写入 LRU 缓存，超出数量或总大小上限时淘汰最久未使用的 session
+            _session_cache.put(cache_key, session, weight=file_size)
+
+            return _copy_cached_session(session), debug_info
 
         except (IOError, UnicodeDecodeError, OSError) as e:
             debug_info["error"] = f"Failed to read file: {e}"
@@ -1840,6 +2188,7 @@ class ClaudeSessionOperations:
         Returns:
             Optional[ClaudeSession]: session 完整数据，包含 messages
                                     如果找不到则返回 None
+                                    （messages 中的 ClaudeMessage 与解析缓存共享，只读）
 
         Raises:
             ValueError: 如果 session_id 无效（包含路径遍历字符等）
@@ -1847,21 +2196,17 @@ class ClaudeSessionOperations:
         # 验证 session_id，防止路径遍历攻击
         self._validate_session_id(session_id)
 
-        if not self.session_path.exists():
-            logger.warning(f"Session directory does not exist: {self.session_path}")
-            return None
-
-        # 查找匹配的 session 文件
-        session_files = [
-            f
-            for f in self.session_path.glob("*.jsonl")
-            if f.stem == session_id or f.name == f"{session_id}.jsonl"
-        ]
-
-        for session_file in session_files:
+        # session 文件名就是 {session_id}.jsonl（session_id 已校验不含路径分隔符），
+        # 直接拼接路径查找，无需遍历目录
+        session_file = os.path.join(self._session_path_str, f"{session_id}.jsonl")
+        if os.path.isfile(session_file):
             session, _ = await self._load_session_data(session_file)
             if session:
                 return session
+        elif not os.path.isdir(self._session_path_str):
+            # 只在找不到文件时才检查目录是否存在，常见路径只需一次 stat
+            logger.warning(f"Session directory does not exist: {self.session_path}")
+            return None
 
         logger.warning(f"Session not found: {session_id}")
         return None
@@ -4,8 +4,23 @@ Settings 文件操作辅助模块
 """
 
 import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
+
+
+def _get_new_file_mode() -> int:
+    """计算 open() 新建文件时的默认权限（0o666 去掉 umask）"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# 新建配置文件的权限，与直接 open() 创建的文件一致（在导入时计算一次，避免运行时修改 umask）
+_NEW_FILE_MODE = _get_new_file_mode()
 
 
 def load_config(config_path: Path, key_path: list[str] | None = None) -> dict:
@@ -34,16 +49,7 @@ def load_config(config_path: Path, key_path: list[str] | None = None) -> dict:
             key_path=["projects", "/path/to/project"]
         )
     """
-    if not config_path.exists():
-        return {}
-
-    try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            full_config = json.load(f)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"解析 {config_path} 失败: {e}")
-    except Exception as e:
-        raise ValueError(f"读取 {config_path} 失败: {e}")
+    full_config = _read_config_file(config_path)
 
     # 如果没有 key_path，直接返回完整配置
     if not key_path:
@@ -125,80 +131,69 @@ def update_config(
             split_key=False
         )
     """
-    # 读取完整配置
-    if config_path.exists():
-        try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                config = json.load(f)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"解析 {config_path} 失败: {e}")
-        except Exception as e:
-            raise ValueError(f"读取 {config_path} 失败: {e}")
-    else:
-        config = {}
+    with edit_config(config_path, key_path=key_path) as editor:
+        editor.set(key, value, split_key=split_key)
 
-    # 1. 先根据 key_path 定位到根对象
-    root_obj = config
-    if key_path:
-        for k in key_path:
-            if k not in root_obj:
-                root_obj[k] = {}
-            if not isinstance(root_obj[k], dict):
-                raise KeyError(f"路径 '{k}' 不是字典类型，无法设置子键")
-            root_obj = root_obj[k]
 
-    # 2. 在根对象上对 key 进行 split 和更新
-    if split_key:
-        # 默认行为：支持点号分隔的嵌套键
-        if "." in key:
-            keys = key.split(".")
-        else:
-            keys = [key]
-    else:
-        # split_key=False：将 key 作为完整的键名，不进行分割
-        keys = [key]
+class ConfigEditor:
+    """
+    配置批量编辑器，由 edit_config 创建
 
-    # 3. 导航到最后一级的父对象
-    current = root_obj
-    for k in keys[:-1]:
-        if k not in current:
-            current[k] = {}
-        if not isinstance(current[k], dict):
-            raise KeyError(f"路径 '{k}' 不是字典类型，无法设置子键")
-        current = current[k]
+    在内存中的完整配置上应用多次修改，修改规则与 update_config 相同
+    """
 
-    # 4. 设置或删除最终键
-    final_key = keys[-1]
+    def __init__(self, config: dict, key_path: list[str] | None = None):
+        self.config = config
+        self._key_path = key_path
 
-    if value is None:
-        # 删除操作
-        if final_key in current:
-            del current[final_key]
+    def set(self, key: str, value: Any, split_key: bool = True) -> None:
+        """
+        设置或删除配置项
 
-            # 检查是否需要清理空的父对象
-            # 先清理 key 对应的空对象
-            _cleanup_empty_objects(root_obj, keys[:-1])
+        Args:
+            key: 配置项的键，支持点号分隔的嵌套键
+            value: 配置项的值。如果为 None，则删除该键
+            split_key: 是否对 key 进行点号分割，默认为 True
 
-            # 如果 key_path 存在，再清理 key_path 对应的空对象
-            if key_path:
-                _cleanup_empty_objects(config, key_path)
-        else:
-            # key 不存在，但仍需检查 key_path 对应的空对象
-            if key_path:
-                _cleanup_empty_objects(config, key_path)
-    else:
-        # 设置值
-        current[final_key] = value
+        Raises:
+            KeyError: 当无法定位到键路径时抛出异常
+        """
+        _apply_update(self.config, self._key_path, key, value, split_key)
 
-    # 确保目录存在
-    config_path.parent.mkdir(parents=True, exist_ok=True)
+
+@contextmanager
+def edit_config(
+    config_path: Path, key_path: list[str] | None = None
+) -> Iterator[ConfigEditor]:
+    """
+    批量编辑配置文件
+
+    进入时读取一次配置，退出时写回一次；with 块内抛出异常时不写入文件
+
+    Args:
+        config_path: 配置文件路径
+        key_path: 可选的嵌套路径，用于定位配置中的特定子节点
+
+    Yields:
+        ConfigEditor: 配置编辑器
+
+    Raises:
+        ValueError: 当读取或保存配置失败时抛出异常
+
+    Example:
+        with edit_config(
+            Path.home() / ".claude" / "settings.json", key_path=["env"]
+        ) as editor:
+            editor.set("HTTP_PROXY", "http://127.0.0.1:7890")
+            editor.set("HTTPS_PROXY", "http://127.0.0.1:7890")
+    """
+    config = _read_config_file(config_path)
+    # 记录修改前的序列化结果，内容未变化时跳过写入
+    original = _serialize_config(config)
+    yield ConfigEditor(config, key_path)
 
     # 保存配置
-    try:
-        with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        raise ValueError(f"保存 {config_path} 失败: {e}")
+    _write_config_file(config_path, config, original=original)
 
 
 def convert_config_value(value: str, value_type: str) -> Any:
@@ -298,15 +293,8 @@ def save_config(config_path: Path, config: dict) -> None:
         config = {"mcpServers": {"server1": {"command": "node"}}}
         save_config(Path.home() / ".claude" / "settings.json", config)
     """
-    # 确保目录存在
-    config_path.parent.mkdir(parents=True, exist_ok=True)
-
     # 保存配置
-    try:
-        with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        raise ValueError(f"保存 {config_path} 失败: {e}")
+    _write_config_file(config_path, config)
 
 
 def load_project_config(claude_json_path: Path, project_path: Path) -> dict:
@@ -516,17 +504,9 @@ def add_to_config(
             value="server1"
         )
     """
-    # 加载完整配置
-    if config_path.exists():
-        try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                config = json.load(f)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"解析 {config_path} 失败: {e}")
-        except Exception as e:
-            raise ValueError(f"读取 {config_path} 失败: {e}")
-    else:
-        config = {}
+    # 加载完整配置，并记录修改前的序列化结果
+    config = _read_config_file(config_path)
+    original = _serialize_config(config)
 
     # 1. 先根据 key_path 定位到根对象
     root_obj = config
@@ -564,13 +544,8 @@ def add_to_config(
     if value not in current[final_key]:
         current[final_key].append(value)
 
-    # 确保目录存在并保存配置
-    config_path.parent.mkdir(parents=True, exist_ok=True)
-    try:
-        with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        raise ValueError(f"保存 {config_path} 失败: {e}")
+    # 保存配置（内容未变化时跳过写入）
+    _write_config_file(config_path, config, original=original)
 
 
 def remove_from_config(
@@ -611,17 +586,9 @@ def remove_from_config(
             value="server1"
         )
     """
-    # 加载完整配置
-    if config_path.exists():
-        try:
-            with open(config_path, "r", encoding="utf-8") as f:
-                config = json.load(f)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"解析 {config_path} 失败: {e}")
-        except Exception as e:
-            raise ValueError(f"读取 {config_path} 失败: {e}")
-    else:
-        config = {}
+    # 加载完整配置，并记录修改前的序列化结果
+    config = _read_config_file(config_path)
+    original = _serialize_config(config)
 
     # 1. 先根据 key_path 定位到根对象
     root_obj = config
@@ -667,13 +634,8 @@ def remove_from_config(
         # 如果列表为空，可以保留空列表或删除键
         # 这里选择保留空列表，以便后续添加
 
-    # 确保目录存在并保存配置
-    config_path.parent.mkdir(parents=True, exist_ok=True)
-    try:
-        with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        raise ValueError(f"保存 {config_path} 失败: {e}")
+    # 保存配置（内容未变化时跳过写入）
+    _write_config_file(config_path, config, original=original)
 
 
 def add_to_project_config(
@@ -790,9 +752,175 @@ def remove_from_project_config(
     return True
 
 
+def _apply_update(
+    config: dict,
+    key_path: list[str] | None,
+    key: str,
+    value: Any,
+    split_key: bool,
+) -> None:
+    """
+    在完整配置上设置或删除一个键（内部辅助函数）
+
+    Args:
+        config: 完整配置字典
+        key_path: 可选的嵌套路径，用于定位配置中的特定子节点
+        key: 配置项的键
+        value: 配置项的值。如果为 None，则删除该键
+        split_key: 是否对 key 进行点号分割
+
+    Raises:
+        KeyError: 当无法定位到键路径时抛出异常
+    """
+    # 1. 先根据 key_path 定位到根对象
+    root_obj = config
+    if key_path:
+        for k in key_path:
+            if k not in root_obj:
+                root_obj[k] = {}
+            if not isinstance(root_obj[k], dict):
+                raise KeyError(f"路径 '{k}' 不是字典类型，无法设置子键")
+            root_obj = root_obj[k]
+
+    # 2. 在根对象上对 key 进行 split 和更新
+    if split_key:
+        # 默认行为：支持点号分隔的嵌套键
+        if "." in key:
+            keys = key.split(".")
+        else:
+            keys = [key]
+    else:
+        # split_key=False：将 key 作为完整的键名，不进行分割
+        keys = [key]
+
+    # 3. 导航到最后一级的父对象
+    current = root_obj
+    for k in keys[:-1]:
+        if k not in current:
+            current[k] = {}
+        if not isinstance(current[k], dict):
+            raise KeyError(f"路径 '{k}' 不是字典类型，无法设置子键")
+        current = current[k]
+
+    # 4. 设置或删除最终键
+    final_key = keys[-1]
+
+    if value is None:
+        # 删除操作
+        if final_key in current:
+            del current[final_key]
+
+            # 检查是否需要清理空的父对象
+            # 先清理 key 对应的空对象
+            _cleanup_empty_objects(root_obj, keys[:-1])
+
+            # 如果 key_path 存在，再清理 key_path 对应的空对象
+            if key_path:
+                _cleanup_empty_objects(config, key_path)
+        else:
+            # key 不存在，但仍需检查 key_path 对应的空对象
+            if key_path:
+                _cleanup_empty_objects(config, key_path)
+    else:
+        # 设置值
+        current[final_key] = value
+
+
+def _read_config_file(config_path: Path) -> dict:
+    """
+    读取并解析完整的配置文件（内部辅助函数）
+
+    不预先检查文件是否存在，直接打开并在文件不存在时返回空字典，省去一次 stat
+
+    Args:
+        config_path: 配置文件路径
+
+    Returns:
+        dict: 完整配置。如果文件不存在，返回空字典。
+
+    Raises:
+        ValueError: 当文件读取或解析失败时抛出异常
+    """
+    try:
+        return json.loads(config_path.read_bytes())
+    except (FileNotFoundError, NotADirectoryError):
+        return {}
+    except json.JSONDecodeError as e:
+        raise ValueError(f"解析 {config_path} 失败: {e}")
+    except Exception as e:
+        raise ValueError(f"读取 {config_path} 失败: {e}")
+
+
+def _serialize_config(config: dict) -> bytes:
+    """
+    将配置序列化为写入文件的字节内容（内部辅助函数）
+
+    配置文件归用户所有，使用标准库 json 以保证原样往返：orjson 会把超出 64 位的整数读成
+    浮点数、拒绝 NaN/Infinity，并把 NaN 写成 null
+
+    Args:
+        config: 完整配置字典
+
+    Returns:
+        bytes: 2 空格缩进、非 ASCII 字符不转义的 UTF-8 JSON
+    """
+    return json.dumps(config, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def _write_config_file(
+    config_path: Path, config: dict, original: bytes | None = None
+) -> None:
+    """
+    序列化并写入完整的配置文件（内部辅助函数）
+
+    自动创建父目录，输出为 2 空格缩进的 UTF-8 JSON。先一次性写入同目录下唯一命名的临时文件，
+    再通过 os.replace 原子替换目标文件，避免写入中途失败或并发写入留下半截配置。
+    目标为符号链接时替换其指向的文件，并保留原文件的权限位；新建的文件使用默认权限
+
+    Args:
+        config_path: 配置文件路径
+        config: 完整配置字典
+        original: 可选，修改前配置的序列化结果；与本次序列化结果相同且文件已存在时不写入
+
+    Raises:
+        ValueError: 当保存配置失败时抛出异常
+    """
+    try:
+        data = _serialize_config(config)
+    except Exception as e:
+        raise ValueError(f"保存 {config_path} 失败: {e}")
+    # 内容未变化且文件已存在时跳过写入（文件不存在时仍需创建）
+    if data == original and os.path.exists(config_path):
+        return
+
+    target = config_path.resolve()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # mkstemp 生成唯一的临时文件名（并发写入同一配置时互不干扰），且以 0600 权限创建，
+    # 在替换前不会被其他用户读取
+    fd, tmp_name = tempfile.mkstemp(
+        dir=target.parent, prefix=f".{target.name}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        try:
+            shutil.copymode(target, tmp_name)
+        except FileNotFoundError:
+            os.chmod(tmp_name, _NEW_FILE_MODE)
+        os.replace(tmp_name, target)
+    except Exception as e:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise ValueError(f"保存 {config_path} 失败: {e}")
+
+
 def _cleanup_empty_objects(config: dict, key_path: list[str]) -> None:
     """
-    递归清理空的嵌套对象（内部辅助函数）
+    自底向上清理空的嵌套对象（内部辅助函数）
+
+    先沿 key_path 下降一次记录每层的父对象，再逆序删除空字典，遇到非空对象即停止
 
     Args:
         config: 配置字典
@@ -801,26 +929,21 @@ def _cleanup_empty_objects(config: dict, key_path: list[str]) -> None:
     if not key_path:
         return
 
-    # 从最深层的父对象开始检查
-    for i in range(len(key_path) - 1, -1, -1):
-        current_path = key_path[: i + 1]
-        current_obj = config
+    # 一次下降，记录 (父对象, 键)；路径不完整时不做清理
+    parents = []
+    current = config
+    for k in key_path:
+        if not isinstance(current, dict) or k not in current:
+            return
+        parents.append((current, k))
+        current = current[k]
 
-        # 导航到当前检查的对象
-        for k in current_path[:-1]:
-            if k not in current_obj or not isinstance(current_obj[k], dict):
-                break
-            current_obj = current_obj[k]
-
-        # 获取要检查的键
-        check_key = current_path[-1]
-        if (
-            check_key in current_obj
-            and isinstance(current_obj[check_key], dict)
-            and not current_obj[check_key]
-        ):
+    # 从最深层的父对象开始检查
+    for parent, k in reversed(parents):
+        child = parent[k]
+        if isinstance(child, dict) and not child:
             # 如果对象为空，则删除它
-            del current_obj[check_key]
+            del parent[k]
         else:
-            # 如果对象不为空或不存在，停止清理
+            # 如果对象不为空，停止清理
             break
@@ -7,9 +7,12 @@ import json
 import tempfile
 from pathlib import Path
 
+import orjson
 import pytest
 
+from src.claude import claude_session_operations as session_ops_module
 from src.claude.claude_config_manager import ClaudeConfigManager
+from src.claude.claude_session_operations import ClaudeSessionOperations
 from src.claude.models import (
     AgentInfo,
     ClaudeMemoryInfo,
@@ -151,8 +154,7 @@ class TestClaudeConfigManager:
         config_manager.update_enable_all_project_mcp_servers(True)
 
         settings_file = temp_project_dir / ".claude" / "settings.local.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert config.get("enableAllProjectMcpServers") is True
 
@@ -330,8 +332,7 @@ class TestClaudeConfigManager:
         config_manager.update_disable_all_hooks(True)
 
         settings_file = temp_project_dir / ".claude" / "settings.local.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert config.get("disableAllHooks") is True
 
@@ -375,8 +376,7 @@ class TestClaudeConfigManager:
             "test-plugin@marketplace", ConfigScope.project
         )
 
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert config["enabledPlugins"]["test-plugin@marketplace"] is True
 
@@ -385,8 +385,7 @@ class TestClaudeConfigManager:
             "test-plugin@marketplace", ConfigScope.project
         )
 
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert config["enabledPlugins"]["test-plugin@marketplace"] is False
 
@@ -502,6 +501,47 @@ class TestClaudeConfigManager:
 
         assert content is None
 
+    # ========== Session 集成测试 ==========
+
+    @pytest.mark.asyncio
+    async def test_scan_sessions_title_cache_shared_across_managers(
+        self, temp_project_dir, temp_user_home, tmp_path, monkeypatch
+    ):
+        """测试每次请求新建的 manager 之间共享标题缓存，文件未变化时不再读取"""
+        session_ops_module._title_cache.clear()
+        session_dir = tmp_path / "sessions"
+        session_dir.mkdir()
+        (session_dir / "session-1.jsonl").write_bytes(
+            orjson.dumps(
+                {"type": "user", "message": {"role": "user", "content": "Hello"}}
+            )
+            + b"\n"
+        )
+
+        calls = []
+        original_read = ClaudeSessionOperations._read_session_title_sync
+
+        def tracking_read(self, *args, **kwargs):
+            calls.append(args[0])
+            return original_read(self, *args, **kwargs)
+
+        monkeypatch.setattr(
+            ClaudeSessionOperations, "_read_session_title_sync", tracking_read
+        )
+
+        def build_manager():
+            return ClaudeConfigManager(
+                str(temp_project_dir), str(temp_user_home), str(session_dir)
+            )
+
+        first = await build_manager().session_ops.scan_sessions()
+        second = await build_manager().session_ops.scan_sessions()
+
+        assert [s.title for s in first] == ["Hello"]
+        assert [s.title for s in second] == ["Hello"]
+        assert len(calls) == 1
+        session_ops_module._title_cache.clear()
+
     # ========== 端到端集成测试 ==========
 
     @pytest.mark.asyncio
@@ -248,8 +248,7 @@ class TestClaudeHooksOperations:
         assert settings_file.exists()
 
         # 验证内容
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert "hooks" in config
         assert "PreToolUse" in config["hooks"]
@@ -266,8 +265,7 @@ class TestClaudeHooksOperations:
         hooks_ops.add_hook(event, hook, scope=ConfigScope.project)
 
         settings_file = temp_project_dir / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         # matcher 不应该存在于配置中
         assert "matcher" not in config["hooks"]["PostToolUse"][0]
@@ -283,8 +281,7 @@ class TestClaudeHooksOperations:
         settings_file = temp_user_home / ".claude" / "settings.json"
         assert settings_file.exists()
 
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert "hooks" in config
         assert "SessionStart" in config["hooks"]
@@ -299,8 +296,7 @@ class TestClaudeHooksOperations:
         settings_file = temp_project_dir / ".claude" / "settings.local.json"
         assert settings_file.exists()
 
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert "hooks" in config
         assert "SessionEnd" in config["hooks"]
@@ -315,8 +311,7 @@ class TestClaudeHooksOperations:
         hooks_ops.add_hook(event, hook2, matcher="test.tool", scope=ConfigScope.project)
 
         settings_file = temp_project_dir / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         matcher_config = config["hooks"]["PreToolUse"][0]
         assert len(matcher_config["hooks"]) == 2
@@ -442,8 +437,7 @@ class TestClaudeHooksOperations:
         hooks_ops.update_disable_all_hooks(True)
 
         settings_file = temp_project_dir / ".claude" / "settings.local.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert config.get("disableAllHooks") is True
 
@@ -452,8 +446,7 @@ class TestClaudeHooksOperations:
         hooks_ops.update_disable_all_hooks(False)
 
         settings_file = temp_project_dir / ".claude" / "settings.local.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert config.get("disableAllHooks") is False
 
@@ -468,8 +461,7 @@ class TestClaudeHooksOperations:
         hooks_ops.update_disable_all_hooks(False)
 
         settings_file = temp_project_dir / ".claude" / "settings.local.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert config.get("disableAllHooks") is False
 
@@ -539,8 +531,7 @@ class TestClaudeHooksOperations:
         hooks_ops.add_hook(event, hook, scope=ConfigScope.project)
 
         settings_file = temp_project_dir / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         added_hook = config["hooks"]["PreToolUse"][0]["hooks"][0]
         assert added_hook["timeout"] == 5
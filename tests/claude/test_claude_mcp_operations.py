@@ -213,8 +213,7 @@ class TestClaudeMCPOperations:
         mcp_file = temp_project_dir / ".mcp.json"
         assert mcp_file.exists()
 
-        with open(mcp_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(mcp_file.read_bytes())
 
         assert "mcpServers" in config
         assert "test-server" in config["mcpServers"]
@@ -227,8 +226,7 @@ class TestClaudeMCPOperations:
         mcp_ops.add_mcp_server("global-server", sample_mcp_server, ConfigScope.user)
 
         claude_json = temp_user_home / ".claude.json"
-        with open(claude_json, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(claude_json.read_bytes())
 
         assert "mcpServers" in config
         assert "global-server" in config["mcpServers"]
@@ -245,8 +243,7 @@ class TestClaudeMCPOperations:
 
         mcp_ops.add_mcp_server("local-server", sample_mcp_server, ConfigScope.local)
 
-        with open(claude_json, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(claude_json.read_bytes())
 
         assert str(temp_project_dir) in config["projects"]
         assert "local-server" in config["projects"][str(temp_project_dir)]["mcpServers"]
@@ -257,8 +254,7 @@ class TestClaudeMCPOperations:
         mcp_ops.add_mcp_server("my.custom.server", server, ConfigScope.project)
 
         mcp_file = temp_project_dir / ".mcp.json"
-        with open(mcp_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(mcp_file.read_bytes())
 
         assert "my.custom.server" in config["mcpServers"]
 
@@ -282,8 +278,7 @@ class TestClaudeMCPOperations:
         assert result is True
 
         # 验证删除
-        with open(mcp_json, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(mcp_json.read_bytes())
 
         assert "server1" not in config["mcpServers"]
         assert "server2" in config["mcpServers"]
@@ -298,8 +293,7 @@ class TestClaudeMCPOperations:
         result = mcp_ops.remove_mcp_server("global-server", ConfigScope.user)
         assert result is True
 
-        with open(claude_json, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(claude_json.read_bytes())
 
         assert "global-server" not in config.get("mcpServers", {})
 
@@ -312,8 +306,7 @@ class TestClaudeMCPOperations:
 
         mcp_ops.remove_mcp_server("only-server", ConfigScope.project)
 
-        with open(mcp_json, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(mcp_json.read_bytes())
 
         # mcpServers 应该被清理
         assert "mcpServers" not in config or len(config.get("mcpServers", {})) == 0
@@ -343,8 +336,7 @@ class TestClaudeMCPOperations:
         assert result is True
 
         # 验证更新
-        with open(mcp_json, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(mcp_json.read_bytes())
 
         server_config = config["mcpServers"]["test-server"]
         assert server_config["command"] == "python"
@@ -358,8 +350,7 @@ class TestClaudeMCPOperations:
         mcp_ops.update_mcp_server("new-server", server, ConfigScope.project)
 
         mcp_json = temp_project_dir / ".mcp.json"
-        with open(mcp_json, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(mcp_json.read_bytes())
 
         assert "new-server" in config["mcpServers"]
 
@@ -385,8 +376,7 @@ class TestClaudeMCPOperations:
         assert result is True
 
         # 验证重命名
-        with open(mcp_json, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(mcp_json.read_bytes())
 
         assert "old-name" not in config["mcpServers"]
         assert "new-name" in config["mcpServers"]
@@ -411,13 +401,11 @@ class TestClaudeMCPOperations:
         assert result is True
 
         # 验证：user 中不存在，project 中存在
-        with open(claude_json, "r", encoding="utf-8") as f:
-            user_config = json.load(f)
+        user_config = json.loads(claude_json.read_bytes())
         assert "user-server" not in user_config.get("mcpServers", {})
 
         mcp_json = temp_project_dir / ".mcp.json"
-        with open(mcp_json, "r", encoding="utf-8") as f:
-            project_config = json.load(f)
+        project_config = json.loads(mcp_json.read_bytes())
         assert "project-server" in project_config["mcpServers"]
 
     def test_rename_mcp_server_target_exists_raises_error(
@@ -461,8 +449,7 @@ class TestClaudeMCPOperations:
         # 禁用服务器
         mcp_ops.disable_mcp_server("test-server")
 
-        with open(claude_json, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(claude_json.read_bytes())
 
         assert (
             "test-server"
@@ -477,8 +464,7 @@ class TestClaudeMCPOperations:
         mcp_ops.disable_mcp_server("test-server")
 
         settings_file = temp_project_dir / ".claude" / "settings.local.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert "test-server" in config["disabledMcpjsonServers"]
 
@@ -497,8 +483,7 @@ class TestClaudeMCPOperations:
         # 启用服务器
         mcp_ops.enable_mcp_server("test-server")
 
-        with open(claude_json, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(claude_json.read_bytes())
 
         assert "test-server" not in config["projects"][str(temp_project_dir)].get(
             "disabledMcpServers", []
@@ -517,8 +502,7 @@ class TestClaudeMCPOperations:
 
         mcp_ops.enable_mcp_server("test-server")
 
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         # 应该从 disabled 移除，添加到 enabled
         assert "test-server" not in config.get("disabledMcpjsonServers", [])
@@ -531,8 +515,7 @@ class TestClaudeMCPOperations:
         mcp_ops.update_enable_all_project_mcp_servers(True)
 
         settings_file = temp_project_dir / ".claude" / "settings.local.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert config.get("enableAllProjectMcpServers") is True
 
@@ -543,8 +526,7 @@ class TestClaudeMCPOperations:
         mcp_ops.update_enable_all_project_mcp_servers(False)
 
         settings_file = temp_project_dir / ".claude" / "settings.local.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert config.get("enableAllProjectMcpServers") is False
 
@@ -598,8 +580,7 @@ class TestClaudeMCPOperations:
         mcp_ops.add_mcp_server("http-server", http_server, ConfigScope.project)
 
         mcp_json = temp_project_dir / ".mcp.json"
-        with open(mcp_json, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(mcp_json.read_bytes())
 
         server_config = config["mcpServers"]["http-server"]
         assert server_config["type"] == "http"
@@ -394,8 +394,7 @@ class TestClaudePluginOperations:
         plugin_ops.enable_plugin("test-plugin@test-marketplace", ConfigScope.project)
 
         settings_file = temp_project_dir / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert "enabledPlugins" in config
         assert config["enabledPlugins"]["test-plugin@test-marketplace"] is True
@@ -405,8 +404,7 @@ class TestClaudePluginOperations:
         plugin_ops.enable_plugin("test-plugin@test-marketplace", ConfigScope.user)
 
         settings_file = temp_user_home / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert config["enabledPlugins"]["test-plugin@test-marketplace"] is True
 
@@ -415,8 +413,7 @@ class TestClaudePluginOperations:
         plugin_ops.enable_plugin("test-plugin@test-marketplace", ConfigScope.local)
 
         settings_file = temp_project_dir / ".claude" / "settings.local.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert config["enabledPlugins"]["test-plugin@test-marketplace"] is True
 
@@ -431,8 +428,7 @@ class TestClaudePluginOperations:
         # 禁用插件
         plugin_ops.disable_plugin("test-plugin@test-marketplace", ConfigScope.project)
 
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         # 禁用时设置值为 False
         assert config["enabledPlugins"]["test-plugin@test-marketplace"] is False
@@ -442,8 +438,7 @@ class TestClaudePluginOperations:
         plugin_ops.enable_plugin("my.plugin@special-marketplace", ConfigScope.project)
 
         settings_file = temp_project_dir / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         assert "my.plugin@special-marketplace" in config["enabledPlugins"]
 
@@ -545,8 +540,7 @@ class TestClaudePluginOperations:
         assert result.success is True
 
         # settings 中的插件应该被删除
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json.loads(settings_file.read_bytes())
 
         # 插件应该从 settings 中删除
         assert "test-plugin@test-marketplace" not in config.get("enabledPlugins", {})
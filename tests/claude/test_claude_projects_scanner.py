@@ -7,6 +7,7 @@ import json
 import tempfile
 from pathlib import Path
 
+import orjson
 import pytest
 
 from src.claude.claude_projects_scanner import (
@@ -14,6 +15,11 @@ from src.claude.claude_projects_scanner import (
 )
 
 
+def _write_jsonl(path: Path, records: list) -> None:
+    """将记录一次性写入 JSONL 文件（每条记录一行）"""
+    path.write_bytes(b"".join(orjson.dumps(record) + b"\n" for record in records))
+
+
 class TestClaudeProjectsScanner:
     """测试 ClaudeProjectsScanner 类"""
 
@@ -158,13 +164,10 @@ class TestClaudeProjectsScanner:
 
         # 创建包含 cwd 的 session 文件（使用实际路径）
         session_file = project_session_dir / "session1.jsonl"
-        with open(session_file, "w") as f:
-            f.write(
-                json.dumps(
-                    {"timestamp": "2024-01-01T10:00:00Z", "cwd": str(real_project_path)}
-                )
-                + "\n"
-            )
+        _write_jsonl(
+            session_file,
+            [{"timestamp": "2024-01-01T10:00:00Z", "cwd": str(real_project_path)}],
+        )
 
         # 更新配置以包含实际路径
         config_path = scanner.user_home / ".claude.json"
@@ -198,8 +201,7 @@ class TestClaudeProjectsScanner:
 
         # 创建 session 文件
         session_file = project_session_dir / "session1.jsonl"
-        with open(session_file, "w") as f:
-            f.write(json.dumps({"timestamp": "2024-01-01T10:00:00Z"}) + "\n")
+        _write_jsonl(session_file, [{"timestamp": "2024-01-01T10:00:00Z"}])
 
         valid_projects = {"/valid/project"}
         project = await scanner.scan_project_info(project_session_dir, valid_projects)
@@ -214,8 +216,7 @@ class TestClaudeProjectsScanner:
 
         # 创建没有 cwd 的 session 文件
         session_file = project_session_dir / "session1.jsonl"
-        with open(session_file, "w") as f:
-            f.write(json.dumps({"timestamp": "2024-01-01T10:00:00Z"}) + "\n")
+        _write_jsonl(session_file, [{"timestamp": "2024-01-01T10:00:00Z"}])
 
         valid_projects = {"/Users/test/project1"}
         project = await scanner.scan_project_info(project_session_dir, valid_projects)
@@ -294,16 +295,15 @@ class TestClaudeProjectsScanner:
             project_session_dir = temp_projects_dir / f"Users-test-project{i}"
             project_session_dir.mkdir()
             session_file = project_session_dir / "session1.jsonl"
-            with open(session_file, "w") as f:
-                f.write(
-                    json.dumps(
-                        {
-                            "timestamp": "2024-01-01T10:00:00Z",
-                            "cwd": f"/Users/test/project{i}",
-                        }
-                    )
-                    + "\n"
-                )
+            _write_jsonl(
+                session_file,
+                [
+                    {
+                        "timestamp": "2024-01-01T10:00:00Z",
+                        "cwd": f"/Users/test/project{i}",
+                    }
+                ],
+            )
 
         projects = await scanner.scan_all_projects()
 
@@ -345,13 +345,10 @@ class TestClaudeProjectsScanner:
         project_session_dir = temp_projects_dir / "Users-test-removed-project"
         project_session_dir.mkdir()
         session_file = project_session_dir / "session1.jsonl"
-        with open(session_file, "w") as f:
-            f.write(
-                json.dumps(
-                    {"timestamp": "2024-01-01T10:00:00Z", "cwd": "/nonexistent/path"}
-                )
-                + "\n"
-            )
+        _write_jsonl(
+            session_file,
+            [{"timestamp": "2024-01-01T10:00:00Z", "cwd": "/nonexistent/path"}],
+        )
 
         projects = await scanner.scan_all_projects()
 
@@ -481,8 +478,7 @@ class TestDeleteProject:
 
         # 验证 .claude.json 中的项目配置已删除
         config_path = scanner.user_home / ".claude.json"
-        with open(config_path, "r") as f:
-            config = json.load(f)
+        config = json.loads(config_path.read_bytes())
 
         assert str(test_project_path) not in config.get("projects", {})
         assert "/Users/test/project2" in config.get("projects", {})
@@ -505,8 +501,7 @@ class TestDeleteProject:
 
         # 验证 .claude.json 中的项目配置已删除
         config_path = scanner.user_home / ".claude.json"
-        with open(config_path, "r") as f:
-            config = json.load(f)
+        config = json.loads(config_path.read_bytes())
 
         assert str(test_project_path) not in config.get("projects", {})
 
@@ -567,8 +562,7 @@ class TestDeleteProject:
 
         # 验证 .claude.json 中的项目配置已删除
         config_path = scanner.user_home / ".claude.json"
-        with open(config_path, "r") as f:
-            config = json.load(f)
+        config = json.loads(config_path.read_bytes())
 
         assert str(test_project_path) not in config.get("projects", {})
 
@@ -599,8 +593,7 @@ class TestDeleteProject:
         assert result is True
 
         # 验证 projects 键也被删除
-        with open(config_path, "r") as f:
-            config = json.load(f)
+        config = json.loads(config_path.read_bytes())
 
         assert "projects" not in config or config.get("projects") == {}
 
@@ -3,25 +3,125 @@ Claude Session Operations 模块的单元测试
 测试 Session 的扫描和读取功能，特别是消息合并逻辑
 """
 
-import json
-import tempfile
+import copy
+import io
+import os
+from datetime import datetime
 from pathlib import Path
 
+import orjson
 import pytest
+from pydantic import ValidationError
 
+from src.claude import claude_session_operations as session_ops_module
 from src.claude.claude_session_operations import ClaudeSessionOperations
 
 
+def _write_jsonl(path: Path, records: list) -> None:
+    """将记录一次性写入 JSONL 文件（每条记录一行）"""
+    path.write_bytes(b"".join(orjson.dumps(record) + b"\n" for record in records))
+
+
+# 示例 session 数据（测试中通过 sample_session_data fixture 获取独立副本）
+SAMPLE_SESSION_DATA = [
+    # Meta 消息
+    {
+        "type": "meta",
+        "sessionId": "test-session-123",
+        "timestamp": "2026-01-12T10:00:00.000Z",
+    },
+    # User 消息
+    {
+        "type": "user",
+        "userType": "external",
+        "sessionId": "test-session-123",
+        "timestamp": "2026-01-12T10:00:01.000Z",
+        "cwd": "/test/project",
+        "gitBranch": "main",
+        "message": {
+            "role": "user",
+            "content": "请帮我搜索文件中的 @expose_api 定义",
+        },
+    },
+    # Assistant 消息 - tool_use
+    {
+        "type": "assistant",
+        "userType": "external",
+        "sessionId": "test-session-123",
+        "timestamp": "2026-01-12T10:00:02.000Z",
+        "cwd": "/test/project",
+        "gitBranch": "main",
+        "message": {
+            "role": "assistant",
+            "content": [
+                {
+                    "type": "tool_use",
+                    "id": "call_abc123",
+                    "name": "Grep",
+                    "input": {
+                        "pattern": "@expose_api",
+                        "path": "/test/project/src",
+                    },
+                }
+            ],
+        },
+    },
+    # User 消息 - tool_result
+    {
+        "type": "user",
+        "userType": "external",
+        "sessionId": "test-session-123",
+        "timestamp": "2026-01-12T10:00:03.000Z",
+        "cwd": "/test/project",
+        "gitBranch": "main",
+        "message": {
+            "role": "assistant",
+            "content": [
+                {
+                    "type": "tool_result",
+                    "tool_use_id": "call_abc123",
+                    "content": "Found 5 matches",
+                }
+            ],
+        },
+    },
+    # Assistant 消息 - text
+    {
+        "type": "assistant",
+        "userType": "external",
+        "sessionId": "test-session-123",
+        "timestamp": "2026-01-12T10:00:04.000Z",
+        "cwd": "/test/project",
+        "gitBranch": "main",
+        "message": {
+            "role": "assistant",
+            "content": [
+                {
+                    "type": "text",
+                    "text": "我找到了5个匹配项",
+                }
+            ],
+        },
+    },
+]
+
+
 class TestClaudeSessionOperations:
     """测试 ClaudeSessionOperations 类"""
 
+    @pytest.fixture(autouse=True)
+    def clear_session_caches(self):
+        """标题和 session 缓存是模块级的，在测试之间清空，避免互相影响"""
+        session_ops_module._title_cache.clear()
+        session_ops_module._session_cache.clear()
+        yield
+        session_ops_module._title_cache.clear()
+        session_ops_module._session_cache.clear()
+
     @pytest.fixture
-    def temp_session_dir(self):
-        """创建临时 session 目录"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            session_path = Path(tmpdir)
-            session_path.mkdir(parents=True, exist_ok=True)
-            yield session_path
+    def temp_session_dir(self, tmp_path):
+        """创建临时 session 目录（使用 pytest 提供的 tmp_path）"""
+        return tmp_path
 
     @pytest.fixture
     def session_ops(self, temp_session_dir):
@@ -30,96 +130,19 @@ class TestClaudeSessionOperations:
 
     @pytest.fixture
     def sample_session_data(self):
-        """创建示例 session 数据"""
-        return [
-            # Meta 消息
-            {
-                "type": "meta",
-                "sessionId": "test-session-123",
-                "timestamp": "2026-01-12T10:00:00.000Z",
-            },
-            # User 消息
-            {
-                "type": "user",
-                "userType": "external",
-                "sessionId": "test-session-123",
-                "timestamp": "2026-01-12T10:00:01.000Z",
-                "cwd": "/test/project",
-                "gitBranch": "main",
-                "message": {
-                    "role": "user",
-                    "content": "请帮我搜索文件中的 @expose_api 定义",
-                },
-            },
-            # Assistant 消息 - tool_use
-            {
-                "type": "assistant",
-                "userType": "external",
-                "sessionId": "test-session-123",
-                "timestamp": "2026-01-12T10:00:02.000Z",
-                "cwd": "/test/project",
-                "gitBranch": "main",
-                "message": {
-                    "role": "assistant",
-                    "content": [
-                        {
-                            "type": "tool_use",
-                            "id": "call_abc123",
-                            "name": "Grep",
-                            "input": {
-                                "pattern": "@expose_api",
-                                "path": "/test/project/src",
-                            },
-                        }
-                    ],
-                },
-            },
-            # User 消息 - tool_result
-            {
-                "type": "user",
-                "userType": "external",
-                "sessionId": "test-session-123",
-                "timestamp": "2026-01-12T10:00:03.000Z",
-                "cwd": "/test/project",
-                "gitBranch": "main",
-                "message": {
-                    "role": "assistant",
-                    "content": [
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": "call_abc123",
-                            "content": "Found 5 matches",
-                        }
-                    ],
-                },
-            },
-            # Assistant 消息 - text
-            {
-                "type": "assistant",
-                "userType": "external",
-                "sessionId": "test-session-123",
-                "timestamp": "2026-01-12T10:00:04.000Z",
-                "cwd": "/test/project",
-                "gitBranch": "main",
-                "message": {
-                    "role": "assistant",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "我找到了5个匹配项",
-                        }
-                    ],
-                },
-            },
-        ]
+        """创建示例 session 数据（合并逻辑会修改消息，每个测试使用独立副本）"""
+        return copy.deepcopy(SAMPLE_SESSION_DATA)
+
+    @pytest.fixture(scope="session")
+    def sample_session_bytes(self):
+        """示例 session 数据编码后的 JSONL 内容（只编码一次，所有测试共享）"""
+        return b"".join(orjson.dumps(record) + b"\n" for record in SAMPLE_SESSION_DATA)
 
     @pytest.fixture
-    def sample_session_jsonl(self, temp_session_dir, sample_session_data):
+    def sample_session_jsonl(self, temp_session_dir, sample_session_bytes):
         """创建示例 session JSONL 文件"""
         session_file = temp_session_dir / "test-session-123.jsonl"
-        with open(session_file, "w", encoding="utf-8") as f:
-            for message_data in sample_session_data:
-                f.write(json.dumps(message_data) + "\n")
+        session_file.write_bytes(sample_session_bytes)
         return session_file
 
     # ========== 测试系统标签清理 ==========
@@ -230,7 +253,7 @@ This is the actual title that should be extracted"""
                 ],
             },
         }
-        tool_use_map["call_123"] = tool_use_message
+        tool_use_map["call_123"] = tool_use_message["message"]["content"][0]
 
         tool_result = {
             "type": "tool_result",
@@ -247,6 +270,22 @@ This is the actual title that should be extracted"""
         # 注意：tool_use 不再从 map 中删除，以便后续的 isMeta 消息可以引用它
         assert "call_123" in tool_use_map
 
+    def test_merge_tool_result_output_is_not_copied(self, session_ops):
+        """测试 tool_result 的 content 直接作为 output 引用，不做复制"""
+        tool_use_item = {"type": "tool_use", "id": "call_456", "input": {}}
+        result_content = [{"type": "text", "text": "line\n" * 1000}]
+        tool_result = {
+            "type": "tool_result",
+            "tool_use_id": "call_456",
+            "content": result_content,
+        }
+
+        session_ops._merge_tool_result_to_tool_use(
+            tool_result, {"call_456": tool_use_item}
+        )
+
+        assert tool_use_item["output"] is result_content
+
     def test_merge_tool_result_to_tool_use_not_found(self, session_ops, caplog):
         """测试 tool_result 找不到对应的 tool_use"""
         tool_use_map = {}
@@ -280,7 +319,7 @@ This is the actual title that should be extracted"""
                 ],
             },
         }
-        tool_use_map["call_123"] = tool_use_message
+        tool_use_map["call_123"] = tool_use_message["message"]["content"][0]
 
         # 创建 isMeta 消息，content 为字符串
         meta_message = {
@@ -336,7 +375,7 @@ This is the actual title that should be extracted"""
                 ],
             },
         }
-        tool_use_map["call_456"] = tool_use_message
+        tool_use_map["call_456"] = tool_use_message["message"]["content"][0]
 
         # content 为数组格式，包含 text 类型
         meta_message = {
@@ -380,7 +419,7 @@ This is the actual title that should be extracted"""
                 ],
             },
         }
-        tool_use_map["server_call_789"] = tool_use_message
+        tool_use_map["server_call_789"] = tool_use_message["message"]["content"][0]
 
         meta_message = {
             "isMeta": True,
@@ -452,6 +491,99 @@ This is the actual title that should be extracted"""
         assert thinking_item["text"] == "Let me think..."
         assert "thinking" not in thinking_item
 
+    def test_process_assistant_message_with_thinking_and_tool_use(self, session_ops):
+        """测试同时包含 thinking 和 tool_use 的 assistant 消息"""
+        message_data = {
+            "type": "assistant",
+            "timestamp": "2024-01-01T10:00:00Z",
+            "message": {
+                "role": "assistant",
+                "content": [
+                    {"type": "thinking", "thinking": "Need to search"},
+                    {
+                        "type": "tool_use",
+                        "id": "call_456",
+                        "name": "Grep",
+                        "input": {"pattern": "test"},
+                    },
+                ],
+            },
+        }
+
+        tool_use_map = {}
+        result = session_ops._process_assistant_message(message_data, tool_use_map)
+
+        thinking_item, tool_use_item = result["message"]["content"]
+        assert thinking_item["text"] == "Need to search"
+        assert "thinking" not in thinking_item
+        assert tool_use_item["status"] == "incomplete"
+        assert tool_use_map["call_456"] is tool_use_item
+        # 原始消息不应该被修改
+        assert "thinking" in message_data["message"]["content"][0]
+
+    def test_process_session_messages_reuses_message_dicts(self, session_ops):
+        """测试创建 ClaudeMessage 时直接复用已解析的 message 字典"""
+        raw_messages = [
+            {
+                "type": "user",
+                "timestamp": "2024-01-01T10:00:00Z",
+                "cwd": "/test/project",
+                "message": {"role": "user", "content": "Hello"},
+            }
+        ]
+
+        merged, claude_messages = session_ops._process_session_messages(raw_messages)
+
+        assert len(claude_messages) == 1
+        claude_message = claude_messages[0]
+        assert claude_message.timestamp == "2024-01-01T10:00:00Z"
+        assert claude_message.cwd == "/test/project"
+        assert claude_message.gitBranch is None
+        assert claude_message.raw_data == {}
+        assert claude_message.message is merged[0]["message"]
+
+    @pytest.mark.parametrize(
+        "field, value",
+        [
+            ("timestamp", 1704103200),
+            ("timestamp", None),
+            ("cwd", ["/test/project"]),
+            ("gitBranch", 1),
+        ],
+    )
+    def test_process_session_messages_validates_unexpected_types(
+        self, session_ops, field, value
+    ):
+        """测试字段类型不符时回退到模型校验，而不是构造出类型错误的 ClaudeMessage"""
+        raw_message = {
+            "type": "user",
+            "timestamp": "2024-01-01T10:00:00Z",
+            "message": {"role": "user", "content": "Hello"},
+        }
+        raw_message[field] = value
+
+        with pytest.raises(ValidationError):
+            session_ops._process_session_messages([raw_message])
+
+    def test_is_constructible_message_checks_field_types(self):
+        """测试只有字段类型全部符合模型定义时才跳过校验"""
+        fields = {
+            "timestamp": "2024-01-01T10:00:00Z",
+            "message": {"role": "user", "content": "Hello"},
+            "cwd": None,
+            "gitBranch": "main",
+        }
+        assert session_ops_module._is_constructible_message(fields)
+        assert session_ops_module._is_constructible_message({**fields, "message": None})
+
+        for bad in ("not a dict", ["role", "user"], 1):
+            assert not session_ops_module._is_constructible_message(
+                {**fields, "message": bad}
+            )
+        assert not session_ops_module._is_constructible_message(
+            {**fields, "timestamp": 1704103200}
+        )
+
     def test_process_assistant_message_empty_content(self, session_ops):
         """测试处理空 content 的消息"""
         message_data = {
@@ -466,6 +598,29 @@ This is the actual title that should be extracted"""
         # 应该返回原始消息
         assert result is message_data
 
+    def test_process_assistant_message_shares_tool_input(self, session_ops):
+        """测试处理 tool_use 时不复制 input，且不修改原始内容项"""
+        tool_input = {"content": "x" * 1024}
+        original_item = {
+            "type": "tool_use",
+            "id": "call_big",
+            "name": "Write",
+            "input": tool_input,
+        }
+        message_data = {
+            "type": "assistant",
+            "message": {"role": "assistant", "content": [original_item]},
+        }
+
+        tool_use_map = {}
+        result = session_ops._process_assistant_message(message_data, tool_use_map)
+
+        tool_use_item = result["message"]["content"][0]
+        assert tool_use_item is not original_item
+        assert tool_use_item["input"] is tool_input
+        assert tool_use_map["call_big"] is tool_use_item
+        assert "status" not in original_item
+
     # ========== 测试 _convert_command_message ==========
 
     def test_convert_command_message_with_meta(self, session_ops):
@@ -633,8 +788,7 @@ This is the actual title that should be extracted"""
 
     # ========== 测试 _merge_tool_use_with_result ==========
 
-    @pytest.mark.asyncio
-    async def test_merge_tool_use_with_result_complete(
+    def test_merge_tool_use_with_result_complete(
         self, session_ops, sample_session_data
     ):
         """测试完整的 tool_use 和 tool_result 合并流程"""
@@ -656,20 +810,20 @@ This is the actual title that should be extracted"""
         assistant_msg_1 = merged[1]
         assert assistant_msg_1["type"] == "assistant"
         assert assistant_msg_1["message"]["role"] == "assistant"
-        content = assistant_msg_1["message"]["content"]
-        assert len(content) == 1
-
         # 验证合并后的 tool_use
-        tool_use = content[0]
-        assert tool_use["type"] == "tool_use"
-        assert tool_use["id"] == "call_abc123"
-        assert tool_use["name"] == "Grep"
-        assert tool_use["input"] == {
-            "pattern": "@expose_api",
-            "path": "/test/project/src",
-        }
-        assert tool_use["output"] == "Found 5 matches"
-        assert tool_use["status"] == "complete"
+        assert assistant_msg_1["message"]["content"] == [
+            {
+                "type": "tool_use",
+                "id": "call_abc123",
+                "name": "Grep",
+                "input": {
+                    "pattern": "@expose_api",
+                    "path": "/test/project/src",
+                },
+                "output": "Found 5 matches",
+                "status": "complete",
+            }
+        ]
 
         # 第三条是 assistant 消息，包含 text
         assistant_msg_2 = merged[2]
@@ -679,8 +833,18 @@ This is the actual title that should be extracted"""
         assert len(text_content) == 1
         assert text_content[0]["type"] == "text"
 
-    @pytest.mark.asyncio
-    async def test_merge_tool_use_without_result(self, session_ops):
+    def test_merge_drops_messages_missing_message_or_content(self, session_ops):
+        """测试缺少 message 或 content 字段的消息被正确标记为丢弃"""
+        no_message = {"type": "user", "uuid": "u1"}
+        no_content = {"type": "user", "uuid": "u2", "message": {"role": "user"}}
+
+        merged = session_ops._merge_tool_use_with_result([no_message, no_content])
+
+        assert merged == []
+        assert no_message["_drop_reason"] == "empty_message_field"
+        assert no_content["_drop_reason"] == "empty_content"
+
+    def test_merge_tool_use_without_result(self, session_ops):
         """测试没有 tool_result 的 tool_use（incomplete）"""
         messages = [
             {
@@ -707,8 +871,7 @@ This is the actual title that should be extracted"""
         assert tool_use["status"] == "incomplete"
         assert "output" not in tool_use
 
-    @pytest.mark.asyncio
-    async def test_merge_multiple_tool_uses(self, session_ops):
+    def test_merge_multiple_tool_uses(self, session_ops):
         """测试多个 tool_use 的合并"""
         messages = [
             {
@@ -763,23 +926,26 @@ This is the actual title that should be extracted"""
 
         # 应该只有 1 条消息（两个 tool_use 都合并到同一 assistant 消息中）
         assert len(merged) == 1
-        content = merged[0]["message"]["content"]
-        assert len(content) == 2
-
-        # 验证第一个 tool_use
-        assert content[0]["type"] == "tool_use"
-        assert content[0]["id"] == "call_1"
-        assert content[0]["status"] == "complete"
-        assert content[0]["output"] == "Found 3 matches"
-
-        # 验证第二个 tool_use
-        assert content[1]["type"] == "tool_use"
-        assert content[1]["id"] == "call_2"
-        assert content[1]["status"] == "complete"
-        assert content[1]["output"] == "File content loaded"
+        assert merged[0]["message"]["content"] == [
+            {
+                "type": "tool_use",
+                "id": "call_1",
+                "name": "Grep",
+                "input": {"pattern": "test"},
+                "output": "Found 3 matches",
+                "status": "complete",
+            },
+            {
+                "type": "tool_use",
+                "id": "call_2",
+                "name": "ReadFile",
+                "input": {"file_path": "test.txt"},
+                "output": "File content loaded",
+                "status": "complete",
+            },
+        ]
 
-    @pytest.mark.asyncio
-    async def test_merge_command_message_with_meta(self, session_ops):
+    def test_merge_command_message_with_meta(self, session_ops):
         """测试完整的 command 消息合并流程（有 isMeta 消息）"""
         messages = [
             {
@@ -835,8 +1001,7 @@ This is the actual title that should be extracted"""
         assert normal_content[0]["type"] == "text"
         assert normal_content[0]["text"] == "Normal user message"
 
-    @pytest.mark.asyncio
-    async def test_merge_command_message_without_meta(self, session_ops):
+    def test_merge_command_message_without_meta(self, session_ops):
         """测试 command 消息合并流程（没有 isMeta 消息）"""
         messages = [
             {
@@ -860,8 +1025,7 @@ This is the actual title that should be extracted"""
         assert content[0]["command"] == "/test"
         assert content[0]["content"] == ""
 
-    @pytest.mark.asyncio
-    async def test_merge_ismeta_message_to_tool_use(self, session_ops):
+    def test_merge_ismeta_message_to_tool_use(self, session_ops):
         """测试完整的 isMeta 消息合并到 tool_use 的流程"""
         messages = [
             # Assistant 消息，包含 tool_use
@@ -940,8 +1104,11 @@ This is the actual title that should be extracted"""
         assert "extra" in tool_use
         assert tool_use["extra"] == "This is the metadata text"
 
-    @pytest.mark.asyncio
-    async def test_merge_ismeta_message_without_source_tool_use_id(self, session_ops):
+        # 字符串 content 的 isMeta 消息会先被浅拷贝，丢弃标记仍需写回原始消息
+        assert messages[1]["_dropped"] is True
+        assert messages[1]["_drop_reason"] == "merged_into_tool_use"
+
+    def test_merge_ismeta_message_without_source_tool_use_id(self, session_ops):
         """测试 isMeta 消息没有 sourceToolUseID 时不被处理"""
         messages = [
             # Assistant 消息，包含 tool_use
@@ -1001,16 +1168,15 @@ This is the actual title that should be extracted"""
 
         for session_name in sessions_to_create:
             session_file = temp_session_dir / session_name
-            with open(session_file, "w", encoding="utf-8") as f:
-                f.write(
-                    json.dumps(
-                        {
-                            "type": "user",
-                            "message": {"role": "user", "content": "test"},
-                        }
-                    )
-                    + "\n"
-                )
+            _write_jsonl(
+                session_file,
+                [
+                    {
+                        "type": "user",
+                        "message": {"role": "user", "content": "test"},
+                    }
+                ],
+            )
 
         sessions = await session_ops.scan_sessions()
 
@@ -1027,6 +1193,33 @@ This is the actual title that should be extracted"""
         normal_session = next(s for s in sessions if s.session_id == "session-1")
         assert normal_session.is_agent_session is False
 
+    @pytest.mark.asyncio
+    async def test_scan_sessions_skips_invalid_file_names(
+        self, temp_session_dir, session_ops
+    ):
+        """测试扫描与 read_session_contents 使用同一 session_id 规则，目录和非法 ID 被跳过"""
+        record = {"type": "user", "message": {"role": "user", "content": "test"}}
+        for session_name in [
+            "valid-session.jsonl",
+            ".hidden.jsonl",
+            "bad name.jsonl",
+            "a..b.jsonl",
+            ".jsonl",
+        ]:
+            _write_jsonl(temp_session_dir / session_name, [record])
+        (temp_session_dir / "dir-session.jsonl").mkdir()
+
+        sessions = await session_ops.scan_sessions()
+
+        session_ids = sorted(s.session_id for s in sessions)
+        assert session_ids == [".hidden", "bad name", "valid-session"]
+        # 列表中的 session 都能按 ID 打开
+        for session_id in session_ids:
+            assert await session_ops.read_session_contents(session_id) is not None
+        # 被跳过的文件同样无法按 ID 打开
+        with pytest.raises(ValueError):
+            await session_ops.read_session_contents("a..b")
+
     @pytest.mark.asyncio
     async def test_scan_sessions_nonexistent_directory(self):
         """测试扫描不存在的目录"""
@@ -1043,16 +1236,15 @@ This is the actual title that should be extracted"""
         """测试增量扫描（使用现有 title）"""
         # 创建一个 session 文件
         session_file = temp_session_dir / "session-1.jsonl"
-        with open(session_file, "w", encoding="utf-8") as f:
-            f.write(
-                json.dumps(
-                    {
-                        "type": "user",
-                        "message": {"role": "user", "content": "Test message"},
-                    }
-                )
-                + "\n"
-            )
+        _write_jsonl(
+            session_file,
+            [
+                {
+                    "type": "user",
+                    "message": {"role": "user", "content": "Test message"},
+                }
+            ],
+        )
 
         # 第一次扫描（需要读取文件）
         sessions_first = await session_ops.scan_sessions()
@@ -1065,6 +1257,51 @@ This is the actual title that should be extracted"""
         assert len(sessions_second) == 1
         assert sessions_second[0].title == sessions_first[0].title
 
+    @pytest.mark.asyncio
+    async def test_scan_sessions_title_cache(self, temp_session_dir, session_ops):
+        """测试文件未变化时复用缓存的 title，文件变化后重新读取"""
+        session_file = temp_session_dir / "session-1.jsonl"
+        _write_jsonl(
+            session_file,
+            [
+                {
+                    "type": "user",
+                    "message": {"role": "user", "content": "First title"},
+                }
+            ],
+        )
+
+        sessions_first = await session_ops.scan_sessions()
+        assert sessions_first[0].title == "First title"
+
+        # 文件未变化：不应该再次读取文件
+        calls = []
+        original_read_title = session_ops._read_session_title
+
+        async def tracking_read_title(*args, **kwargs):
+            calls.append(args)
+            return await original_read_title(*args, **kwargs)
+
+        session_ops._read_session_title = tracking_read_title
+        sessions_second = await session_ops.scan_sessions()
+        assert sessions_second[0].title == "First title"
+        assert calls == []
+
+        # 文件变化（size 改变）：重新读取 title
+        _write_jsonl(
+            session_file,
+            [
+                {
+                    "type": "user",
+                    "message": {"role": "user", "content": "Changed title!"},
+                }
+            ],
+        )
+
+        sessions_third = await session_ops.scan_sessions()
+        assert sessions_third[0].title == "Changed title!"
+        assert len(calls) == 1
+
     @pytest.mark.asyncio
     async def test_scan_sessions_filter_without_title(
         self, temp_session_dir, session_ops
@@ -1079,30 +1316,20 @@ This is the actual title that should be extracted"""
 
         for session_name, content in sessions_to_create:
             session_file = temp_session_dir / session_name
-            with open(session_file, "w", encoding="utf-8") as f:
-                if content:
-                    # 写入有内容的用户消息
-                    f.write(
-                        json.dumps(
-                            {
-                                "type": "user",
-                                "message": {"role": "user", "content": content},
-                            }
-                        )
-                        + "\n"
-                    )
-                else:
-                    # 只写入 meta 消息（不会被提取为标题）
-                    f.write(
-                        json.dumps(
-                            {
-                                "type": "meta",
-                                "sessionId": "test-session",
-                                "timestamp": "2026-01-12T10:00:00.000Z",
-                            }
-                        )
-                        + "\n"
-                    )
+            if content:
+                # 写入有内容的用户消息
+                record = {
+                    "type": "user",
+                    "message": {"role": "user", "content": content},
+                }
+            else:
+                # 只写入 meta 消息（不会被提取为标题）
+                record = {
+                    "type": "meta",
+                    "sessionId": "test-session",
+                    "timestamp": "2026-01-12T10:00:00.000Z",
+                }
+            _write_jsonl(session_file, [record])
 
         sessions = await session_ops.scan_sessions()
 
@@ -1120,29 +1347,27 @@ This is the actual title that should be extracted"""
         """测试过滤只有 Warmup 消息的 session"""
         # 创建一个只有 Warmup 消息的 session
         session_file = temp_session_dir / "session-warmup-only.jsonl"
-        with open(session_file, "w", encoding="utf-8") as f:
-            f.write(
-                json.dumps(
-                    {
-                        "type": "user",
-                        "message": {"role": "user", "content": "Warmup"},
-                    }
-                )
-                + "\n"
-            )
+        _write_jsonl(
+            session_file,
+            [
+                {
+                    "type": "user",
+                    "message": {"role": "user", "content": "Warmup"},
+                }
+            ],
+        )
 
         # 创建一个正常的 session
         normal_session = temp_session_dir / "session-normal.jsonl"
-        with open(normal_session, "w", encoding="utf-8") as f:
-            f.write(
-                json.dumps(
-                    {
-                        "type": "user",
-                        "message": {"role": "user", "content": "Normal message"},
-                    }
-                )
-                + "\n"
-            )
+        _write_jsonl(
+            normal_session,
+            [
+                {
+                    "type": "user",
+                    "message": {"role": "user", "content": "Normal message"},
+                }
+            ],
+        )
 
         sessions = await session_ops.scan_sessions()
 
@@ -1157,16 +1382,15 @@ This is the actual title that should be extracted"""
         """测试使用 existing_titles 时的过滤逻辑"""
         # 创建一个有标题的 session
         session_file = temp_session_dir / "session-1.jsonl"
-        with open(session_file, "w", encoding="utf-8") as f:
-            f.write(
-                json.dumps(
-                    {
-                        "type": "user",
-                        "message": {"role": "user", "content": "Test message"},
-                    }
-                )
-                + "\n"
-            )
+        _write_jsonl(
+            session_file,
+            [
+                {
+                    "type": "user",
+                    "message": {"role": "user", "content": "Test message"},
+                }
+            ],
+        )
 
         # 传入包含 None title 的 existing_titles
         existing_titles = {
@@ -1196,19 +1420,103 @@ This is the actual title that should be extracted"""
         assert session.message_count == 2
 
     @pytest.mark.asyncio
-    async def test_load_session_data_agent_session(self, temp_session_dir):
-        """测试加载 agent session"""
-        session_file = temp_session_dir / "agent-test-456.jsonl"
-        with open(session_file, "w", encoding="utf-8") as f:
+    async def test_load_session_data_cached(self, session_ops, sample_session_jsonl):
+        """测试文件未变化时复用缓存的 session，文件变化后重新解析"""
+        session_first, _ = await session_ops._load_session_data(sample_session_jsonl)
+        # 新建的实例同样命中缓存（生产环境每个请求都会新建实例）
+        session_second, _ = await ClaudeSessionOperations(
+            sample_session_jsonl.parent
+        )._load_session_data(sample_session_jsonl)
+        assert session_second is not session_first
+        assert session_second.messages[0] is session_first.messages[0]
+
+        # 修改文件（追加一条消息并更新 mtime）后应该重新解析
+        with open(sample_session_jsonl, "ab") as f:
             f.write(
-                json.dumps(
+                orjson.dumps(
                     {
                         "type": "user",
-                        "message": {"role": "user", "content": "test"},
+                        "timestamp": "2026-01-12T10:00:05.000Z",
+                        "message": {"role": "user", "content": "Follow up"},
                     }
                 )
-                + "\n"
+                + b"\n"
             )
+        stat = sample_session_jsonl.stat()
+        os.utime(
+            sample_session_jsonl, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000)
+        )
+
+        session_third, _ = await session_ops._load_session_data(sample_session_jsonl)
+        assert session_third.messages[0] is not session_first.messages[0]
+        assert session_third.message_count == 3
+
+    def test_lru_cache_limits_count_and_weight(self):
+        """测试缓存同时按条目数量和总权重淘汰，超出总量上限的单个条目不缓存"""
+        cache = session_ops_module._LRUCache(max_size=3, max_weight=10)
+        cache.put("a", 1, weight=4)
+        cache.put("b", 2, weight=4)
+        cache.put("c", 3, weight=4)
+        # 总权重 12 > 10，淘汰最久未使用的 a
+        assert cache.get("a") is None
+        assert (cache.get("b"), cache.get("c")) == (2, 3)
+
+        cache.put("huge", 4, weight=11)
+        assert cache.get("huge") is None
+        assert len(cache) == 2
+
+        cache.put("d", 5, weight=0)
+        cache.put("e", 6, weight=0)
+        # 数量上限 3，淘汰最久未使用的 b
+        assert cache.get("b") is None
+        assert (cache.get("c"), cache.get("d"), cache.get("e")) == (3, 5, 6)
+
+    @pytest.mark.asyncio
+    async def test_load_session_data_skips_cache_for_large_files(
+        self, session_ops, sample_session_jsonl, monkeypatch
+    ):
+        """测试超过缓存总量上限的 session 不缓存，每次重新解析"""
+        monkeypatch.setattr(
+            session_ops_module,
+            "_session_cache",
+            session_ops_module._LRUCache(max_size=16, max_weight=10),
+        )
+        session_first, _ = await session_ops._load_session_data(sample_session_jsonl)
+        session_second, _ = await session_ops._load_session_data(sample_session_jsonl)
+        assert session_second.messages[0] is not session_first.messages[0]
+
+    @pytest.mark.asyncio
+    async def test_load_session_data_cache_returns_copies(
+        self, session_ops, sample_session_jsonl
+    ):
+        """测试调用方修改返回的 session 不会影响缓存，且读取流程不修改共享的消息"""
+        session_first, _ = await session_ops._load_session_data(sample_session_jsonl)
+        dumped = session_first.model_dump()
+
+        session_first.title = "Changed"
+        session_first.messages.clear()
+
+        session_second, _ = await session_ops._load_session_data(sample_session_jsonl)
+        assert session_second.model_dump() == dumped
+
+        # 清空缓存后重新解析，结果与缓存中的一致
+        session_ops_module._session_cache.clear()
+        session_fresh, _ = await session_ops._load_session_data(sample_session_jsonl)
+        assert session_fresh.model_dump() == dumped
+
+    @pytest.mark.asyncio
+    async def test_load_session_data_agent_session(self, temp_session_dir):
+        """测试加载 agent session"""
+        session_file = temp_session_dir / "agent-test-456.jsonl"
+        _write_jsonl(
+            session_file,
+            [
+                {
+                    "type": "user",
+                    "message": {"role": "user", "content": "test"},
+                }
+            ],
+        )
 
         ops = ClaudeSessionOperations(temp_session_dir)
         session, _ = await ops._load_session_data(session_file)
@@ -1221,14 +1529,261 @@ This is the actual title that should be extracted"""
     async def test_load_session_data_invalid_json(self, temp_session_dir):
         """测试加载无效的 JSON 文件"""
         session_file = temp_session_dir / "invalid.jsonl"
-        with open(session_file, "w", encoding="utf-8") as f:
-            f.write("invalid json content")
+        session_file.write_text("invalid json content", encoding="utf-8")
 
         ops = ClaudeSessionOperations(temp_session_dir)
         session, _ = await ops._load_session_data(session_file)
 
         assert session is None
 
+    @pytest.mark.asyncio
+    async def test_load_session_data_skips_invalid_utf8_line(self, temp_session_dir):
+        """测试包含非法 UTF-8 字节的行只会被跳过，不影响其他行"""
+        session_file = temp_session_dir / "invalid-utf8.jsonl"
+        valid_line = orjson.dumps(
+            {"type": "user", "message": {"role": "user", "content": "valid line"}}
+        )
+        session_file.write_bytes(
+            b'{"type": "user", "message": "\xff\xfe"}\n' + valid_line + b"\n"
+        )
+
+        ops = ClaudeSessionOperations(temp_session_dir)
+        session, _ = await ops._load_session_data(session_file)
+
+        assert session is not None
+        assert session.title == "valid line"
+        assert session.message_count == 1
+
+    @pytest.mark.asyncio
+    async def test_load_session_data_shares_repeated_fields(
+        self, temp_session_dir, session_ops
+    ):
+        """测试同一 session 中重复的 cwd/gitBranch/role/model 共享同一个字符串对象"""
+        session_file = temp_session_dir / "repeated-fields.jsonl"
+        _write_jsonl(
+            session_file,
+            [
+                {
+                    "type": role,
+                    "timestamp": ts,
+                    "cwd": "/test/project",
+                    "gitBranch": "main",
+                    "message": {
+                        "role": role,
+                        "model": "test-model",
+                        "content": f"{role} text",
+                    },
+                }
+                for role, ts in [
+                    ("user", "2024-01-01T10:00:00Z"),
+                    ("assistant", "2024-01-01T10:00:01Z"),
+                    ("user", "2024-01-01T10:00:02Z"),
+                ]
+            ],
+        )
+
+        session, _ = await session_ops._load_session_data(session_file)
+
+        assert session is not None
+        first, second, third = session.messages
+        assert first.cwd == "/test/project"
+        assert first.cwd is second.cwd
+        assert first.gitBranch is second.gitBranch
+        assert first.message["role"] is third.message["role"]
+        assert first.message["model"] is second.message["model"]
+
+    @pytest.mark.asyncio
+    async def test_load_session_data_title_without_extra_read(
+        self, temp_session_dir, session_ops, monkeypatch
+    ):
+        """测试完整加载时直接从已解析的消息中提取标题，不再单独读取文件"""
+        session_file = temp_session_dir / "session-warmup-title.jsonl"
+        lines = [
+            {"type": "summary", "summary": "Old summary"},
+            {"type": "user", "message": {"role": "user", "content": "Warmup"}},
+            {"type": "user", "message": {"role": "user", "content": "Real title"}},
+        ]
+        _write_jsonl(session_file, lines)
+
+        async def fail_read_title(*args, **kwargs):
+            raise AssertionError("_read_session_title should not be called")
+
+        monkeypatch.setattr(session_ops, "_read_session_title", fail_read_title)
+
+        session, _ = await session_ops._load_session_data(session_file)
+
+        assert session is not None
+        assert session.title == "Real title"
+
+    @pytest.mark.asyncio
+    async def test_load_session_data_skips_meta_lines_without_parsing(
+        self, temp_session_dir, session_ops, monkeypatch
+    ):
+        """测试紧凑格式的元数据行不经解析直接跳过，debug 模式仍然统计"""
+        session_file = temp_session_dir / "session-meta-lines.jsonl"
+        session_file.write_bytes(
+            b'{"type":"summary","summary":"Old summary"}\n'
+            b'{"type":"file-history-snapshot","snapshot":{}}\n'
+            b'{"type":"user","message":{"role":"user","content":"Hello"}}\n'
+        )
+        parsed_lines = []
+        original_loads = session_ops_module._json_loads
+
+        def counting_loads(line):
+            parsed_lines.append(line)
+            return original_loads(line)
+
+        monkeypatch.setattr(session_ops_module, "_json_loads", counting_loads)
+
+        session, _ = await session_ops._load_session_data(session_file)
+
+        assert session is not None
+        assert session.message_count == 1
+        assert len(parsed_lines) == 1
+
+        parsed_lines.clear()
+        _, debug_info = await session_ops._load_session_data(session_file, debug=True)
+
+        assert len(parsed_lines) == 1
+        assert debug_info["raw_meta"] == 1
+        assert debug_info["raw_effective"] == 3
+        assert debug_info["dropped_messages"] == 2
+
+    @pytest.mark.asyncio
+    async def test_load_session_data_debug_counts_all_dropped_messages(
+        self, temp_session_dir, session_ops
+    ):
+        """测试 debug 模式的 dropped_messages 同时统计按前缀跳过的元数据行和合并时丢弃的消息"""
+        session_file = temp_session_dir / "session-dropped.jsonl"
+        session_file.write_bytes(
+            b'{"type":"summary","summary":"Old summary"}\n'
+            b'{"type":"file-history-snapshot","snapshot":{}}\n'
+            + orjson.dumps(
+                {
+                    "type": "user",
+                    "timestamp": "2026-01-12T10:00:00.000Z",
+                    "message": {"role": "user", "content": "Hello"},
+                }
+            )
+            + b"\n"
+            + orjson.dumps(
+                {
+                    "type": "system",
+                    "subtype": "turn_duration",
+                    "timestamp": "2026-01-12T10:00:01.000Z",
+                    "durationMs": 1000,
+                }
+            )
+            + b"\n"
+            + orjson.dumps(
+                {
+                    "type": "assistant",
+                    "timestamp": "2026-01-12T10:00:02.000Z",
+                    "uuid": "empty-message",
+                }
+            )
+            + b"\n"
+        )
+
+        session, debug_info = await session_ops._load_session_data(
+            session_file, debug=True
+        )
+
+        assert session is not None
+        assert session.message_count == 1
+        assert debug_info["raw_effective"] == 5
+        # 2 条元数据行 + turn_duration 系统消息 + 缺少 message 字段的消息
+        assert debug_info["dropped_messages"] == 4
+        assert [sample["drop_reason"] for sample in debug_info["dropped_samples"]] == [
+            "expected_empty:system:turn_duration",
+            "empty_message_field",
+        ]
+        assert debug_info["dropped_samples"][1]["_expected_drop"] is False
+        assert debug_info["dropped_samples"][1]["role"] is None
+
+    @pytest.mark.asyncio
+    async def test_load_session_data_meta_line_between_command_and_follow_up(
+        self, temp_session_dir, session_ops
+    ):
+        """测试 command 与其 isMeta 消息之间夹有元数据行时，debug 与非 debug 模式合并结果一致"""
+        session_file = temp_session_dir / "session-command-meta.jsonl"
+        session_file.write_bytes(
+            orjson.dumps(
+                {
+                    "type": "user",
+                    "timestamp": "2026-01-12T10:00:00.000Z",
+                    "message": {
+                        "role": "user",
+                        "content": "<command-message>review</command-message>\n"
+                        "<command-name>/review</command-name>",
+                    },
+                }
+            )
+            + b"\n"
+            + b'{"type":"file-history-snapshot","snapshot":{}}\n'
+            + orjson.dumps(
+                {
+                    "type": "user",
+                    "isMeta": True,
+                    "timestamp": "2026-01-12T10:00:01.000Z",
+                    "message": {"role": "user", "content": "Review the diff"},
+                }
+            )
+            + b"\n"
+        )
+
+        session, _ = await session_ops._load_session_data(session_file)
+        debug_session, _ = await session_ops._load_session_data(
+            session_file, debug=True
+        )
+
+        assert session.model_dump() == debug_session.model_dump()
+        assert session.message_count == 1
+        command_item = session.messages[0].message["content"][0]
+        assert command_item["type"] == "command"
+        assert command_item["content"] == "Review the diff"
+
+    def test_iter_session_file_lines_small_and_large(
+        self, temp_session_dir, monkeypatch
+    ):
+        """测试小文件切分读取与大文件 mmap 读取得到相同的行"""
+        session_file = temp_session_dir / "lines.jsonl"
+        session_file.write_bytes(b'{"a":1}\n\n{"b":2}\n')
+        size = session_file.stat().st_size
+
+        small_lines = list(
+            session_ops_module._iter_session_file_lines(str(session_file), size)
+        )
+        monkeypatch.setattr(session_ops_module, "SESSION_MMAP_THRESHOLD", 0)
+        large_lines = list(
+            session_ops_module._iter_session_file_lines(str(session_file), size)
+        )
+
+        assert small_lines == [b'{"a":1}', b"", b'{"b":2}']
+        assert [line.strip() for line in large_lines] == small_lines
+
+    @pytest.mark.asyncio
+    async def test_load_session_data_large_file_uses_mmap(
+        self, temp_session_dir, sample_session_bytes, monkeypatch
+    ):
+        """测试超过阈值的大文件通过 mmap 读取，结果与普通读取一致"""
+        session_file = temp_session_dir / "large-session.jsonl"
+        # 最后一行不带换行符
+        session_file.write_bytes(sample_session_bytes.rstrip(b"\n"))
+
+        ops = ClaudeSessionOperations(temp_session_dir)
+        expected, _ = await ops._load_session_data(session_file)
+
+        monkeypatch.setattr(session_ops_module, "SESSION_MMAP_THRESHOLD", 0)
+        ops = ClaudeSessionOperations(temp_session_dir)
+        session, _ = await ops._load_session_data(session_file)
+
+        assert session is not None
+        assert session.message_count == expected.message_count
+        assert [m.model_dump() for m in session.messages] == [
+            m.model_dump() for m in expected.messages
+        ]
+
     @pytest.mark.asyncio
     async def test_load_session_data_empty_file(self, temp_session_dir):
         """测试加载空文件"""
@@ -1283,6 +1838,40 @@ This is the actual title that should be extracted"""
         with pytest.raises(ValueError, match="Invalid session_id"):
             await session_ops.read_session_contents("../etc/passwd")
 
+    @pytest.mark.asyncio
+    async def test_load_session_data_cache_checks_size(
+        self, session_ops, sample_session_jsonl
+    ):
+        """测试 mtime 不变但文件大小变化时重新解析"""
+        stat = sample_session_jsonl.stat()
+        session_first, _ = await session_ops._load_session_data(sample_session_jsonl)
+
+        _write_jsonl(
+            sample_session_jsonl,
+            [{"type": "user", "message": {"role": "user", "content": "Rewritten"}}],
+        )
+        os.utime(sample_session_jsonl, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        session_second, _ = await session_ops._load_session_data(sample_session_jsonl)
+        assert session_second is not session_first
+        assert session_second.title == "Rewritten"
+
+    def test_validate_session_id(self):
+        """测试 session_id 校验：拒绝路径遍历字符，接受正常 ID"""
+        invalid_ids = ["..", "a/b", "a\\b", "/etc/passwd", "\\abs", "a\x00b"]
+        for session_id in invalid_ids:
+            with pytest.raises(ValueError, match="Invalid session_id"):
+                ClaudeSessionOperations._validate_session_id(session_id)
+
+        with pytest.raises(ValueError, match="non-empty string"):
+            ClaudeSessionOperations._validate_session_id("")
+
+        # 正常的 session ID 不应该抛出异常
+        ClaudeSessionOperations._validate_session_id(
+            "8d4d59dc-85df-4057-b95e-81604c7c95ea"
+        )
+        ClaudeSessionOperations._validate_session_id("agent-a1b2c3")
+
     # ========== 测试 detect_project_info ==========
 
     @pytest.mark.asyncio
@@ -1290,13 +1879,10 @@ This is the actual title that should be extracted"""
         """测试成功检测项目路径和时间"""
         # 创建包含 cwd 的 session 文件
         session_file = temp_session_dir / "session-1.jsonl"
-        with open(session_file, "w") as f:
-            f.write(
-                json.dumps(
-                    {"timestamp": "2024-01-01T10:00:00Z", "cwd": "/test/project"}
-                )
-                + "\n"
-            )
+        _write_jsonl(
+            session_file,
+            [{"timestamp": "2024-01-01T10:00:00Z", "cwd": "/test/project"}],
+        )
 
         ops = ClaudeSessionOperations(temp_session_dir)
         project_path, last_active = await ops.detect_project_info()
@@ -1304,13 +1890,28 @@ This is the actual title that should be extracted"""
         assert project_path == "/test/project"
         assert last_active is not None
 
+    @pytest.mark.asyncio
+    async def test_detect_project_info_uses_latest_session(self, temp_session_dir):
+        """测试从最近修改的 session 文件中提取项目路径和最后活跃时间"""
+        old_file = temp_session_dir / "session-old.jsonl"
+        new_file = temp_session_dir / "session-new.jsonl"
+        _write_jsonl(old_file, [{"cwd": "/old/project"}])
+        _write_jsonl(new_file, [{"cwd": "/new/project"}])
+        os.utime(old_file, (1_700_000_000, 1_700_000_000))
+        os.utime(new_file, (1_700_000_100, 1_700_000_100))
+
+        ops = ClaudeSessionOperations(temp_session_dir)
+        project_path, last_active = await ops.detect_project_info()
+
+        assert project_path == "/new/project"
+        assert last_active == datetime.fromtimestamp(1_700_000_100)
+
     @pytest.mark.asyncio
     async def test_detect_project_info_not_found(self, temp_session_dir):
         """测试找不到项目路径"""
         # 创建不包含 cwd 的 session 文件
         session_file = temp_session_dir / "session-1.jsonl"
-        with open(session_file, "w") as f:
-            f.write(json.dumps({"timestamp": "2024-01-01T10:00:00Z"}) + "\n")
+        _write_jsonl(session_file, [{"timestamp": "2024-01-01T10:00:00Z"}])
 
         ops = ClaudeSessionOperations(temp_session_dir)
         project_path, last_active = await ops.detect_project_info()
@@ -1318,26 +1919,40 @@ This is the actual title that should be extracted"""
         assert project_path is None
         assert last_active is None
 
+    @pytest.mark.asyncio
+    async def test_detect_project_info_skips_lines_without_cwd(self, temp_session_dir):
+        """测试跳过不含 cwd 的行，从后续行中提取项目路径"""
+        session_file = temp_session_dir / "session-1.jsonl"
+        session_file.write_bytes(
+            b'{"type":"file-history-snapshot","snapshot":{}}\n'
+            b"not json\n"
+            b'{"type":"user","cwd":"/test/project"}\n'
+        )
+
+        ops = ClaudeSessionOperations(temp_session_dir)
+        project_path, _ = await ops.detect_project_info()
+
+        assert project_path == "/test/project"
+
     # ========== 测试 _read_session_title ==========
 
     @pytest.mark.asyncio
     async def test_read_session_title_with_command(self, temp_session_dir):
         """测试从 command 消息中提取标题"""
         session_file = temp_session_dir / "session-command.jsonl"
-        with open(session_file, "w", encoding="utf-8") as f:
-            f.write(
-                json.dumps(
-                    {
-                        "type": "user",
-                        "timestamp": "2024-01-01T10:00:00Z",
-                        "message": {
-                            "role": "user",
-                            "content": "<command-message>code-review:code-review</command-message>\n<command-name>/code-review:code-review</command-name>",
-                        },
-                    }
-                )
-                + "\n"
-            )
+        _write_jsonl(
+            session_file,
+            [
+                {
+                    "type": "user",
+                    "timestamp": "2024-01-01T10:00:00Z",
+                    "message": {
+                        "role": "user",
+                        "content": "<command-message>code-review:code-review</command-message>\n<command-name>/code-review:code-review</command-name>",
+                    },
+                }
+            ],
+        )
 
         ops = ClaudeSessionOperations(temp_session_dir)
         title, line_number = await ops._read_session_title(session_file)
@@ -1345,6 +1960,32 @@ This is the actual title that should be extracted"""
         assert title == "/code-review:code-review"
         assert line_number == 1
 
+    @pytest.mark.asyncio
+    async def test_read_session_title_skips_compact_meta_lines(self, temp_session_dir):
+        """测试紧凑格式的 file-history-snapshot/summary 行被跳过且不计入行号"""
+        session_file = temp_session_dir / "session-with-snapshot.jsonl"
+        session_file.write_bytes(
+            b'{"type":"summary","summary":"Old summary"}\n'
+            b'{"type":"file-history-snapshot","snapshot":{"message":'
+            b'{"role":"user","content":"not a title"}}}\n'
+            b'{"type":"user","message":{"role":"user","content":"Real title"}}\n'
+        )
+
+        ops = ClaudeSessionOperations(temp_session_dir)
+        title, line_number = await ops._read_session_title(session_file)
+
+        assert title == "Real title"
+        assert line_number == 1
+
+    def test_iter_chunked_lines_across_chunks(self):
+        """测试跨块和超过缓冲区大小的行能被正确拼接"""
+        data = b"ab\ncdefghij\n\nklm\nno"
+        lines = list(
+            session_ops_module._iter_chunked_lines(io.BytesIO(data), bytearray(4))
+        )
+
+        assert lines == [b"ab", b"cdefghij", b"", b"klm", b"no"]
+
     @pytest.mark.asyncio
     async def test_read_session_title_command_truncated(self, temp_session_dir):
         """测试 command 名称被截断"""
@@ -1352,20 +1993,19 @@ This is the actual title that should be extracted"""
         long_command_name = (
             "/very:long:command:name:that:exceeds:default:max:length:limit"
         )
-        with open(session_file, "w", encoding="utf-8") as f:
-            f.write(
-                json.dumps(
-                    {
-                        "type": "user",
-                        "timestamp": "2024-01-01T10:00:00Z",
-                        "message": {
-                            "role": "user",
-                            "content": f"<command-message>test</command-message>\n<command-name>{long_command_name}</command-name>",
-                        },
-                    }
-                )
-                + "\n"
-            )
+        _write_jsonl(
+            session_file,
+            [
+                {
+                    "type": "user",
+                    "timestamp": "2024-01-01T10:00:00Z",
+                    "message": {
+                        "role": "user",
+                        "content": f"<command-message>test</command-message>\n<command-name>{long_command_name}</command-name>",
+                    },
+                }
+            ],
+        )
 
         ops = ClaudeSessionOperations(temp_session_dir)
         title, line_number = await ops._read_session_title(session_file)
@@ -1382,32 +2022,24 @@ This is the actual title that should be extracted"""
     ):
         """测试 command 消息优先于普通消息被用作标题"""
         session_file = temp_session_dir / "session-mixed.jsonl"
-        with open(session_file, "w", encoding="utf-8") as f:
-            # 写入一条 command 消息
-            f.write(
-                json.dumps(
-                    {
-                        "type": "user",
-                        "timestamp": "2024-01-01T10:00:00Z",
-                        "message": {
-                            "role": "user",
-                            "content": "<command-message>test</command-message>\n<command-name>/test</command-name>",
-                        },
-                    }
-                )
-                + "\n"
-            )
-            # 写入一条普通消息
-            f.write(
-                json.dumps(
-                    {
-                        "type": "user",
-                        "timestamp": "2024-01-01T10:00:01Z",
-                        "message": {"role": "user", "content": "Normal message"},
-                    }
-                )
-                + "\n"
-            )
+        _write_jsonl(
+            session_file,
+            [
+                {
+                    "type": "user",
+                    "timestamp": "2024-01-01T10:00:00Z",
+                    "message": {
+                        "role": "user",
+                        "content": "<command-message>test</command-message>\n<command-name>/test</command-name>",
+                    },
+                },
+                {
+                    "type": "user",
+                    "timestamp": "2024-01-01T10:00:01Z",
+                    "message": {"role": "user", "content": "Normal message"},
+                },
+            ],
+        )
 
         ops = ClaudeSessionOperations(temp_session_dir)
         title, line_number = await ops._read_session_title(session_file)
@@ -1416,8 +2048,7 @@ This is the actual title that should be extracted"""
         assert title == "/test"
         assert line_number == 1
 
-    @pytest.mark.asyncio
-    async def test_extract_command_name_success(self, session_ops):
+    def test_extract_command_name_success(self, session_ops):
         """测试成功提取 command 名称"""
         content = "<command-message>code-review:code-review</command-message>\n<command-name>/code-review:code-review</command-name>"
         result = session_ops._extract_command_name(content)
@@ -1583,7 +2214,7 @@ This is the actual title that should be extracted"""
         result = session_ops._convert_progress_message_to_standard("string")
         assert result is None
 
-    def test_extract_progress_messages_single_subagent(self, session_ops):
+    def test_collect_progress_message_single_subagent(self, session_ops):
         """测试提取单个 subagent 的 progress 消息"""
         raw_messages = [
             {
@@ -1611,7 +2242,10 @@ This is the actual title that should be extracted"""
             },
         ]
 
-        result = session_ops._extract_progress_messages(raw_messages)
+        progress_map = {}
+        for message_data in raw_messages:
+            session_ops._collect_progress_message(message_data, progress_map)
+        result = session_ops._dedupe_progress_messages(progress_map)
 
         assert len(result) == 1
         assert "call_123" in result
@@ -1629,7 +2263,7 @@ This is the actual title that should be extracted"""
         assert msg2["uuid"] == "msg-2"
         assert msg2["_from_subagent"] is True
 
-    def test_extract_progress_messages_multiple_subagents(self, session_ops):
+    def test_collect_progress_message_multiple_subagents(self, session_ops):
         """测试提取多个 subagent 的 progress 消息"""
         raw_messages = [
             {
@@ -1660,7 +2294,10 @@ This is the actual title that should be extracted"""
             },
         ]
 
-        result = session_ops._extract_progress_messages(raw_messages)
+        progress_map = {}
+        for message_data in raw_messages:
+            session_ops._collect_progress_message(message_data, progress_map)
+        result = session_ops._dedupe_progress_messages(progress_map)
 
         assert len(result) == 2
         assert "call_1" in result
@@ -1668,7 +2305,7 @@ This is the actual title that should be extracted"""
         assert len(result["call_1"]) == 1
         assert len(result["call_2"]) == 1
 
-    def test_extract_progress_messages_deduplication(self, session_ops):
+    def test_dedupe_progress_messages(self, session_ops):
         """测试 progress 消息去重"""
         raw_messages = [
             {
@@ -1704,12 +2341,15 @@ This is the actual title that should be extracted"""
             },
         ]
 
-        result = session_ops._extract_progress_messages(raw_messages)
+        progress_map = {}
+        for message_data in raw_messages:
+            session_ops._collect_progress_message(message_data, progress_map)
+        result = session_ops._dedupe_progress_messages(progress_map)
 
         assert len(result) == 1
         assert len(result["call_123"]) == 2  # 应该只有 2 条消息（去重后）
 
-    def test_extract_progress_messages_empty_data(self, session_ops):
+    def test_collect_progress_message_empty_data(self, session_ops):
         """测试处理空数据的 progress 消息"""
         raw_messages = [
             {"type": "progress", "parentToolUseID": "call_123", "data": {}},
@@ -1720,14 +2360,17 @@ This is the actual title that should be extracted"""
             },
         ]
 
-        result = session_ops._extract_progress_messages(raw_messages)
+        progress_map = {}
+        for message_data in raw_messages:
+            session_ops._collect_progress_message(message_data, progress_map)
+        result = session_ops._dedupe_progress_messages(progress_map)
 
         # 空的 progress 消息不应该产生 subagent 消息
         assert len(result) == 2
         assert len(result["call_123"]) == 0
         assert len(result["call_456"]) == 0
 
-    def test_extract_progress_messages_no_parent_tool_use_id(self, session_ops):
+    def test_collect_progress_message_no_parent_tool_use_id(self, session_ops):
         """测试没有 parentToolUseID 的 progress 消息"""
         raw_messages = [
             {
@@ -1745,13 +2388,15 @@ This is the actual title that should be extracted"""
             }
         ]
 
-        result = session_ops._extract_progress_messages(raw_messages)
+        progress_map = {}
+        for message_data in raw_messages:
+            session_ops._collect_progress_message(message_data, progress_map)
+        result = session_ops._dedupe_progress_messages(progress_map)
 
         # 没有 parentToolUseID 的消息应该被忽略
         assert len(result) == 0
 
-    @pytest.mark.asyncio
-    async def test_merge_tool_result_with_subagent_messages(self, session_ops):
+    def test_merge_tool_result_with_subagent_messages(self, session_ops):
         """测试 tool_result 合并与 subagent 消息插入"""
         # 准备测试数据，包含 progress 消息
         raw_messages = [
@@ -1867,6 +2512,57 @@ This is the actual title that should be extracted"""
         assert msg2["message"]["role"] == "assistant"
         assert isinstance(msg2["message"]["content"], list)
 
+    def test_merge_dedupes_repeated_progress_messages(self, session_ops):
+        """测试合并时多条 progress 消息中重复的 subagent 对话只保留一份"""
+        subagent_user = {
+            "type": "user",
+            "uuid": "msg-1",
+            "timestamp": "2024-01-01T10:00:00Z",
+            "message": {"role": "user", "content": "Subagent task"},
+        }
+        subagent_reply = {
+            "type": "assistant",
+            "uuid": "msg-2",
+            "timestamp": "2024-01-01T10:00:01Z",
+            "message": {
+                "role": "assistant",
+                "content": [{"type": "text", "text": "Subagent response"}],
+            },
+        }
+        raw_messages = [
+            {
+                "type": "assistant",
+                "message": {
+                    "role": "assistant",
+                    "content": [
+                        {
+                            "type": "tool_use",
+                            "id": "call_dup",
+                            "name": "Task",
+                            "input": {"description": "Dedupe task"},
+                        }
+                    ],
+                },
+            },
+            {
+                "type": "progress",
+                "parentToolUseID": "call_dup",
+                "data": {"normalizedMessages": [subagent_user]},
+            },
+            {
+                "type": "progress",
+                "parentToolUseID": "call_dup",
+                "data": {"normalizedMessages": [subagent_user, subagent_reply]},
+            },
+        ]
+
+        merged = session_ops._merge_tool_use_with_result(raw_messages)
+
+        assert all(m["_drop_reason"] == "progress_extracted" for m in raw_messages[1:])
+        subagent_item = merged[1]["message"]["content"][0]
+        assert subagent_item["type"] == "subagent"
+        assert subagent_item["session"]["message_count"] == 2
+
     @pytest.mark.asyncio
     async def test_clean_system_tags_in_session_loading(self, temp_session_dir):
         """测试在 session 加载时清理系统标签并转换为标准格式"""
@@ -1907,9 +2603,7 @@ This is the actual title that should be extracted"""
             },
         ]
 
-        with open(session_file, "w", encoding="utf-8") as f:
-            for msg in messages:
-                f.write(json.dumps(msg) + "\n")
+        _write_jsonl(session_file, messages)
 
         # 加载 session
         ops = ClaudeSessionOperations(temp_session_dir)
@@ -1940,8 +2634,7 @@ This is the actual title that should be extracted"""
         assert "帮我调整 @.claude/commands/uiux_review.md" in text_content
         assert "增加描述" in text_content
 
-    @pytest.mark.asyncio
-    async def test_merge_tool_result_with_subagent_messages(self, session_ops):
+    def test_merge_tool_result_with_subagent_messages(self, session_ops):
         """测试 tool_result 合并与 subagent 消息插入"""
         # 准备测试数据，包含 progress 消息
         raw_messages = [
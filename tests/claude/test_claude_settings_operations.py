@@ -3,42 +3,56 @@ Claude Settings Operations 模块的单元测试
 测试 Settings 配置的扫描、更新、作用域切换等功能
 """
 
-import json
-import tempfile
 from pathlib import Path
 
+import orjson
 import pytest
 
 from src.claude.claude_settings_operations import ClaudeSettingsOperations
 from src.claude.models import ClaudeSettingsInfoDTO, ConfigScope
 
 
+def _write_json(path: Path, data: dict) -> None:
+    """将配置写入 JSON 文件（按需创建所在的 .claude 目录）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(orjson.dumps(data))
+
+
+def _read_json(path: Path) -> dict:
+    """读取并解析 JSON 配置文件"""
+    return orjson.loads(path.read_bytes())
+
+
 class TestClaudeSettingsOperations:
     """测试 ClaudeSettingsOperations 类"""
 
     @pytest.fixture
-    def temp_project_dir(self):
-        """创建临时项目目录"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            project_path = Path(tmpdir)
-            # 创建 .claude 目录
-            (project_path / ".claude").mkdir(parents=True, exist_ok=True)
-            yield project_path
+    def temp_project_dir(self, tmp_path):
+        """临时项目目录（位于 pytest 提供的 tmp_path 下，由 pytest 统一清理）
+
+        .claude 目录不预先创建：写入配置时由被测代码或 _write_json 按需创建
+        """
+        return tmp_path / "project"
 
     @pytest.fixture
-    def temp_user_home(self):
-        """创建临时用户主目录"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            user_home = Path(tmpdir)
-            # 创建 .claude 目录
-            (user_home / ".claude").mkdir(parents=True, exist_ok=True)
-            yield user_home
+    def temp_user_home(self, tmp_path):
+        """临时用户主目录（与项目目录共用同一个 tmp_path，.claude 目录同样按需创建）"""
+        return tmp_path / "home"
 
     @pytest.fixture
     def settings_ops(self, temp_project_dir, temp_user_home):
         """创建 ClaudeSettingsOperations 实例"""
         return ClaudeSettingsOperations(temp_project_dir, temp_user_home)
 
+    @pytest.fixture
+    def scope_files(self, temp_project_dir, temp_user_home):
+        """各作用域对应的 settings 文件路径"""
+        return {
+            ConfigScope.user: temp_user_home / ".claude" / "settings.json",
+            ConfigScope.project: temp_project_dir / ".claude" / "settings.json",
+            ConfigScope.local: temp_project_dir / ".claude" / "settings.local.json",
+        }
+
     # ========== 测试 scan_settings ==========
 
     def test_scan_settings_empty_configs(self, settings_ops):
@@ -49,211 +63,183 @@ class TestClaudeSettingsOperations:
         assert result.settings == {}
         assert result.env == []
 
-    def test_scan_settings_single_scope(self, settings_ops, temp_project_dir):
-        """测试扫描单个作用域的配置"""
-        settings_file = temp_project_dir / ".claude" / "settings.json"
-        test_data = {
-            "model": "claude-3-5-sonnet-20241022",
-            "env": {"HTTP_PROXY": "http://proxy.com"},
-        }
-
-        with open(settings_file, "w", encoding="utf-8") as f:
-            json.dump(test_data, f)
+    @pytest.mark.parametrize(
+        "test_data, expected_settings, expected_env",
+        [
+            (
+                {
+                    "model": "claude-3-5-sonnet-20241022",
+                    "env": {"HTTP_PROXY": "http://proxy.com"},
+                },
+                {"model": "claude-3-5-sonnet-20241022"},
+                [("HTTP_PROXY", "http://proxy.com")],
+            ),
+            # 嵌套值被展平
+            (
+                {
+                    "permissions": {"allow": ["*"], "ask": ["~/Downloads"]},
+                    "sandbox": {"enabled": True, "autoAllowBashIfSandboxed": True},
+                },
+                {"permissions.allow": ["*"], "sandbox.enabled": True},
+                [],
+            ),
+            # 枚举值被转换为字符串
+            (
+                {"permissions": {"defaultMode": "acceptEdits"}},
+                {"permissions.defaultMode": "acceptEdits"},
+                [],
+            ),
+        ],
+        ids=["simple_values", "nested_values", "enum_values"],
+    )
+    def test_scan_settings_single_scope(
+        self, settings_ops, scope_files, test_data, expected_settings, expected_env
+    ):
+        """测试扫描单个作用域的配置（简单值、嵌套值、枚举值）"""
+        _write_json(scope_files[ConfigScope.project], test_data)
 
         result = settings_ops.scan_settings(ConfigScope.project)
 
-        assert "model" in result.settings
-        assert result.settings["model"][0] == "claude-3-5-sonnet-20241022"
-        assert result.settings["model"][1] == ConfigScope.project
-
-        assert len(result.env) == 1
-        assert result.env[0][0] == "HTTP_PROXY"
-        assert result.env[0][1] == "http://proxy.com"
-        assert result.env[0][2] == ConfigScope.project
-
-    def test_scan_settings_nested_values(self, settings_ops, temp_project_dir):
-        """测试扫描嵌套的配置值"""
-        settings_file = temp_project_dir / ".claude" / "settings.json"
-        test_data = {
-            "permissions": {"allow": ["*"], "ask": ["~/Downloads"]},
-            "sandbox": {"enabled": True, "autoAllowBashIfSandboxed": True},
+        assert {key: result.settings[key] for key in expected_settings} == {
+            key: (value, ConfigScope.project)
+            for key, value in expected_settings.items()
         }
+        assert result.env == [
+            (name, value, ConfigScope.project) for name, value in expected_env
+        ]
 
-        with open(settings_file, "w", encoding="utf-8") as f:
-            json.dump(test_data, f)
-
-        result = settings_ops.scan_settings(ConfigScope.project)
-
-        # 验证嵌套值被展平
-        assert "permissions.allow" in result.settings
-        assert result.settings["permissions.allow"][0] == ["*"]
-        assert "sandbox.enabled" in result.settings
-        assert result.settings["sandbox.enabled"][0] is True
-
-    def test_scan_settings_merge_all_scopes(
-        self, settings_ops, temp_user_home, temp_project_dir
-    ):
+    def test_scan_settings_merge_all_scopes(self, settings_ops, scope_files):
         """测试合并所有作用域的配置（local > project > user）"""
         # User 配置
-        user_settings = temp_user_home / ".claude" / "settings.json"
+        user_settings = scope_files[ConfigScope.user]
         user_data = {
             "model": "claude-3-opus",
             "env": {"USER_VAR": "user_value"},
         }
-        with open(user_settings, "w", encoding="utf-8") as f:
-            json.dump(user_data, f)
+        _write_json(user_settings, user_data)
 
         # Project 配置
-        project_settings = temp_project_dir / ".claude" / "settings.json"
+        project_settings = scope_files[ConfigScope.project]
         project_data = {
             "model": "claude-3-5-sonnet",
             "env": {"PROJECT_VAR": "project_value"},
         }
-        with open(project_settings, "w", encoding="utf-8") as f:
-            json.dump(project_data, f)
+        _write_json(project_settings, project_data)
 
         # Local 配置（最高优先级）
-        local_settings = temp_project_dir / ".claude" / "settings.local.json"
+        local_settings = scope_files[ConfigScope.local]
         local_data = {
             "model": "claude-3-5-sonnet-20241022",
             "env": {"LOCAL_VAR": "local_value"},
         }
-        with open(local_settings, "w", encoding="utf-8") as f:
-            json.dump(local_data, f)
+        _write_json(local_settings, local_data)
 
         # 不指定 scope，合并所有
         result = settings_ops.scan_settings()
 
         # model 应该使用 local 的值（最高优先级）
-        assert result.settings["model"][0] == "claude-3-5-sonnet-20241022"
-        assert result.settings["model"][1] == ConfigScope.local
+        assert result.settings["model"] == (
+            "claude-3-5-sonnet-20241022",
+            ConfigScope.local,
+        )
 
         # env 变量应该包含所有作用域的
-        env_dict = {env[0]: env for env in result.env}
-        assert "USER_VAR" in env_dict
-        assert env_dict["USER_VAR"][2] == ConfigScope.user
-        assert "PROJECT_VAR" in env_dict
-        assert env_dict["PROJECT_VAR"][2] == ConfigScope.project
-        assert "LOCAL_VAR" in env_dict
-        assert env_dict["LOCAL_VAR"][2] == ConfigScope.local
-
-    def test_scan_settings_with_enum_values(self, settings_ops, temp_project_dir):
-        """测试扫描包含枚举值的配置"""
-        settings_file = temp_project_dir / ".claude" / "settings.json"
-        test_data = {"permissions": {"defaultMode": "acceptEdits"}}
-
-        with open(settings_file, "w", encoding="utf-8") as f:
-            json.dump(test_data, f)
-
-        result = settings_ops.scan_settings(ConfigScope.project)
-
-        # 枚举值应该被转换为字符串
-        assert "permissions.defaultMode" in result.settings
-        assert result.settings["permissions.defaultMode"][0] == "acceptEdits"
+        env_map = {name: (value, scope) for name, value, scope in result.env}
+        assert env_map == {
+            "USER_VAR": ("user_value", ConfigScope.user),
+            "PROJECT_VAR": ("project_value", ConfigScope.project),
+            "LOCAL_VAR": ("local_value", ConfigScope.local),
+        }
 
     # ========== 测试 update_settings_values ==========
 
-    def test_update_settings_values_string_type(self, settings_ops, temp_project_dir):
-        """测试更新字符串类型的配置"""
-        settings_ops.update_settings_values(
-            ConfigScope.project, "model", "claude-3-5-sonnet-20241022", "string"
-        )
-
-        settings_file = temp_project_dir / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
-
-        assert config["model"] == "claude-3-5-sonnet-20241022"
-
-    def test_update_settings_values_boolean_type(self, settings_ops, temp_project_dir):
-        """测试更新布尔类型的配置"""
-        settings_ops.update_settings_values(
-            ConfigScope.project, "sandbox.enabled", "true", "boolean"
-        )
-
-        settings_file = temp_project_dir / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
-
-        assert config["sandbox"]["enabled"] is True
-
-    def test_update_settings_values_integer_type(self, settings_ops, temp_project_dir):
-        """测试更新整数类型的配置"""
-        settings_ops.update_settings_values(
-            ConfigScope.project, "network.httpProxyPort", "8080", "integer"
-        )
-
-        settings_file = temp_project_dir / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
-
-        assert config["network"]["httpProxyPort"] == 8080
-
-    def test_update_settings_values_array_type(self, settings_ops, temp_project_dir):
-        """测试更新数组类型的配置"""
-        settings_ops.update_settings_values(
-            ConfigScope.project, "permissions.allow", '["*"]', "array"
-        )
-
-        settings_file = temp_project_dir / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
-
-        assert config["permissions"]["allow"] == ["*"]
-
-    def test_update_settings_values_array_comma_separated(
-        self, settings_ops, temp_project_dir
+    @pytest.mark.parametrize(
+        "key, raw_value, value_type, expected_path, expected",
+        [
+            (
+                "model",
+                "claude-3-5-sonnet-20241022",
+                "string",
+                ("model",),
+                "claude-3-5-sonnet-20241022",
+            ),
+            ("sandbox.enabled", "true", "boolean", ("sandbox", "enabled"), True),
+            (
+                "network.httpProxyPort",
+                "8080",
+                "integer",
+                ("network", "httpProxyPort"),
+                8080,
+            ),
+            ("permissions.allow", '["*"]', "array", ("permissions", "allow"), ["*"]),
+            (
+                "permissions.allow",
+                "*,~/.ssh",
+                "array",
+                ("permissions", "allow"),
+                ["*", "~/.ssh"],
+            ),
+            (
+                "network",
+                '{"allowUnixSockets": ["/tmp/*"]}',
+                "object",
+                ("network", "allowUnixSockets"),
+                ["/tmp/*"],
+            ),
+            (
+                "env.HTTP_PROXY",
+                "http://proxy.example.com",
+                "string",
+                ("env", "HTTP_PROXY"),
+                "http://proxy.example.com",
+            ),
+        ],
+        ids=[
+            "string",
+            "boolean",
+            "integer",
+            "array",
+            "array_comma_separated",
+            "object",
+            "env_variable",
+        ],
+    )
+    def test_update_settings_values_by_type(
+        self,
+        settings_ops,
+        scope_files,
+        key,
+        raw_value,
+        value_type,
+        expected_path,
+        expected,
     ):
-        """测试更新数组类型（逗号分隔）"""
+        """测试按不同值类型更新配置（字符串、布尔、整数、数组、对象、环境变量）"""
         settings_ops.update_settings_values(
-            ConfigScope.project, "permissions.allow", "*,~/.ssh", "array"
+            ConfigScope.project, key, raw_value, value_type
         )
 
-        settings_file = temp_project_dir / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
-
-        assert config["permissions"]["allow"] == ["*", "~/.ssh"]
+        config = _read_json(scope_files[ConfigScope.project])
+        for part in expected_path:
+            config = config[part]
 
-    def test_update_settings_values_object_type(self, settings_ops, temp_project_dir):
-        """测试更新对象类型的配置"""
-        settings_ops.update_settings_values(
-            ConfigScope.project, "network", '{"allowUnixSockets": ["/tmp/*"]}', "object"
-        )
-
-        settings_file = temp_project_dir / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
-
-        assert config["network"]["allowUnixSockets"] == ["/tmp/*"]
-
-    def test_update_settings_values_env_variable(self, settings_ops, temp_project_dir):
-        """测试更新环境变量"""
-        settings_ops.update_settings_values(
-            ConfigScope.project, "env.HTTP_PROXY", "http://proxy.example.com", "string"
-        )
-
-        settings_file = temp_project_dir / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
-
-        assert config["env"]["HTTP_PROXY"] == "http://proxy.example.com"
+        assert config == expected
+        # 同时校验类型，避免 True 与 1 这类相等但类型不同的值被误判
+        assert type(config) is type(expected)
 
     def test_update_settings_values_delete_with_empty_string(
-        self, settings_ops, temp_project_dir
+        self, settings_ops, scope_files
     ):
         """测试使用空字符串删除配置"""
         # 先创建配置
-        settings_file = temp_project_dir / ".claude" / "settings.json"
+        settings_file = scope_files[ConfigScope.project]
         test_data = {"model": "claude-3-opus"}
-        with open(settings_file, "w", encoding="utf-8") as f:
-            json.dump(test_data, f)
+        _write_json(settings_file, test_data)
 
         # 删除配置
         settings_ops.update_settings_values(ConfigScope.project, "model", "", "string")
 
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = _read_json(settings_file)
 
         assert "model" not in config
 
@@ -271,172 +257,132 @@ class TestClaudeSettingsOperations:
                 ConfigScope.project, "test.value", "not_a_number", "integer"
             )
 
-    def test_update_settings_values_to_user_scope(self, settings_ops, temp_user_home):
+    def test_update_settings_values_to_user_scope(self, settings_ops, scope_files):
         """测试更新 user scope 的配置"""
         settings_ops.update_settings_values(
             ConfigScope.user, "model", "claude-3-opus", "string"
         )
 
-        settings_file = temp_user_home / ".claude" / "settings.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        settings_file = scope_files[ConfigScope.user]
+        config = _read_json(settings_file)
 
         assert config["model"] == "claude-3-opus"
 
-    def test_update_settings_values_to_local_scope(
-        self, settings_ops, temp_project_dir
-    ):
+    def test_update_settings_values_to_local_scope(self, settings_ops, scope_files):
         """测试更新 local scope 的配置"""
         settings_ops.update_settings_values(
             ConfigScope.local, "model", "claude-3-5-sonnet", "string"
         )
 
-        settings_file = temp_project_dir / ".claude" / "settings.local.json"
-        with open(settings_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        settings_file = scope_files[ConfigScope.local]
+        config = _read_json(settings_file)
 
         assert config["model"] == "claude-3-5-sonnet"
 
     # ========== 测试 update_settings_scope ==========
 
-    def test_update_settings_scope_project_to_local(
-        self, settings_ops, temp_project_dir
-    ):
-        """测试将配置从 project scope 移动到 local scope"""
-        # 在 project scope 创建配置
-        project_settings = temp_project_dir / ".claude" / "settings.json"
-        test_data = {"model": "claude-3-5-sonnet"}
-        with open(project_settings, "w", encoding="utf-8") as f:
-            json.dump(test_data, f)
-
-        # 移动到 local scope
-        settings_ops.update_settings_scope(
-            ConfigScope.project, ConfigScope.local, "model"
-        )
-
-        # 验证：project 中不存在，local 中存在
-        with open(project_settings, "r", encoding="utf-8") as f:
-            project_config = json.load(f)
-        assert "model" not in project_config
-
-        local_settings = temp_project_dir / ".claude" / "settings.local.json"
-        with open(local_settings, "r", encoding="utf-8") as f:
-            local_config = json.load(f)
-        assert local_config["model"] == "claude-3-5-sonnet"
-
-    def test_update_settings_scope_user_to_project(
-        self, settings_ops, temp_user_home, temp_project_dir
+    @pytest.mark.parametrize(
+        "source_scope, target_scope, key, initial, expected",
+        [
+            (
+                ConfigScope.project,
+                ConfigScope.local,
+                "model",
+                {"model": "claude-3-5-sonnet"},
+                "claude-3-5-sonnet",
+            ),
+            (
+                ConfigScope.user,
+                ConfigScope.project,
+                "model",
+                {"model": "claude-3-opus"},
+                "claude-3-opus",
+            ),
+            (
+                ConfigScope.project,
+                ConfigScope.local,
+                "sandbox.enabled",
+                {"sandbox": {"enabled": True}},
+                True,
+            ),
+            (
+                ConfigScope.project,
+                ConfigScope.local,
+                "env.HTTP_PROXY",
+                {"env": {"HTTP_PROXY": "http://proxy.com"}},
+                "http://proxy.com",
+            ),
+        ],
+        ids=["project_to_local", "user_to_project", "nested_key", "env_variable"],
+    )
+    def test_update_settings_scope_moves_key(
+        self,
+        settings_ops,
+        scope_files,
+        source_scope,
+        target_scope,
+        key,
+        initial,
+        expected,
     ):
-        """测试将配置从 user scope 移动到 project scope"""
-        # 在 user scope 创建配置
-        user_settings = temp_user_home / ".claude" / "settings.json"
-        test_data = {"model": "claude-3-opus"}
-        with open(user_settings, "w", encoding="utf-8") as f:
-            json.dump(test_data, f)
+        """测试将配置（包括嵌套配置和环境变量）从一个作用域移动到另一个作用域"""
+        _write_json(scope_files[source_scope], initial)
 
-        # 移动到 project scope
-        settings_ops.update_settings_scope(
-            ConfigScope.user, ConfigScope.project, "model"
-        )
+        settings_ops.update_settings_scope(source_scope, target_scope, key)
 
-        # 验证：user 中不存在，project 中存在
-        with open(user_settings, "r", encoding="utf-8") as f:
-            user_config = json.load(f)
-        assert "model" not in user_config
-
-        project_settings = temp_project_dir / ".claude" / "settings.json"
-        with open(project_settings, "r", encoding="utf-8") as f:
-            project_config = json.load(f)
-        assert project_config["model"] == "claude-3-opus"
-
-    def test_update_settings_scope_nested_key(self, settings_ops, temp_project_dir):
-        """测试移动嵌套配置的作用域"""
-        # 创建嵌套配置
-        project_settings = temp_project_dir / ".claude" / "settings.json"
-        test_data = {"sandbox": {"enabled": True}}
-        with open(project_settings, "w", encoding="utf-8") as f:
-            json.dump(test_data, f)
-
-        # 移动嵌套配置
-        settings_ops.update_settings_scope(
-            ConfigScope.project, ConfigScope.local, "sandbox.enabled"
-        )
+        # 验证：源作用域中不存在，目标作用域中存在
+        *parents, leaf = key.split(".")
+        source_config = _read_json(scope_files[source_scope])
+        target_config = _read_json(scope_files[target_scope])
+        for part in parents:
+            source_config = source_config.get(part, {})
+            target_config = target_config[part]
 
-        # 验证
-        with open(project_settings, "r", encoding="utf-8") as f:
-            project_config = json.load(f)
-        assert "sandbox" not in project_config or "enabled" not in project_config.get(
-            "sandbox", {}
-        )
-
-        local_settings = temp_project_dir / ".claude" / "settings.local.json"
-        with open(local_settings, "r", encoding="utf-8") as f:
-            local_config = json.load(f)
-        assert local_config["sandbox"]["enabled"] is True
-
-    def test_update_settings_scope_env_variable(self, settings_ops, temp_project_dir):
-        """测试移动环境变量的作用域"""
-        # 创建环境变量
-        project_settings = temp_project_dir / ".claude" / "settings.json"
-        test_data = {"env": {"HTTP_PROXY": "http://proxy.com"}}
-        with open(project_settings, "w", encoding="utf-8") as f:
-            json.dump(test_data, f)
-
-        # 移动环境变量
-        settings_ops.update_settings_scope(
-            ConfigScope.project, ConfigScope.local, "env.HTTP_PROXY"
-        )
-
-        # 验证
-        with open(project_settings, "r", encoding="utf-8") as f:
-            project_config = json.load(f)
-        assert "HTTP_PROXY" not in project_config.get("env", {})
-
-        local_settings = temp_project_dir / ".claude" / "settings.local.json"
-        with open(local_settings, "r", encoding="utf-8") as f:
-            local_config = json.load(f)
-        assert local_config["env"]["HTTP_PROXY"] == "http://proxy.com"
+        assert leaf not in source_config
+        assert target_config[leaf] == expected
+        assert type(target_config[leaf]) is type(expected)
 
     def test_update_settings_scope_nonexistent_key_no_change(
-        self, settings_ops, temp_project_dir
+        self, settings_ops, scope_files
     ):
         """测试移动不存在的键不产生任何变化"""
         # 创建配置文件
-        project_settings = temp_project_dir / ".claude" / "settings.json"
+        project_settings = scope_files[ConfigScope.project]
         test_data = {"model": "claude-3"}
-        with open(project_settings, "w", encoding="utf-8") as f:
-            json.dump(test_data, f)
+        _write_json(project_settings, test_data)
 
-        original_stat = project_settings.stat()
+        original_content = project_settings.read_bytes()
+        original_mtime_ns = project_settings.stat().st_mtime_ns
 
         # 尝试移动不存在的键
         settings_ops.update_settings_scope(
             ConfigScope.project, ConfigScope.local, "nonexistent.key"
         )
 
-        # 验证文件未被修改
-        new_stat = project_settings.stat()
-        assert original_stat.st_mtime == new_stat.st_mtime
+        # 验证文件未被修改（同时比较内容和纳秒级 mtime，不依赖秒级时间戳精度）
+        assert project_settings.read_bytes() == original_content
+        assert project_settings.stat().st_mtime_ns == original_mtime_ns
+        assert not (scope_files[ConfigScope.local]).exists()
 
     def test_update_settings_scope_same_scope_no_change(
-        self, settings_ops, temp_project_dir
+        self, settings_ops, scope_files
     ):
         """测试移动到相同作用域不产生任何变化"""
-        project_settings = temp_project_dir / ".claude" / "settings.json"
+        project_settings = scope_files[ConfigScope.project]
         test_data = {"model": "claude-3"}
-        with open(project_settings, "w", encoding="utf-8") as f:
-            json.dump(test_data, f)
+        _write_json(project_settings, test_data)
 
-        original_stat = project_settings.stat()
+        original_content = project_settings.read_bytes()
+        original_mtime_ns = project_settings.stat().st_mtime_ns
 
         # 移动到相同作用域
         settings_ops.update_settings_scope(
             ConfigScope.project, ConfigScope.project, "model"
         )
 
-        # 验证文件未被修改
-        new_stat = project_settings.stat()
-        assert original_stat.st_mtime == new_stat.st_mtime
+        # 验证文件未被修改（同时比较内容和纳秒级 mtime，不依赖秒级时间戳精度）
+        assert project_settings.read_bytes() == original_content
+        assert project_settings.stat().st_mtime_ns == original_mtime_ns
 
     # ========== 测试集成场景 ==========
 
@@ -448,8 +394,7 @@ class TestClaudeSettingsOperations:
         )
 
         result = settings_ops.scan_settings(ConfigScope.project)
-        assert "model" in result.settings
-        assert result.settings["model"][0] == "claude-3-5-sonnet"
+        assert result.settings["model"] == ("claude-3-5-sonnet", ConfigScope.project)
 
         # Update: 更新配置
         settings_ops.update_settings_values(
@@ -457,7 +402,7 @@ class TestClaudeSettingsOperations:
         )
 
         result = settings_ops.scan_settings(ConfigScope.project)
-        assert result.settings["model"][0] == "claude-3-opus"
+        assert result.settings["model"] == ("claude-3-opus", ConfigScope.project)
 
         # Move Scope: 移动到 user
         settings_ops.update_settings_scope(
@@ -468,7 +413,7 @@ class TestClaudeSettingsOperations:
         assert "model" not in result.settings
 
         result = settings_ops.scan_settings(ConfigScope.user)
-        assert result.settings["model"][0] == "claude-3-opus"
+        assert result.settings["model"] == ("claude-3-opus", ConfigScope.user)
 
         # Delete: 删除配置
         settings_ops.update_settings_values(ConfigScope.user, "model", "", "string")
@@ -476,10 +421,10 @@ class TestClaudeSettingsOperations:
         result = settings_ops.scan_settings(ConfigScope.user)
         assert "model" not in result.settings
 
-    def test_complex_nested_configuration(self, settings_ops, temp_project_dir):
+    def test_complex_nested_configuration(self, settings_ops, scope_files):
         """测试复杂的嵌套配置"""
         # 创建复杂的嵌套配置
-        settings_file = temp_project_dir / ".claude" / "settings.json"
+        settings_file = scope_files[ConfigScope.project]
         test_data = {
             "permissions": {
                 "allow": ["*"],
@@ -495,15 +440,17 @@ class TestClaudeSettingsOperations:
             },
         }
 
-        with open(settings_file, "w", encoding="utf-8") as f:
-            json.dump(test_data, f)
+        _write_json(settings_file, test_data)
 
         result = settings_ops.scan_settings(ConfigScope.project)
 
-        # 验证所有嵌套值都被正确展平
-        assert result.settings["permissions.allow"][0] == ["*"]
-        assert result.settings["permissions.ask"][0] == ["~/Downloads", "~/Documents"]
-        assert result.settings["permissions.defaultMode"][0] == "plan"
-        assert result.settings["sandbox.enabled"][0] is True
-        assert result.settings["sandbox.network.allowLocalBinding"][0] is True
-        assert result.settings["sandbox.network.httpProxyPort"][0] == 8080
+        # 验证所有嵌套值都被正确展平（一次比较，失败时 pytest 会给出完整的差异）
+        expected = {
+            "permissions.allow": ["*"],
+            "permissions.ask": ["~/Downloads", "~/Documents"],
+            "permissions.defaultMode": "plan",
+            "sandbox.enabled": True,
+            "sandbox.network.allowLocalBinding": True,
+            "sandbox.network.httpProxyPort": 8080,
+        }
+        assert {key: result.settings[key][0] for key in expected} == expected
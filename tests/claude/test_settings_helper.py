@@ -3,364 +3,480 @@ Settings Helper 模块的单元测试
 """
 
 import json
-import tempfile
+import math
+import os
+import stat
+import sys
 from pathlib import Path
 
+import orjson
 import pytest
 
+from src.claude import settings_helper
 from src.claude.settings_helper import (
     convert_config_value,
+    edit_config,
     load_config,
     update_config,
     update_project_config,
 )
 
 
+def _write_json(path: Path, data: dict) -> None:
+    """将配置写入 JSON 文件"""
+    path.write_bytes(orjson.dumps(data))
+
+
+def _read_json(path: Path) -> dict:
+    """读取并解析 JSON 配置文件"""
+    return orjson.loads(path.read_bytes())
+
+
 class TestLoadConfig:
     """测试 load_config 函数"""
 
-    def test_load_nonexistent_file(self):
+    def test_load_nonexistent_file(self, tmp_path):
         """测试加载不存在的文件，应返回空字典"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            nonexistent_file = Path(tmpdir) / "nonexistent.json"
-            config = load_config(nonexistent_file)
-            assert config == {}
+        nonexistent_file = tmp_path / "nonexistent.json"
+        config = load_config(nonexistent_file)
+        assert config == {}
 
-    def test_load_simple_config(self):
+    def test_load_file_in_nonexistent_directory(self, tmp_path):
+        """测试加载所在目录不存在（或父路径是文件）的配置，应返回空字典"""
+        assert load_config(tmp_path / "missing" / "config.json") == {}
+
+        not_a_dir = tmp_path / "file"
+        not_a_dir.write_text("", encoding="utf-8")
+        assert load_config(not_a_dir / "config.json") == {}
+
+    def test_load_simple_config(self, tmp_path):
         """测试加载简单配置文件"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            test_data = {"key1": "value1", "key2": "value2"}
+        config_file = tmp_path / "config.json"
+        test_data = {"key1": "value1", "key2": "value2"}
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(test_data, f)
+        _write_json(config_file, test_data)
 
-            config = load_config(config_file)
-            assert config == test_data
+        config = load_config(config_file)
+        assert config == test_data
 
-    def test_load_with_key_path(self):
+    def test_load_with_key_path(self, tmp_path):
         """测试使用 key_path 加载子配置"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            test_data = {
-                "projects": {
-                    "/path/to/project1": {
-                        "mcpServers": {"server1": {"command": "node"}}
-                    },
-                    "/path/to/project2": {
-                        "mcpServers": {"server2": {"command": "python"}}
-                    },
-                }
+        config_file = tmp_path / "config.json"
+        test_data = {
+            "projects": {
+                "/path/to/project1": {"mcpServers": {"server1": {"command": "node"}}},
+                "/path/to/project2": {"mcpServers": {"server2": {"command": "python"}}},
             }
+        }
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(test_data, f)
+        _write_json(config_file, test_data)
 
-            # 加载特定项目的配置
-            config = load_config(
-                config_file, key_path=["projects", "/path/to/project1"]
-            )
-            assert config == {"mcpServers": {"server1": {"command": "node"}}}
+        # 加载特定项目的配置
+        config = load_config(config_file, key_path=["projects", "/path/to/project1"])
+        assert config == {"mcpServers": {"server1": {"command": "node"}}}
 
-    def test_load_with_nonexistent_key_path(self):
+    def test_load_with_nonexistent_key_path(self, tmp_path):
         """测试使用不存在的 key_path，应返回空字典"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            test_data = {"projects": {"/path/to/project1": {"mcpServers": {}}}}
+        config_file = tmp_path / "config.json"
+        test_data = {"projects": {"/path/to/project1": {"mcpServers": {}}}}
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(test_data, f)
+        _write_json(config_file, test_data)
 
-            # 尝试加载不存在的项目配置
-            config = load_config(
-                config_file, key_path=["projects", "/nonexistent/project"]
-            )
-            assert config == {}
+        # 尝试加载不存在的项目配置
+        config = load_config(config_file, key_path=["projects", "/nonexistent/project"])
+        assert config == {}
 
-    def test_load_with_key_path_pointing_to_non_dict(self):
+    def test_load_with_key_path_pointing_to_non_dict(self, tmp_path):
         """测试 key_path 指向非字典类型时，应返回空字典"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            test_data = {"projects": "string_value"}
+        config_file = tmp_path / "config.json"
+        test_data = {"projects": "string_value"}
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(test_data, f)
+        _write_json(config_file, test_data)
 
-            config = load_config(config_file, key_path=["projects"])
-            assert config == {}
+        config = load_config(config_file, key_path=["projects"])
+        assert config == {}
 
-    def test_load_invalid_json(self):
+    def test_load_invalid_json(self, tmp_path):
         """测试加载无效的 JSON 文件"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
+        config_file = tmp_path / "config.json"
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                f.write("{ invalid json }")
+        config_file.write_text("{ invalid json }", encoding="utf-8")
 
-            with pytest.raises(ValueError, match="解析.*失败"):
-                load_config(config_file)
+        with pytest.raises(ValueError, match="解析.*失败"):
+            load_config(config_file)
 
 
 class TestUpdateConfig:
     """测试 update_config 函数"""
 
-    def test_update_nonexistent_file_creates_new(self):
+    def test_update_nonexistent_file_creates_new(self, tmp_path):
         """测试更新不存在的文件，应创建新文件"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "new_config.json"
-
-            # 文件不存在时创建新配置
-            update_config(config_file, key_path=None, key="key1", value="value1")
-
-            # 验证文件已创建
-            assert config_file.exists()
+        config_file = tmp_path / "new_config.json"
+
+        # 文件不存在时创建新配置
+        update_config(config_file, key_path=None, key="key1", value="value1")
+
+        # 验证文件已创建
+        assert config_file.exists()
+
+        # 验证内容正确
+        config = _read_json(config_file)
+        assert config == {"key1": "value1"}
+
+    def test_update_writes_indented_utf8(self, tmp_path):
+        """测试写出的文件为 2 空格缩进且非 ASCII 字符不转义"""
+        config_file = tmp_path / "config.json"
+
+        update_config(config_file, key_path=None, key="env.LANG", value="中文")
+
+        assert config_file.read_text(encoding="utf-8") == (
+            json.dumps({"env": {"LANG": "中文"}}, indent=2, ensure_ascii=False)
+        )
+
+    def test_update_preserves_large_integers(self, tmp_path):
+        """测试超出 64 位的整数在读取和写回后保持原值，不会变成浮点数"""
+        config_file = tmp_path / "config.json"
+        config_file.write_text(
+            '{"big": 123456789012345678901234567890, "neg": -9223372036854775809}',
+            encoding="utf-8",
+        )
+
+        assert load_config(config_file)["big"] == 123456789012345678901234567890
+
+        update_config(config_file, key_path=None, key="key1", value="value1")
+
+        config = json.loads(config_file.read_bytes())
+        assert config == {
+            "big": 123456789012345678901234567890,
+            "neg": -9223372036854775809,
+            "key1": "value1",
+        }
+        assert isinstance(config["big"], int)
+
+    def test_update_file_with_non_finite_numbers(self, tmp_path):
+        """测试包含 NaN、Infinity 和超出范围浮点数的文件仍可读取和编辑"""
+        config_file = tmp_path / "config.json"
+        config_file.write_text(
+            '{"nan": NaN, "inf": Infinity, "huge": 1e400}', encoding="utf-8"
+        )
+
+        assert math.isnan(load_config(config_file)["nan"])
+
+        update_config(config_file, key_path=None, key="key1", value="value1")
+
+        config = json.loads(config_file.read_bytes())
+        assert math.isnan(config["nan"])
+        assert config["inf"] == math.inf
+        assert config["huge"] == math.inf
+        assert config["key1"] == "value1"
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="依赖 POSIX 权限与符号链接")
+    def test_update_replaces_symlink_target_and_keeps_mode(self, tmp_path):
+        """测试写入符号链接指向的文件，保留权限位且不残留临时文件"""
+        real_file = tmp_path / "real.json"
+        real_file.write_text('{"key1": "value1"}', encoding="utf-8")
+        real_file.chmod(0o600)
+        link_file = tmp_path / "link.json"
+        link_file.symlink_to(real_file)
+
+        update_config(link_file, key_path=None, key="key2", value="value2")
+
+        assert link_file.is_symlink()
+        assert stat.S_IMODE(real_file.stat().st_mode) == 0o600
+        assert _read_json(real_file) == {"key1": "value1", "key2": "value2"}
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["link.json", "real.json"]
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="依赖 POSIX 权限")
+    def test_update_uses_private_unique_temp_files(self, tmp_path, monkeypatch):
+        """测试每次写入使用唯一命名、权限为 0600 的临时文件，替换后恢复原文件权限"""
+        config_file = tmp_path / "config.json"
+        config_file.write_text("{}", encoding="utf-8")
+        config_file.chmod(0o644)
+
+        temp_files = []
+        original_copymode = settings_helper.shutil.copymode
+
+        def tracking_copymode(src, dst):
+            temp_files.append((Path(dst).name, stat.S_IMODE(os.stat(dst).st_mode)))
+            original_copymode(src, dst)
+
+        monkeypatch.setattr(settings_helper.shutil, "copymode", tracking_copymode)
+
+        update_config(config_file, key_path=None, key="key1", value="value1")
+        update_config(config_file, key_path=None, key="key2", value="value2")
+
+        assert len(temp_files) == 2
+        assert temp_files[0][0] != temp_files[1][0]
+        assert [mode for _, mode in temp_files] == [0o600, 0o600]
+        assert stat.S_IMODE(config_file.stat().st_mode) == 0o644
+        assert _read_json(config_file) == {"key1": "value1", "key2": "value2"}
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="依赖 POSIX 权限")
+    def test_update_new_file_uses_default_mode(self, tmp_path):
+        """测试新建的配置文件使用与 open() 相同的默认权限"""
+        reference_file = tmp_path / "reference"
+        reference_file.touch()
+        config_file = tmp_path / "config.json"
+
+        update_config(config_file, key_path=None, key="key1", value="value1")
+
+        assert stat.S_IMODE(config_file.stat().st_mode) == stat.S_IMODE(
+            reference_file.stat().st_mode
+        )
+
+    def test_update_failure_keeps_original_and_removes_temp_file(
+        self, tmp_path, monkeypatch
+    ):
+        """测试替换失败时原文件不变，且不残留临时文件"""
+        config_file = tmp_path / "config.json"
+        _write_json(config_file, {"key1": "value1"})
+
+        def failing_replace(src, dst):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(settings_helper.os, "replace", failing_replace)
+
+        with pytest.raises(ValueError, match="保存.*失败"):
+            update_config(config_file, key_path=None, key="key2", value="value2")
 
-            # 验证内容正确
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
-            assert config == {"key1": "value1"}
+        assert _read_json(config_file) == {"key1": "value1"}
+        assert [p.name for p in tmp_path.iterdir()] == ["config.json"]
 
-    def test_update_simple_key_value(self):
+    def test_update_simple_key_value(self, tmp_path):
         """测试更新简单的键值对"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            initial_data = {"key1": "value1"}
+        config_file = tmp_path / "config.json"
+        initial_data = {"key1": "value1"}
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(config_file, initial_data)
 
-            # 添加新键
-            update_config(config_file, key_path=None, key="key2", value="value2")
+        # 添加新键
+        update_config(config_file, key_path=None, key="key2", value="value2")
 
-            # 验证
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
-            assert config == {"key1": "value1", "key2": "value2"}
+        # 验证
+        config = _read_json(config_file)
+        assert config == {"key1": "value1", "key2": "value2"}
 
-    def test_update_nested_key_with_dots(self):
+    def test_update_nested_key_with_dots(self, tmp_path):
         """测试更新带点号的嵌套键"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
+        config_file = tmp_path / "config.json"
 
-            # 创建嵌套配置
-            update_config(
-                config_file,
-                key_path=None,
-                key="mcpServers.server1",
-                value={"command": "node"},
-            )
+        # 创建嵌套配置
+        update_config(
+            config_file,
+            key_path=None,
+            key="mcpServers.server1",
+            value={"command": "node"},
+        )
 
-            # 验证
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
-            assert config == {"mcpServers": {"server1": {"command": "node"}}}
+        # 验证
+        config = _read_json(config_file)
+        assert config == {"mcpServers": {"server1": {"command": "node"}}}
 
-    def test_update_with_key_path(self):
+    def test_update_with_key_path(self, tmp_path):
         """测试使用 key_path 更新子配置"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "claude.json"
-            initial_data = {
-                "projects": {
-                    "/path/to/project1": {"disabledMcpServers": ["server1"]},
-                    "/path/to/project2": {"disabledMcpServers": ["server2"]},
-                }
+        config_file = tmp_path / "claude.json"
+        initial_data = {
+            "projects": {
+                "/path/to/project1": {"disabledMcpServers": ["server1"]},
+                "/path/to/project2": {"disabledMcpServers": ["server2"]},
             }
+        }
+
+        _write_json(config_file, initial_data)
+
+        # 更新特定项目的配置
+        update_config(
+            config_file,
+            key_path=["projects", "/path/to/project1"],
+            key="disabledMcpServers",
+            value=["server1", "server3"],
+        )
+
+        # 验证
+        config = _read_json(config_file)
+
+        assert config["projects"]["/path/to/project1"]["disabledMcpServers"] == [
+            "server1",
+            "server3",
+        ]
+        # 确保其他项目未被修改
+        assert config["projects"]["/path/to/project2"]["disabledMcpServers"] == [
+            "server2"
+        ]
+
+    def test_update_with_nonexistent_key_path_creates_path(self, tmp_path):
+        """测试使用不存在的 key_path 时自动创建路径"""
+        config_file = tmp_path / "claude.json"
+
+        # 创建不存在的路径
+        update_config(
+            config_file,
+            key_path=["projects", "/path/to/new_project"],
+            key="mcpServers",
+            value={"server1": {"command": "node"}},
+        )
+
+        # 验证
+        config = _read_json(config_file)
+
+        assert "projects" in config
+        assert "/path/to/new_project" in config["projects"]
+        assert config["projects"]["/path/to/new_project"]["mcpServers"] == {
+            "server1": {"command": "node"}
+        }
+
+    def test_delete_key_with_none_value(self, tmp_path):
+        """测试使用 None 值删除键"""
+        config_file = tmp_path / "config.json"
+        initial_data = {"key1": "value1", "key2": "value2"}
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(config_file, initial_data)
 
-            # 更新特定项目的配置
-            update_config(
-                config_file,
-                key_path=["projects", "/path/to/project1"],
-                key="disabledMcpServers",
-                value=["server1", "server3"],
-            )
+        # 删除 key2
+        update_config(config_file, key_path=None, key="key2", value=None)
 
-            # 验证
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
+        # 验证
+        config = _read_json(config_file)
+        assert config == {"key1": "value1"}
+        assert "key2" not in config
 
-            assert config["projects"]["/path/to/project1"]["disabledMcpServers"] == [
-                "server1",
-                "server3",
-            ]
-            # 确保其他项目未被修改
-            assert config["projects"]["/path/to/project2"]["disabledMcpServers"] == [
-                "server2"
-            ]
+    def test_delete_nested_key_with_none_value(self, tmp_path):
+        """测试删除嵌套键"""
+        config_file = tmp_path / "config.json"
+        initial_data = {
+            "mcpServers": {
+                "server1": {"command": "node"},
+                "server2": {"command": "python"},
+            }
+        }
 
-    def test_update_with_nonexistent_key_path_creates_path(self):
-        """测试使用不存在的 key_path 时自动创建路径"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "claude.json"
+        _write_json(config_file, initial_data)
 
-            # 创建不存在的路径
-            update_config(
-                config_file,
-                key_path=["projects", "/path/to/new_project"],
-                key="mcpServers",
-                value={"server1": {"command": "node"}},
-            )
+        # 删除 server1
+        update_config(config_file, key_path=None, key="mcpServers.server1", value=None)
 
-            # 验证
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
+        # 验证
+        config = _read_json(config_file)
+        assert config == {"mcpServers": {"server2": {"command": "python"}}}
 
-            assert "projects" in config
-            assert "/path/to/new_project" in config["projects"]
-            assert config["projects"]["/path/to/new_project"]["mcpServers"] == {
-                "server1": {"command": "node"}
+    def test_delete_key_cleans_up_empty_objects(self, tmp_path):
+        """测试删除键后自动清理空对象"""
+        config_file = tmp_path / "config.json"
+        initial_data = {
+            "mcpServers": {
+                "server1": {"command": "node"},
             }
+        }
 
-    def test_delete_key_with_none_value(self):
-        """测试使用 None 值删除键"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            initial_data = {"key1": "value1", "key2": "value2"}
-
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(config_file, initial_data)
 
-            # 删除 key2
-            update_config(config_file, key_path=None, key="key2", value=None)
+        # 删除 server1，应该清理空的 mcpServers 对象
+        update_config(config_file, key_path=None, key="mcpServers.server1", value=None)
 
-            # 验证
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
-            assert config == {"key1": "value1"}
-            assert "key2" not in config
+        # 验证 mcpServers 也被删除了
+        config = _read_json(config_file)
+        assert config == {}
 
-    def test_delete_nested_key_with_none_value(self):
-        """测试删除嵌套键"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            initial_data = {
-                "mcpServers": {
-                    "server1": {"command": "node"},
-                    "server2": {"command": "python"},
+    def test_delete_with_key_path_cleans_up_empty_objects(self, tmp_path):
+        """测试使用 key_path 删除后，清理空对象"""
+        config_file = tmp_path / "claude.json"
+        initial_data = {
+            "projects": {
+                "/path/to/project1": {
+                    "disabledMcpServers": ["server1"],
+                    "mcpServers": {"server1": {"command": "node"}},
                 }
             }
+        }
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(config_file, initial_data)
 
-            # 删除 server1
-            update_config(
-                config_file, key_path=None, key="mcpServers.server1", value=None
-            )
+        # 删除 disabledMcpServers
+        update_config(
+            config_file,
+            key_path=["projects", "/path/to/project1"],
+            key="disabledMcpServers",
+            value=None,
+        )
 
-            # 验证
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
-            assert config == {"mcpServers": {"server2": {"command": "python"}}}
+        # 验证
+        config = _read_json(config_file)
 
-    def test_delete_key_cleans_up_empty_objects(self):
-        """测试删除键后自动清理空对象"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            initial_data = {
-                "mcpServers": {
-                    "server1": {"command": "node"},
-                }
-            }
+        # disabledMcpServers 被删除，但项目配置还在（因为还有 mcpServers）
+        assert "disabledMcpServers" not in config["projects"]["/path/to/project1"]
+        assert config["projects"]["/path/to/project1"]["mcpServers"] == {
+            "server1": {"command": "node"}
+        }
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+    def test_delete_nonexistent_key_does_nothing(self, tmp_path):
+        """测试删除不存在的键，不应报错"""
+        config_file = tmp_path / "config.json"
+        initial_data = {"key1": "value1"}
 
-            # 删除 server1，应该清理空的 mcpServers 对象
-            update_config(
-                config_file, key_path=None, key="mcpServers.server1", value=None
-            )
+        _write_json(config_file, initial_data)
 
-            # 验证 mcpServers 也被删除了
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
-            assert config == {}
+        # 尝试删除不存在的键
+        update_config(config_file, key_path=None, key="nonexistent", value=None)
 
-    def test_delete_with_key_path_cleans_up_empty_objects(self):
-        """测试使用 key_path 删除后，清理空对象"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "claude.json"
-            initial_data = {
-                "projects": {
-                    "/path/to/project1": {
-                        "disabledMcpServers": ["server1"],
-                        "mcpServers": {"server1": {"command": "node"}},
-                    }
-                }
-            }
+        # 验证配置未被修改
+        config = _read_json(config_file)
+        assert config == {"key1": "value1"}
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+    def test_noop_update_does_not_rewrite_file(self, tmp_path):
+        """测试内容未变化的更新不重写文件，而类型变化（True -> 1）仍会写入"""
+        config_file = tmp_path / "config.json"
+        update_config(config_file, key_path=None, key="flag", value=True)
+        original_bytes = config_file.read_bytes()
+        original_inode = config_file.stat().st_ino
 
-            # 删除 disabledMcpServers
-            update_config(
-                config_file,
-                key_path=["projects", "/path/to/project1"],
-                key="disabledMcpServers",
-                value=None,
-            )
+        # 删除不存在的键、写入相同的值都不应替换文件
+        update_config(config_file, key_path=None, key="nonexistent", value=None)
+        update_config(config_file, key_path=["env"], key="X", value=None)
+        update_config(config_file, key_path=None, key="flag", value=True)
 
-            # 验证
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
+        assert config_file.read_bytes() == original_bytes
+        assert config_file.stat().st_ino == original_inode
 
-            # disabledMcpServers 被删除，但项目配置还在（因为还有 mcpServers）
-            assert "disabledMcpServers" not in config["projects"]["/path/to/project1"]
-            assert config["projects"]["/path/to/project1"]["mcpServers"] == {
-                "server1": {"command": "node"}
-            }
+        update_config(config_file, key_path=None, key="flag", value=1)
 
-    def test_delete_nonexistent_key_does_nothing(self):
-        """测试删除不存在的键，不应报错"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            initial_data = {"key1": "value1"}
+        assert _read_json(config_file) == {"flag": 1}
+        assert config_file.stat().st_ino != original_inode
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+    def test_noop_update_still_creates_missing_file(self, tmp_path):
+        """测试文件不存在时，即使更新后配置为空也会创建文件"""
+        config_file = tmp_path / "config.json"
 
-            # 尝试删除不存在的键
-            update_config(config_file, key_path=None, key="nonexistent", value=None)
+        update_config(config_file, key_path=None, key="nonexistent", value=None)
 
-            # 验证配置未被修改
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
-            assert config == {"key1": "value1"}
+        assert config_file.exists()
+        assert _read_json(config_file) == {}
 
-    def test_update_non_dict_path_raises_error(self):
+    def test_update_non_dict_path_raises_error(self, tmp_path):
         """测试更新非字典类型的路径时应抛出异常"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            initial_data = {"key1": "string_value"}
+        config_file = tmp_path / "config.json"
+        initial_data = {"key1": "string_value"}
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(config_file, initial_data)
 
-            # 尝试在字符串值上设置子键
-            with pytest.raises(KeyError, match="不是字典类型"):
-                update_config(
-                    config_file, key_path=None, key="key1.subkey", value="value"
-                )
+        # 尝试在字符串值上设置子键
+        with pytest.raises(KeyError, match="不是字典类型"):
+            update_config(config_file, key_path=None, key="key1.subkey", value="value")
 
-    def test_update_with_key_path_non_dict_raises_error(self):
+    def test_update_with_key_path_non_dict_raises_error(self, tmp_path):
         """测试 key_path 包含非字典类型时应抛出异常"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            initial_data = {"projects": "string_value"}
+        config_file = tmp_path / "config.json"
+        initial_data = {"projects": "string_value"}
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(config_file, initial_data)
 
-            # 尝试通过字符串类型的 projects 设置子键
-            with pytest.raises(KeyError, match="不是字典类型"):
-                update_config(
-                    config_file,
-                    key_path=["projects", "/some/path"],
-                    key="key1",
-                    value="value1",
-                )
+        # 尝试通过字符串类型的 projects 设置子键
+        with pytest.raises(KeyError, match="不是字典类型"):
+            update_config(
+                config_file,
+                key_path=["projects", "/some/path"],
+                key="key1",
+                value="value1",
+            )
 
 
 class TestConvertConfigValue:
@@ -431,6 +547,13 @@ class TestConvertConfigValue:
         result = convert_config_value('{"key": "value", "number": 42}', "object")
         assert result == {"key": "value", "number": 42}
 
+    def test_convert_object_keeps_large_integers(self):
+        """测试转换对象时超出 64 位的整数保持为整数"""
+        result = convert_config_value(
+            '{"id": 123456789012345678901234567890}', "object"
+        )
+        assert result == {"id": 123456789012345678901234567890}
+
     def test_convert_object_invalid(self):
         """测试转换为无效的对象类型"""
         with pytest.raises(ValueError, match="无法将.*转换为 JSON 对象"):
@@ -460,353 +583,369 @@ class TestConvertConfigValue:
 class TestUpdateConfigWithSplitKey:
     """测试 update_config 函数的 split_key 参数"""
 
-    def test_update_with_split_key_false(self):
+    def test_update_with_split_key_false(self, tmp_path):
         """测试 split_key=False 时，包含点号的键名不被分割"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
+        config_file = tmp_path / "config.json"
 
-            # 添加包含点号的键名
+        # 添加包含点号的键名
+        update_config(
+            config_file,
+            key_path=["mcpServers"],
+            key="my.server",
+            value={"command": "node", "args": ["server.js"]},
+            split_key=False,
+        )
+
+        # 验证配置结构
+        config = _read_json(config_file)
+
+        assert config == {
+            "mcpServers": {"my.server": {"command": "node", "args": ["server.js"]}}
+        }
+
+    def test_update_with_split_key_false_multiple_dots(self, tmp_path):
+        """测试 split_key=False 时，多个点号的键名不被分割"""
+        config_file = tmp_path / "config.json"
+
+        test_names = [
+            "my.server",
+            "server.v1.example",
+            "com.example.mcp.server",
+            "test..server",
+            ".server",
+        ]
+
+        for name in test_names:
             update_config(
                 config_file,
                 key_path=["mcpServers"],
-                key="my.server",
-                value={"command": "node", "args": ["server.js"]},
+                key=name,
+                value={"command": f"test_{name}"},
                 split_key=False,
             )
 
-            # 验证配置结构
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
+        # 验证所有键名都保持完整
+        config = _read_json(config_file)
+
+        for name in test_names:
+            assert name in config["mcpServers"]
+            assert config["mcpServers"][name]["command"] == f"test_{name}"
 
-            assert config == {
-                "mcpServers": {"my.server": {"command": "node", "args": ["server.js"]}}
+    def test_update_with_split_key_false_delete(self, tmp_path):
+        """测试 split_key=False 时删除包含点号的键名"""
+        config_file = tmp_path / "config.json"
+        initial_data = {
+            "mcpServers": {
+                "my.server": {"command": "node"},
+                "normal.server": {"command": "python"},
             }
+        }
 
-    def test_update_with_split_key_false_multiple_dots(self):
-        """测试 split_key=False 时，多个点号的键名不被分割"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
+        _write_json(config_file, initial_data)
 
-            test_names = [
-                "my.server",
-                "server.v1.example",
-                "com.example.mcp.server",
-                "test..server",
-                ".server",
-            ]
+        # 删除包含点号的键
+        update_config(
+            config_file,
+            key_path=["mcpServers"],
+            key="my.server",
+            value=None,
+            split_key=False,
+        )
 
-            for name in test_names:
-                update_config(
-                    config_file,
-                    key_path=["mcpServers"],
-                    key=name,
-                    value={"command": f"test_{name}"},
-                    split_key=False,
-                )
-
-            # 验证所有键名都保持完整
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
+        # 验证删除成功
+        config = _read_json(config_file)
 
-            for name in test_names:
-                assert name in config["mcpServers"]
-                assert config["mcpServers"][name]["command"] == f"test_{name}"
+        assert "my.server" not in config["mcpServers"]
+        assert "normal.server" in config["mcpServers"]
 
-    def test_update_with_split_key_false_delete(self):
-        """测试 split_key=False 时删除包含点号的键名"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            initial_data = {
-                "mcpServers": {
-                    "my.server": {"command": "node"},
-                    "normal.server": {"command": "python"},
-                }
+    def test_update_with_split_key_true_default(self, tmp_path):
+        """测试 split_key=True（默认）时，点号分割的嵌套键正常工作"""
+        config_file = tmp_path / "config.json"
+
+        # 默认行为：split_key=True，点号作为分隔符
+        update_config(
+            config_file,
+            key_path=None,
+            key="mcpServers.server1.env",
+            value="development",
+        )
+
+        # 验证嵌套结构
+        config = _read_json(config_file)
+
+        assert config == {"mcpServers": {"server1": {"env": "development"}}}
+
+    def test_update_with_split_key_and_key_path(self, tmp_path):
+        """测试 split_key=False 与 key_path 组合使用"""
+        config_file = tmp_path / "config.json"
+        initial_data = {"projects": {"/path/to/project": {"disabledMcpServers": []}}}
+
+        _write_json(config_file, initial_data)
+
+        # 使用 key_path 和 split_key=False 添加包含点号的 MCP 服务器
+        update_config(
+            config_file,
+            key_path=["projects", "/path/to/project", "mcpServers"],
+            key="my.custom.server",
+            value={"command": "node"},
+            split_key=False,
+        )
+
+        # 验证配置结构
+        config = _read_json(config_file)
+
+        assert (
+            "my.custom.server" in config["projects"]["/path/to/project"]["mcpServers"]
+        )
+        assert config["projects"]["/path/to/project"]["mcpServers"][
+            "my.custom.server"
+        ] == {"command": "node"}
+
+    def test_update_with_split_key_false_preserves_empty_objects(self, tmp_path):
+        """测试 split_key=False 删除后正确清理空对象"""
+        config_file = tmp_path / "config.json"
+        initial_data = {
+            "mcpServers": {
+                "my.server": {"command": "node"},
             }
+        }
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(config_file, initial_data)
 
-            # 删除包含点号的键
-            update_config(
-                config_file,
-                key_path=["mcpServers"],
-                key="my.server",
-                value=None,
-                split_key=False,
-            )
+        # 删除唯一的键，应该清理空的 mcpServers
+        update_config(
+            config_file,
+            key_path=["mcpServers"],
+            key="my.server",
+            value=None,
+            split_key=False,
+        )
 
-            # 验证删除成功
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
+        # 验证 mcpServers 也被清理
+        config = _read_json(config_file)
 
-            assert "my.server" not in config["mcpServers"]
-            assert "normal.server" in config["mcpServers"]
+        assert config == {}
 
-    def test_update_with_split_key_true_default(self):
-        """测试 split_key=True（默认）时，点号分割的嵌套键正常工作"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
 
-            # 默认行为：split_key=True，点号作为分隔符
-            update_config(
-                config_file,
-                key_path=None,
-                key="mcpServers.server1.env",
-                value="development",
-            )
+class TestEditConfig:
+    """测试 edit_config 函数"""
 
-            # 验证嵌套结构
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
+    def test_edit_multiple_keys_in_one_block(self, tmp_path):
+        """测试在一个 with 块内写入多个键，仅写入一次文件"""
+        config_file = tmp_path / "config.json"
 
-            assert config == {"mcpServers": {"server1": {"env": "development"}}}
+        test_names = [
+            "my.server",
+            "server.v1.example",
+            "com.example.mcp.server",
+            "test..server",
+            ".server",
+        ]
 
-    def test_update_with_split_key_and_key_path(self):
-        """测试 split_key=False 与 key_path 组合使用"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            initial_data = {
-                "projects": {"/path/to/project": {"disabledMcpServers": []}}
-            }
+        with edit_config(config_file, key_path=["mcpServers"]) as editor:
+            for name in test_names:
+                editor.set(name, {"command": f"test_{name}"}, split_key=False)
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+            # 退出 with 块之前不写入文件
+            assert not config_file.exists()
 
-            # 使用 key_path 和 split_key=False 添加包含点号的 MCP 服务器
-            update_config(
-                config_file,
-                key_path=["projects", "/path/to/project", "mcpServers"],
-                key="my.custom.server",
-                value={"command": "node"},
-                split_key=False,
-            )
+        config = _read_json(config_file)
 
-            # 验证配置结构
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
+        assert config == {
+            "mcpServers": {name: {"command": f"test_{name}"} for name in test_names}
+        }
 
-            assert (
-                "my.custom.server"
-                in config["projects"]["/path/to/project"]["mcpServers"]
-            )
-            assert config["projects"]["/path/to/project"]["mcpServers"][
-                "my.custom.server"
-            ] == {"command": "node"}
+    def test_edit_set_and_delete(self, tmp_path):
+        """测试在一个 with 块内设置和删除键，删除后清理空对象"""
+        config_file = tmp_path / "config.json"
+        initial_data = {"env": {"A": "1"}, "model": "opus"}
 
-    def test_update_with_split_key_false_preserves_empty_objects(self):
-        """测试 split_key=False 删除后正确清理空对象"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            config_file = Path(tmpdir) / "config.json"
-            initial_data = {
-                "mcpServers": {
-                    "my.server": {"command": "node"},
-                }
-            }
+        _write_json(config_file, initial_data)
 
-            with open(config_file, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        with edit_config(config_file) as editor:
+            editor.set("env.A", None)
+            editor.set("permissions.allow", ["Bash"])
 
-            # 删除唯一的键，应该清理空的 mcpServers
-            update_config(
-                config_file,
-                key_path=["mcpServers"],
-                key="my.server",
-                value=None,
-                split_key=False,
-            )
+        config = _read_json(config_file)
+
+        assert config == {"model": "opus", "permissions": {"allow": ["Bash"]}}
 
-            # 验证 mcpServers 也被清理
-            with open(config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
+    def test_edit_does_not_write_on_error(self, tmp_path):
+        """测试 with 块内抛出异常时不写入文件"""
+        config_file = tmp_path / "config.json"
+        initial_data = {"key1": "value1"}
 
-            assert config == {}
+        _write_json(config_file, initial_data)
+
+        with pytest.raises(KeyError):
+            with edit_config(config_file) as editor:
+                editor.set("key2", "value2")
+                editor.set("key1.nested", "value")
+
+        config = _read_json(config_file)
+
+        assert config == initial_data
 
 
 class TestUpdateProjectConfig:
     """测试 update_project_config 函数"""
 
-    def test_update_project_config_basic(self):
+    def test_update_project_config_basic(self, tmp_path):
         """测试基本的项目配置更新"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            claude_json = Path(tmpdir) / ".claude.json"
-            initial_data = {
-                "projects": {"/path/to/project": {"disabledMcpServers": []}}
-            }
+        claude_json = tmp_path / ".claude.json"
+        initial_data = {"projects": {"/path/to/project": {"disabledMcpServers": []}}}
 
-            with open(claude_json, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(claude_json, initial_data)
 
-            # 更新项目配置（使用默认的 split_key=True）
-            success = update_project_config(
-                claude_json,
-                Path("/path/to/project"),
-                "disabledMcpServers",
-                ["server1", "server2"],
-            )
+        # 更新项目配置（使用默认的 split_key=True）
+        success = update_project_config(
+            claude_json,
+            Path("/path/to/project"),
+            "disabledMcpServers",
+            ["server1", "server2"],
+        )
 
-            assert success is True
+        assert success is True
 
-            # 验证更新
-            with open(claude_json, "r", encoding="utf-8") as f:
-                config = json.load(f)
+        # 验证更新
+        config = _read_json(claude_json)
 
-            assert config["projects"]["/path/to/project"]["disabledMcpServers"] == [
-                "server1",
-                "server2",
-            ]
+        assert config["projects"]["/path/to/project"]["disabledMcpServers"] == [
+            "server1",
+            "server2",
+        ]
 
-    def test_update_project_config_with_key_path(self):
+    def test_update_project_config_with_key_path(self, tmp_path):
         """测试使用 key_path 参数更新项目配置"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            claude_json = Path(tmpdir) / ".claude.json"
-            initial_data = {
-                "projects": {"/path/to/project": {"disabledMcpServers": []}}
-            }
+        claude_json = tmp_path / ".claude.json"
+        initial_data = {"projects": {"/path/to/project": {"disabledMcpServers": []}}}
 
-            with open(claude_json, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(claude_json, initial_data)
 
-            # 使用 key_path 添加 MCP 服务器
-            success = update_project_config(
-                claude_json,
-                Path("/path/to/project"),
-                "myServer",
-                {"command": "node"},
-                key_path=["mcpServers"],
-            )
+        # 使用 key_path 添加 MCP 服务器
+        success = update_project_config(
+            claude_json,
+            Path("/path/to/project"),
+            "myServer",
+            {"command": "node"},
+            key_path=["mcpServers"],
+        )
 
-            assert success is True
+        assert success is True
 
-            # 验证配置结构
-            with open(claude_json, "r", encoding="utf-8") as f:
-                config = json.load(f)
+        # 验证配置结构
+        config = _read_json(claude_json)
 
-            assert "mcpServers" in config["projects"]["/path/to/project"]
-            assert config["projects"]["/path/to/project"]["mcpServers"]["myServer"] == {
-                "command": "node"
-            }
+        assert "mcpServers" in config["projects"]["/path/to/project"]
+        assert config["projects"]["/path/to/project"]["mcpServers"]["myServer"] == {
+            "command": "node"
+        }
 
-    def test_update_project_config_with_split_key_false(self):
+    def test_update_project_config_with_split_key_false(self, tmp_path):
         """测试 split_key=False 与 key_path 组合使用"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            claude_json = Path(tmpdir) / ".claude.json"
-            initial_data = {
-                "projects": {"/path/to/project": {"disabledMcpServers": []}}
-            }
+        claude_json = tmp_path / ".claude.json"
+        initial_data = {"projects": {"/path/to/project": {"disabledMcpServers": []}}}
 
-            with open(claude_json, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(claude_json, initial_data)
 
-            # 添加包含点号的 MCP 服务器
-            success = update_project_config(
-                claude_json,
-                Path("/path/to/project"),
-                "my.server",
-                {"command": "node", "args": ["server.js"]},
-                key_path=["mcpServers"],
-                split_key=False,
-            )
+        # 添加包含点号的 MCP 服务器
+        success = update_project_config(
+            claude_json,
+            Path("/path/to/project"),
+            "my.server",
+            {"command": "node", "args": ["server.js"]},
+            key_path=["mcpServers"],
+            split_key=False,
+        )
 
-            assert success is True
+        assert success is True
 
-            # 验证键名未被分割
-            with open(claude_json, "r", encoding="utf-8") as f:
-                config = json.load(f)
+        # 验证键名未被分割
+        config = _read_json(claude_json)
 
-            assert "my.server" in config["projects"]["/path/to/project"]["mcpServers"]
-            assert config["projects"]["/path/to/project"]["mcpServers"][
-                "my.server"
-            ] == {"command": "node", "args": ["server.js"]}
+        assert "my.server" in config["projects"]["/path/to/project"]["mcpServers"]
+        assert config["projects"]["/path/to/project"]["mcpServers"]["my.server"] == {
+            "command": "node",
+            "args": ["server.js"],
+        }
 
-    def test_update_project_config_nonexistent_project(self):
+    def test_update_project_config_nonexistent_project(self, tmp_path):
         """测试更新不存在的项目配置，应返回 False"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            claude_json = Path(tmpdir) / ".claude.json"
-            initial_data = {"projects": {"/existing/project": {}}}
+        claude_json = tmp_path / ".claude.json"
+        initial_data = {"projects": {"/existing/project": {}}}
 
-            with open(claude_json, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(claude_json, initial_data)
 
-            # 尝试更新不存在的项目
-            success = update_project_config(
-                claude_json, Path("/nonexistent/project"), "key", "value"
-            )
+        # 尝试更新不存在的项目
+        success = update_project_config(
+            claude_json, Path("/nonexistent/project"), "key", "value"
+        )
 
-            assert success is False
+        assert success is False
 
-    def test_update_project_config_delete(self):
+    def test_update_project_config_delete(self, tmp_path):
         """测试删除项目配置中的键"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            claude_json = Path(tmpdir) / ".claude.json"
-            initial_data = {
-                "projects": {
-                    "/path/to/project": {
-                        "mcpServers": {"server1": {"command": "node"}},
-                        "disabledMcpServers": ["server1"],
-                    }
+        claude_json = tmp_path / ".claude.json"
+        initial_data = {
+            "projects": {
+                "/path/to/project": {
+                    "mcpServers": {"server1": {"command": "node"}},
+                    "disabledMcpServers": ["server1"],
                 }
             }
+        }
 
-            with open(claude_json, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(claude_json, initial_data)
 
-            # 删除 mcpServers 中的 server1
-            success = update_project_config(
-                claude_json,
-                Path("/path/to/project"),
-                "server1",
-                None,
-                key_path=["mcpServers"],
-            )
+        # 删除 mcpServers 中的 server1
+        success = update_project_config(
+            claude_json,
+            Path("/path/to/project"),
+            "server1",
+            None,
+            key_path=["mcpServers"],
+        )
 
-            assert success is True
+        assert success is True
 
-            # 验证删除成功（空对象被清理）
-            with open(claude_json, "r", encoding="utf-8") as f:
-                config = json.load(f)
+        # 验证删除成功（空对象被清理）
+        config = _read_json(claude_json)
 
-            assert "mcpServers" not in config["projects"]["/path/to/project"]
-            assert config["projects"]["/path/to/project"]["disabledMcpServers"] == [
-                "server1"
-            ]
+        assert "mcpServers" not in config["projects"]["/path/to/project"]
+        assert config["projects"]["/path/to/project"]["disabledMcpServers"] == [
+            "server1"
+        ]
 
-    def test_update_project_config_with_split_key_false_delete(self):
+    def test_update_project_config_with_split_key_false_delete(self, tmp_path):
         """测试 split_key=False 删除包含点号的键"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            claude_json = Path(tmpdir) / ".claude.json"
-            initial_data = {
-                "projects": {
-                    "/path/to/project": {
-                        "mcpServers": {
-                            "my.server": {"command": "node"},
-                            "normal.server": {"command": "python"},
-                        }
+        claude_json = tmp_path / ".claude.json"
+        initial_data = {
+            "projects": {
+                "/path/to/project": {
+                    "mcpServers": {
+                        "my.server": {"command": "node"},
+                        "normal.server": {"command": "python"},
                     }
                 }
             }
+        }
 
-            with open(claude_json, "w", encoding="utf-8") as f:
-                json.dump(initial_data, f)
+        _write_json(claude_json, initial_data)
 
-            # 删除包含点号的键
-            success = update_project_config(
-                claude_json,
-                Path("/path/to/project"),
-                "my.server",
-                None,
-                key_path=["mcpServers"],
-                split_key=False,
-            )
+        # 删除包含点号的键
+        success = update_project_config(
+            claude_json,
+            Path("/path/to/project"),
+            "my.server",
+            None,
+            key_path=["mcpServers"],
+            split_key=False,
+        )
 
-            assert success is True
+        assert success is True
 
-            # 验证删除成功
-            with open(claude_json, "r", encoding="utf-8") as f:
-                config = json.load(f)
+        # 验证删除成功
+        config = _read_json(claude_json)
 
-            assert (
-                "my.server" not in config["projects"]["/path/to/project"]["mcpServers"]
-            )
-            assert (
-                "normal.server" in config["projects"]["/path/to/project"]["mcpServers"]
-            )
+        assert "my.server" not in config["projects"]["/path/to/project"]["mcpServers"]
+        assert "normal.server" in config["projects"]["/path/to/project"]["mcpServers"]
@@ -612,8 +612,7 @@ class TestDeleteProject:
         assert deleted_project is None
 
         # 验证临时 .claude.json 中的配置已删除
-        with open(claude_json_path, "r") as f:
-            config = json.load(f)
+        config = json.loads(claude_json_path.read_bytes())
         assert str(project_path) not in config.get("projects", {})
 
         # 验证 session 目录已删除